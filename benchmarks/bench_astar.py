@@ -0,0 +1,104 @@
+"""
+A* 单次查询基准：对比旧版字典/集合实现与扁平数组搜索核心
+
+用法: python benchmarks/bench_astar.py [--queries 20] [--data-dir data]
+"""
+import argparse
+import heapq
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from route_planner import DroneRoutePlanner
+
+
+def legacy_a_star(planner, start_grid, goal_grid):
+    """旧版 A*（字典 + 集合 + 每次入堆前线性扫描开放表），仅用于对比"""
+    open_set = []
+    heapq.heappush(open_set, (0, start_grid))
+    came_from = {}
+    g_score = {start_grid: 0}
+    closed_set = set()
+
+    while open_set:
+        current = heapq.heappop(open_set)[1]
+        if current == goal_grid:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            path.append(start_grid)
+            path.reverse()
+            return path
+
+        closed_set.add(current)
+        for neighbor in planner.get_neighbors(current):
+            if neighbor in closed_set:
+                continue
+            tentative_g_score = g_score[current] + 1
+            if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g_score
+                f_score = tentative_g_score + planner.heuristic(neighbor, goal_grid)
+                if neighbor not in [item[1] for item in open_set]:
+                    heapq.heappush(open_set, (f_score, neighbor))
+    return None
+
+
+def snap(planner, coord):
+    cell = planner.coord_to_grid(coord)
+    if planner.obstacle_grid[cell[1], cell[0]]:
+        cell = planner.find_nearest_free_point(cell)
+    return cell
+
+
+def build_queries(planner, count):
+    """选取航线查询：按直线距离从长到短取食堂/校门到宿舍的组合"""
+    sources = planner.canteens + planner.gates
+    pairs = []
+    for source in sources:
+        for dorm in planner.dorms:
+            start = snap(planner, source['coordinates'])
+            goal = snap(planner, dorm['coordinates'])
+            if start is None or goal is None:
+                continue
+            distance = abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+            pairs.append((distance, start, goal))
+    pairs.sort(reverse=True)
+    step = max(1, len(pairs) // count)
+    return [(start, goal) for _, start, goal in pairs[::step][:count]]
+
+
+def time_queries(search, queries):
+    timings = []
+    for start, goal in queries:
+        t0 = time.perf_counter()
+        search(start, goal)
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A* 单次查询基准")
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--data-dir', default='data')
+    args = parser.parse_args()
+
+    # 旧版实现每步代价为 1、曼哈顿启发式，对比时使用同一代价模型
+    planner = DroneRoutePlanner(args.data_dir, cost_model='unit')
+    queries = build_queries(planner, args.queries)
+    print(f"网格 {planner.grid_width}x{planner.grid_height}，查询 {len(queries)} 次")
+
+    legacy = time_queries(lambda s, g: legacy_a_star(planner, s, g), queries)
+    core = time_queries(planner.grid_search.astar, queries)
+
+    print(f"{'起点':>12} {'终点':>12} {'旧版(ms)':>10} {'新版(ms)':>10} {'加速比':>8}")
+    for (start, goal), t_old, t_new in zip(queries, legacy, core):
+        print(f"{str(start):>12} {str(goal):>12} {t_old * 1000:10.2f} {t_new * 1000:10.2f} {t_old / t_new:8.1f}x")
+    print(f"合计: 旧版 {sum(legacy):.3f}s, 新版 {sum(core):.3f}s, 加速比 {sum(legacy) / sum(core):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
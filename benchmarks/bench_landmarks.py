@@ -0,0 +1,99 @@
+"""
+地标（ALT）启发式基准：对比 octile 启发式、每次查询按起终点选取活跃地标构建启发式、
+以及全部地标按终点缓存启发式（DroneRoutePlanner.get_heuristic_field）三种方式
+
+查询为全部 起点 x 宿舍 组合（与 plan_routes 的工作量一致，同一宿舍被各起点重复查询），
+分别统计构建启发式和搜索本身的耗时以及扩展的节点数；三种方式的航线代价应完全一致。
+
+用法: python benchmarks/bench_landmarks.py [--landmarks 16] [--active 8] [--data-dir data]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid_search import UNIT_COSTS, octile_cost
+from route_planner import DroneRoutePlanner
+
+
+def build_queries(planner):
+    """全部 起点 x 宿舍 组合，起终点吸附到可通行网格点"""
+    queries = []
+    for source in planner.canteens + planner.gates:
+        for dorm in planner.dorms:
+            start = planner.snap_to_free(source['coordinates'])
+            goal = planner.snap_to_free(dorm['coordinates'])
+            if start is not None and goal is not None:
+                queries.append((start, goal))
+    return queries
+
+
+def path_cost(search, cells):
+    """网格路径在 search 代价模型下的总代价"""
+    steps = np.abs(np.diff(np.asarray(cells), axis=0))
+    return float(np.sum(octile_cost(steps[:, 0], steps[:, 1], search.costs or UNIT_COSTS)))
+
+
+def run(search, queries, field_of):
+    """返回 (构建启发式耗时, 搜索耗时, 扩展节点数, 各查询的航线代价)"""
+    field_time = search_time = 0.0
+    expanded = 0
+    costs = []
+    for start, goal in queries:
+        t0 = time.perf_counter()
+        h_field = field_of(start, goal)
+        t1 = time.perf_counter()
+        cells = search.astar(start, goal, h_field=h_field)
+        search_time += time.perf_counter() - t1
+        field_time += t1 - t0
+        expanded += search.last_stats['expanded']
+        costs.append(path_cost(search, cells) if cells is not None else None)
+    return field_time, search_time, expanded, costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地标（ALT）启发式基准")
+    parser.add_argument('--landmarks', type=int, default=16)
+    parser.add_argument('--active', type=int, default=8, help="按起终点选取的活跃地标数")
+    parser.add_argument('--data-dir', default='data')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        planner = DroneRoutePlanner(args.data_dir, landmarks=args.landmarks)
+        t0 = time.perf_counter()
+        landmarks = planner.get_landmarks()
+        prepare = time.perf_counter() - t0
+    search = planner.grid_search
+    queries = build_queries(planner)
+    print(f"网格 {planner.grid_width}x{planner.grid_height}，{landmarks.count} 个地标"
+          f"（{landmarks.nbytes / 1024:.0f} KB，准备 {prepare:.2f}s），查询 {len(queries)} 次")
+
+    cases = [
+        ('octile', lambda start, goal: None),
+        (f'ALT 活跃{args.active}', lambda start, goal: landmarks.heuristic_field(goal, search, start, args.active)),
+        ('ALT 按终点缓存', lambda start, goal: planner.get_heuristic_field(goal)),
+    ]
+    print(f"{'启发式':<14} {'构建(s)':>8} {'搜索(s)':>8} {'合计(s)':>8} {'扩展节点':>10} {'相对octile':>10}")
+    baseline = None
+    reference = None
+    for name, field_of in cases:
+        field_time, search_time, expanded, costs = run(search, queries, field_of)
+        total = field_time + search_time
+        if baseline is None:
+            baseline, reference = total, costs
+        mismatches = sum(
+            1 for a, b in zip(costs, reference)
+            if (a is None) != (b is None) or (a is not None and abs(a - b) > 1e-6 * max(1.0, b))
+        )
+        print(f"{name:<14} {field_time:8.3f} {search_time:8.3f} {total:8.3f} {expanded:10d} "
+              f"{baseline / total:9.2f}x" + (f"  代价不一致 {mismatches} 条" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+分阶段基准：在不同数据规模和网格边长下分别计时
+load_data、create_obstacle_grid、单次 a_star 查询（短、长）、严格网格上不可达的单次搜索、
+plan_routes 和 analyze_routes
+
+数据集为 synthetic_campus 的预设规模（small / medium / large）或自定义 建筑:运动场所:起点:宿舍，
+也可以用 data 表示仓库自带的清华数据。合成数据按随机种子生成到临时目录。
+每个阶段重复 --repeat 次，记录最小值与中位数（秒），结果写成 JSON；
+指定 --baseline 时与保存的结果逐项比较，中位数变慢超过 --threshold 的阶段记为回归，退出码为 1。
+
+用法:
+    python benchmarks/bench_suite.py --datasets small,medium --grid-sizes 0.0001,0.00005 --output bench.json
+    python benchmarks/bench_suite.py --datasets small,medium --grid-sizes 0.0001,0.00005 --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from route_planner import DroneRoutePlanner
+from reservation import distance_field
+from synthetic_campus import PRESETS, generate_campus, write_campus
+
+PHASES = ('load_data', 'create_obstacle_grid', 'a_star_short', 'a_star_long', 'a_star_unreachable',
+          'plan_routes', 'analyze_routes')
+
+
+def quiet(func, *args, **kwargs):
+    """调用时屏蔽规划器的进度输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def measure(func, repeat):
+    """重复调用 func，返回 (各次耗时, 最后一次的返回值)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = quiet(func)
+        timings.append(time.perf_counter() - t0)
+    return timings, result
+
+
+def prepare_dataset(name, work_dir, seed):
+    """返回数据目录：data 为仓库自带数据，其余为预设名称或 建筑:运动场所:起点:宿舍"""
+    if name == 'data':
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    if name in PRESETS:
+        counts = PRESETS[name]
+    else:
+        counts = tuple(int(value) for value in name.split(':'))
+        if len(counts) != 4:
+            raise ValueError(f"无法解析的数据集: {name}（应为预设名称或 建筑:运动场所:起点:宿舍）")
+    out_dir = os.path.join(work_dir, name.replace(':', '_'))
+    return write_campus(out_dir, generate_campus(*counts, seed=seed))
+
+
+def reload_data(planner):
+    """清空已加载的图层后重新执行 load_data"""
+    planner.gates, planner.canteens, planner.dorms = [], [], []
+    planner.buildings, planner.building_heights, planner.sports = [], [], []
+    planner.campus_boundary = None
+    planner.load_data()
+
+
+def cell_coord(planner, cell):
+    """网格点中心的坐标（coord_to_grid 截断取整，取中心避免落到相邻网格）"""
+    return [planner.bounds[0] + (cell[0] + 0.5) * planner.grid_size,
+            planner.bounds[2] + (cell[1] + 0.5) * planner.grid_size]
+
+
+def select_queries(planner):
+    """
+    单次查询的起终点：起点到宿舍的组合中网格距离最近与最远的一对，
+    以及一个从第一个起点出发在严格网格上不可达的可通行网格点（没有时省略）
+    """
+    sources = [planner.snap_to_free(place['coordinates']) for place in planner.canteens + planner.gates]
+    targets = [planner.snap_to_free(place['coordinates']) for place in planner.dorms]
+    pairs = [(max(abs(s[0] - t[0]), abs(s[1] - t[1])), s, t)
+             for s in sources if s is not None for t in targets if t is not None and t != s]
+    if not pairs:
+        return {}
+    pairs.sort()
+    queries = {
+        'a_star_short': (cell_coord(planner, pairs[0][1]), cell_coord(planner, pairs[0][2])),
+        'a_star_long': (cell_coord(planner, pairs[-1][1]), cell_coord(planner, pairs[-1][2])),
+    }
+    start = pairs[0][1]
+    field = distance_field(np.asarray(planner.obstacle_grid, dtype=bool), start)
+    unreachable = np.nonzero((field < 0) & ~np.asarray(planner.obstacle_grid, dtype=bool).ravel())[0]
+    if len(unreachable):
+        cell = int(unreachable[len(unreachable) // 2])
+        queries['a_star_unreachable'] = (cell_coord(planner, start),
+                                         cell_coord(planner, (cell % planner.grid_width, cell // planner.grid_width)))
+    return queries
+
+
+def run_case(dataset, data_dir, grid_size, repeat, phases):
+    """一个数据集、一个网格边长下的各阶段计时，返回结果记录列表"""
+    planner = quiet(DroneRoutePlanner, data_dir, cache_dir=None, grid_size=grid_size)
+    info = {
+        'dataset': dataset,
+        'grid_size': grid_size,
+        'grid': [planner.grid_width, planner.grid_height],
+        'buildings': len(planner.buildings),
+        'sources': len(planner.canteens) + len(planner.gates),
+        'targets': len(planner.dorms),
+    }
+    timings = {}
+    if 'load_data' in phases:
+        timings['load_data'], _ = measure(lambda: reload_data(planner), repeat)
+    if 'create_obstacle_grid' in phases:
+        timings['create_obstacle_grid'], _ = measure(planner.create_obstacle_grid, repeat)
+    # 第一次访问 obstacle_grid 时才创建网格，进度输出同样屏蔽
+    for phase, (start, goal) in quiet(select_queries, planner).items():
+        if phase not in phases:
+            continue
+        if phase == 'a_star_unreachable':
+            # 只计严格网格上失败的搜索；planner.a_star 随后还会尝试宽松网格和直线回退
+            search = planner.grid_search
+            cells = (planner.coord_to_grid(start), planner.coord_to_grid(goal))
+            timings[phase], _ = measure(lambda: search.astar(*cells), repeat)
+        else:
+            timings[phase], _ = measure(lambda: planner.a_star(start, goal), repeat)
+    routes = None
+    if 'plan_routes' in phases or 'analyze_routes' in phases:
+        plan_timings, routes = measure(planner.plan_routes, repeat)
+        if 'plan_routes' in phases:
+            timings['plan_routes'] = plan_timings
+        info['routes'] = len(routes['canteen_to_dorm']) + len(routes['gate_to_dorm'])
+    if 'analyze_routes' in phases:
+        timings['analyze_routes'], _ = measure(lambda: planner.analyze_routes(routes), repeat)
+
+    return [dict(info, phase=phase, min=min(values), median=statistics.median(values), repeat=len(values))
+            for phase, values in timings.items()]
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def result_key(record):
+    return record['dataset'], record['grid_size'], record['phase']
+
+
+def compare(results, baseline, threshold, min_delta):
+    """与基线逐项比较中位数，返回回归的记录 [(记录, 基线记录, 比值)]"""
+    previous = {result_key(record): record for record in baseline['results']}
+    regressions = []
+    print(f"\n{'数据集':>10} {'网格边长':>9} {'阶段':>20} {'基线(ms)':>10} {'本次(ms)':>10} {'比值':>7}")
+    for record in results:
+        base = previous.get(result_key(record))
+        if base is None:
+            continue
+        ratio = record['median'] / base['median'] if base['median'] > 0 else float('inf')
+        regressed = ratio > 1 + threshold and record['median'] - base['median'] > min_delta
+        mark = '  回归' if regressed else ''
+        print(f"{record['dataset']:>10} {record['grid_size']:>9g} {record['phase']:>20} "
+              f"{base['median'] * 1000:10.2f} {record['median'] * 1000:10.2f} {ratio:7.2f}{mark}")
+        if regressed:
+            regressions.append((record, base, ratio))
+    missing = set(previous) - {result_key(record) for record in results}
+    if missing:
+        print(f"基线中有 {len(missing)} 项本次未测量")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="航线规划分阶段基准")
+    parser.add_argument('--datasets', default='small,medium',
+                        help="逗号分隔：预设规模 (%s)、建筑:运动场所:起点:宿舍，或 data" % ', '.join(PRESETS))
+    parser.add_argument('--grid-sizes', default='0.0001', help="逗号分隔的网格边长（度）")
+    parser.add_argument('--phases', default=','.join(PHASES), help="逗号分隔的阶段，默认全部")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument('--work-dir', help="合成数据写入的目录，默认临时目录")
+    parser.add_argument('--output', help="结果 JSON 文件")
+    parser.add_argument('--baseline', help="与之比较的基线结果 JSON 文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="中位数变慢超过该比例视为回归")
+    parser.add_argument('--min-delta', type=float, default=0.002, help="变慢不足该秒数时不视为回归（计时噪声）")
+    args = parser.parse_args()
+
+    phases = [phase for phase in args.phases.split(',') if phase]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"未知的阶段: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = args.work_dir or tmp
+        for dataset in args.datasets.split(','):
+            data_dir = prepare_dataset(dataset, work_dir, args.seed)
+            for grid_size in (float(value) for value in args.grid_sizes.split(',')):
+                records = run_case(dataset, data_dir, grid_size, args.repeat, phases)
+                for record in records:
+                    print(f"{dataset:>10} {grid_size:>9g} {'x'.join(map(str, record['grid'])):>9} "
+                          f"{record['phase']:>20}: 最小 {record['min'] * 1000:9.2f} ms, "
+                          f"中位数 {record['median'] * 1000:9.2f} ms")
+                results.extend(records)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'seed': args.seed, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n发现 {len(regressions)} 项性能回归（阈值 {args.threshold:.0%}）")
+            sys.exit(1)
+        print("\n没有发现性能回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+合成校园数据生成器：按指定规模随机生成建筑、运动场所、食堂、宿舍和校门，
+以与 data/ 相同的文件布局（gates / canteens / dorms / buildings / sports / campus_boundary .geojson）写出，
+供 DroneRoutePlanner(data_dir=...) 直接读取。同一组参数与随机种子生成的数据完全相同。
+
+校园为以 origin 为西南角的八边形，面积随建筑数线性增长（建筑密度与清华数据相当）。
+另放一个四面由建筑围合的封闭院落，院落内部不可达，用于测量不可达查询的耗时。
+
+用法: python benchmarks/synthetic_campus.py OUT_DIR [--buildings 600] [--sports 55] [--sources 26] [--targets 75]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+# 与清华数据规模相当：约 600 栋建筑分布在 0.022 x 0.020 度的范围内
+REFERENCE_BUILDINGS = 600
+REFERENCE_EXTENT = (0.022, 0.020)
+
+# 预设规模: 名称 -> (建筑数, 运动场所数, 起点数（食堂 + 校门）, 宿舍数)
+PRESETS = {
+    'small': (150, 15, 12, 30),
+    'medium': (600, 55, 26, 75),
+    'large': (2400, 200, 52, 300),
+}
+
+CRS = {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:OGC:1.3:CRS84'}}
+
+
+def rectangle(x, y, width, height):
+    """以 (x, y) 为西南角的矩形外环（闭合）"""
+    return [[x, y], [x + width, y], [x + width, y + height], [x, y + height], [x, y]]
+
+
+def polygon_feature(ring, properties=None):
+    return {'type': 'Feature', 'properties': properties or {},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[round(v, 7) for v in p] for p in ring]]}}
+
+
+def point_feature(point, properties=None):
+    return {'type': 'Feature', 'properties': properties or {},
+            'geometry': {'type': 'Point', 'coordinates': [round(v, 7) for v in point]}}
+
+
+def feature_collection(name, features):
+    return {'type': 'FeatureCollection', 'name': name, 'crs': CRS, 'features': features}
+
+
+def generate_campus(buildings=600, sports=55, sources=26, targets=75, seed=0, origin=(116.30, 39.99)):
+    """
+    生成合成校园，返回 {图层名: FeatureCollection}
+    sources 个起点中约四分之一为校门（位于边界上），其余为食堂
+    """
+    rng = np.random.default_rng(seed)
+    scale = np.sqrt(max(buildings, 1) / REFERENCE_BUILDINGS)
+    width, height = REFERENCE_EXTENT[0] * scale, REFERENCE_EXTENT[1] * scale
+    x0, y0 = origin
+    cut = 0.15 * min(width, height)
+
+    # 八边形校园边界（逆时针）
+    boundary = [[x0 + cut, y0], [x0 + width - cut, y0], [x0 + width, y0 + cut], [x0 + width, y0 + height - cut],
+                [x0 + width - cut, y0 + height], [x0 + cut, y0 + height], [x0, y0 + height - cut], [x0, y0 + cut],
+                [x0 + cut, y0]]
+
+    def random_corner(w, h, margin=0.0):
+        # 在边界包围盒内取矩形西南角，剔除落在切角之外的矩形
+        while True:
+            x = rng.uniform(x0 + margin, x0 + width - w - margin)
+            y = rng.uniform(y0 + margin, y0 + height - h - margin)
+            cx, cy = x + w / 2 - x0, y + h / 2 - y0
+            if (min(cx, width - cx) + min(cy, height - cy)) >= cut:
+                return x, y
+
+    # 封闭院落：四面墙体各厚 2.5 个网格，内部 6 x 6 个网格
+    wall, inner = 0.00025, 0.0006
+    cx, cy = random_corner(inner + 2 * wall, inner + 2 * wall, margin=0.002 * scale)
+    court = [
+        rectangle(cx, cy, inner + 2 * wall, wall),
+        rectangle(cx, cy + inner + wall, inner + 2 * wall, wall),
+        rectangle(cx, cy, wall, inner + 2 * wall),
+        rectangle(cx + inner + wall, cy, wall, inner + 2 * wall),
+    ]
+
+    building_features = [polygon_feature(ring, {'building': 'yes'}) for ring in court]
+    for k in range(max(buildings - len(court), 0)):
+        w, h = rng.uniform(0.0002, 0.0008), rng.uniform(0.0001, 0.0004)
+        properties = {'building': 'yes'}
+        # 约一半的建筑标注层数，其余按默认高度处理
+        if rng.random() < 0.5:
+            properties['building:levels'] = str(int(rng.integers(2, 21)))
+        building_features.append(polygon_feature(rectangle(*random_corner(w, h), w, h), properties))
+
+    sport_features = []
+    for k in range(sports):
+        w, h = rng.uniform(0.0002, 0.0008), rng.uniform(0.0002, 0.0006)
+        sport_features.append(polygon_feature(rectangle(*random_corner(w, h), w, h), {'name': f'运动场{k + 1}'}))
+
+    gate_count = max(1, sources // 4)
+    canteen_count = max(sources - gate_count, 1)
+    canteen_features = []
+    for k in range(canteen_count):
+        w, h = rng.uniform(0.0002, 0.0004), rng.uniform(0.0001, 0.0003)
+        canteen_features.append(polygon_feature(rectangle(*random_corner(w, h), w, h), {'name': f'食堂{k + 1}'}))
+    dorm_features = []
+    for k in range(targets):
+        w, h = rng.uniform(0.0002, 0.0005), rng.uniform(0.0001, 0.0002)
+        dorm_features.append(polygon_feature(rectangle(*random_corner(w, h), w, h), {'name': f'宿舍{k + 1}'}))
+
+    # 校门均匀分布在边界上
+    ring = np.array(boundary)
+    edges = np.hypot(*np.diff(ring, axis=0).T)
+    cumulative = np.concatenate(([0.0], np.cumsum(edges)))
+    gate_features = []
+    for t in (np.arange(gate_count) + rng.random()) / gate_count * cumulative[-1]:
+        edge = min(int(np.searchsorted(cumulative, t, side='right')) - 1, len(edges) - 1)
+        ratio = (t - cumulative[edge]) / edges[edge]
+        gate_features.append(point_feature(ring[edge] + (ring[edge + 1] - ring[edge]) * ratio))
+
+    return {
+        'gates': feature_collection('gates', gate_features),
+        'canteens': feature_collection('canteens', canteen_features),
+        'dorms': feature_collection('dorms', dorm_features),
+        'buildings': feature_collection('buildings', building_features),
+        'sports': feature_collection('sports', sport_features),
+        'campus_boundary': feature_collection('campus_boundary', [polygon_feature(boundary, {'name': '合成校园'})]),
+    }
+
+
+def write_campus(out_dir, layers):
+    """按 data/ 的布局写出各图层"""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, data in layers.items():
+        with open(os.path.join(out_dir, f"{name}.geojson"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成校园 GeoJSON 数据")
+    parser.add_argument('out_dir')
+    parser.add_argument('--preset', choices=sorted(PRESETS), help="预设规模，覆盖下面的数量参数")
+    parser.add_argument('--buildings', type=int, default=600)
+    parser.add_argument('--sports', type=int, default=55)
+    parser.add_argument('--sources', type=int, default=26, help="起点数（食堂 + 校门）")
+    parser.add_argument('--targets', type=int, default=75, help="宿舍数")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = PRESETS[args.preset] if args.preset else (args.buildings, args.sports, args.sources, args.targets)
+    write_campus(args.out_dir, generate_campus(*counts, seed=args.seed))
+    print(f"合成校园已写入 {args.out_dir}: {counts[0]} 栋建筑, {counts[1]} 个运动场所, "
+          f"{counts[2]} 个起点, {counts[3]} 个宿舍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+批量订单调度
+
+起点（食堂、校门）x 宿舍的航线长度矩阵由规划好的航线预先计算（route_analytics.od_length_matrix），
+宿舍之间没有规划航线，按直线距离乘以从航线矩阵估计的绕行系数（航线长度 / 直线距离的中位数）。
+
+每个调度周期：
+1. 订单按起终点坐标归到最近的起点和宿舍；
+2. 同一起点、同一宿舍的订单先按无人机最大载量装满直飞，余下的按宿舍合并为节点，
+   在每个起点上用开放式 Clarke-Wright 节约算法合并成多点投递的航次（载量约束）；
+3. 航次分配给无人机：代价为无人机空飞到起点的时间加航次时间，先按单位订单代价贪心分配（互为最优匹配），
+   再做交换/替换局部搜索，直到没有改进或用完时间预算。
+时间预算覆盖整个周期：超时后节约算法不再合并（余下的节点各自成为航次），贪心在当前轮结束后停止
+（至少执行一轮），局部搜索不再开始新的改进。
+无人机数量不足时，没有分到的航次的订单留到下一个周期。
+"""
+import time
+
+import numpy as np
+
+from route_analytics import od_length_matrix, KM_PER_DEGREE
+
+
+def planar_km(a, b):
+    """
+    点集 a (n, 2) 与 b (m, 2)（经度, 纬度）两两之间的距离（公里），返回 (n, m)
+    与 calculate_route_length 使用相同的局部平面近似
+    """
+    a = np.asarray(a, dtype=float).reshape(-1, 2)
+    b = np.asarray(b, dtype=float).reshape(-1, 2)
+    mean_lat = (a[:, None, 1] + b[None, :, 1]) / 2
+    dx = (b[None, :, 0] - a[:, None, 0]) * KM_PER_DEGREE * np.cos(np.radians(mean_lat))
+    dy = (b[None, :, 1] - a[:, None, 1]) * KM_PER_DEGREE
+    return np.sqrt(dx * dx + dy * dy)
+
+
+class DistanceMatrix:
+    def __init__(self, sources, targets, lengths):
+        """
+        sources: (n, 2) 起点坐标，targets: (m, 2) 宿舍坐标
+        lengths: (n, m) 航线长度（公里），没有航线的为 inf
+        """
+        self.sources = np.asarray(sources, dtype=float).reshape(-1, 2)
+        self.targets = np.asarray(targets, dtype=float).reshape(-1, 2)
+        self.lengths = np.asarray(lengths, dtype=float)
+
+        straight = planar_km(self.sources, self.targets)
+        valid = np.isfinite(self.lengths) & (straight > 0)
+        ratios = self.lengths[valid] / straight[valid]
+        self.detour = max(1.0, float(np.median(ratios))) if len(ratios) else 1.0
+        self.target_lengths = planar_km(self.targets, self.targets) * self.detour
+
+    @classmethod
+    def from_routes(cls, planner, routes):
+        """由 plan_routes 的结果构造（route_analytics.od_length_matrix）"""
+        return cls(
+            [place['coordinates'] for place in planner.canteens + planner.gates],
+            [place['coordinates'] for place in planner.dorms],
+            od_length_matrix(planner, routes)
+        )
+
+    def nearest_sources(self, coords):
+        return np.argmin(planar_km(coords, self.sources), axis=1)
+
+    def nearest_targets(self, coords):
+        return np.argmin(planar_km(coords, self.targets), axis=1)
+
+    def tour_length(self, source, stops):
+        """从起点依次飞到各宿舍的长度（公里），不返回起点"""
+        length = self.lengths[source, stops[0]]
+        for a, b in zip(stops, stops[1:]):
+            length += self.target_lengths[a, b]
+        return length
+
+
+class Dispatcher:
+    def __init__(self, matrix, speed=10.0, service_time=30.0, time_budget=1.0, tolerance=0.001):
+        """
+        matrix: DistanceMatrix
+        speed: 无人机速度（米/秒），与前端一致
+        service_time: 每个投递点的停留时间（秒）
+        time_budget: 每个调度周期的计算时间上限（秒），约束节约合并、贪心分配和局部搜索
+        tolerance: 无人机与宿舍坐标相差小于该值（度）时视为停在宿舍，空飞按航线长度计算
+        """
+        self.matrix = matrix
+        self.speed = speed
+        self.service_time = service_time
+        self.time_budget = time_budget
+        self.tolerance = tolerance
+
+    def dispatch(self, orders, drones):
+        """
+        orders: [{'id', 'start': [lon, lat], 'end': [lon, lat]}, ...]
+        drones: [{'id', 'position': [lon, lat], 'capacity': 单次最多携带的订单数,
+                  'available_in': 距离空闲还有多少秒（可省略）}, ...]
+        返回 {'assignments': [...], 'unassigned': [订单 id, ...], 'stats': {...}}
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_budget
+        matrix = self.matrix
+        unassigned = []
+        if not orders or not drones:
+            return {'assignments': [], 'unassigned': [order['id'] for order in orders],
+                    'stats': {'orders': len(orders), 'tours': 0, 'assigned_orders': 0}}
+
+        sources = matrix.nearest_sources([order['start'] for order in orders])
+        targets = matrix.nearest_targets([order['end'] for order in orders])
+        capacity = max(int(drone.get('capacity', 1)) for drone in drones)
+
+        groups = {}
+        for order, s, t in zip(orders, sources, targets):
+            if np.isfinite(matrix.lengths[s, t]):
+                groups.setdefault(int(s), {}).setdefault(int(t), []).append(order['id'])
+            else:
+                unassigned.append(order['id'])
+
+        tours = []
+        for source, by_target in groups.items():
+            tours.extend(self.build_tours(source, by_target, capacity, deadline))
+
+        assignment, reposition, costs = self.assign(tours, drones, deadline)
+
+        assignments = []
+        assigned = set()
+        for d, k in assignment:
+            drone, tour = drones[d], tours[k]
+            assigned.add(k)
+            assignments.append({
+                'drone': drone['id'],
+                'source': matrix.sources[tour['source']].tolist(),
+                'orders': tour['orders'],
+                'stops': [matrix.targets[t].tolist() for t in tour['stops']],
+                'distance': float(reposition[d, tour['source']] + tour['length']),
+                'duration': float(costs[d, k]),
+                'end_position': matrix.targets[tour['stops'][-1]].tolist()
+            })
+        for k, tour in enumerate(tours):
+            if k not in assigned:
+                unassigned.extend(tour['orders'])
+
+        return {
+            'assignments': assignments,
+            'unassigned': unassigned,
+            'stats': {
+                'orders': len(orders),
+                'tours': len(tours),
+                'assigned_orders': sum(len(item['orders']) for item in assignments),
+                'total_duration': float(sum(item['duration'] for item in assignments)),
+                'elapsed': time.perf_counter() - started
+            }
+        }
+
+    def build_tours(self, source, by_target, capacity, deadline=None):
+        """
+        一个起点的航次：同一宿舍满载的订单直飞，余量按开放式节约算法合并
+        deadline: time.perf_counter() 的截止时间，超过后停止合并
+        返回 [{'source', 'stops': [宿舍序号], 'orders': [订单 id], 'length'}]
+        """
+        matrix = self.matrix
+        tours = []
+        nodes = []
+        for target, order_ids in by_target.items():
+            full = len(order_ids) - len(order_ids) % capacity
+            for k in range(0, full, capacity):
+                tours.append({'stops': [target], 'orders': order_ids[k:k + capacity]})
+            if full < len(order_ids):
+                nodes.append((target, order_ids[full:]))
+
+        # 每个节点初始为单独的航次；合并 A 的末站与 B 的首站节约 L[s, b] - D[a, b]
+        routes = {k: [k] for k in range(len(nodes))}
+        demand = {k: len(nodes[k][1]) for k in range(len(nodes))}
+        head_of = {k: k for k in range(len(nodes))}
+        tail_of = {k: k for k in range(len(nodes))}
+        if len(nodes) > 1:
+            stops = np.array([target for target, _ in nodes])
+            savings = matrix.lengths[source, stops][None, :] - matrix.target_lengths[np.ix_(stops, stops)]
+            np.fill_diagonal(savings, -np.inf)
+            candidates = np.argwhere(savings > 0)
+            order = np.argsort(-savings[candidates[:, 0], candidates[:, 1]], kind='stable')
+            for step, (a, b) in enumerate(candidates[order]):
+                if deadline is not None and step % 256 == 0 and time.perf_counter() >= deadline:
+                    break
+                a, b = int(a), int(b)
+                # a 必须是某个航次的末站，b 必须是另一个航次的首站
+                ra, rb = tail_of.get(a), head_of.get(b)
+                if ra is None or rb is None or ra == rb or demand[ra] + demand[rb] > capacity:
+                    continue
+                routes[ra].extend(routes.pop(rb))
+                demand[ra] += demand.pop(rb)
+                del tail_of[a], head_of[b]
+                tail_of[routes[ra][-1]] = ra
+
+        for nodes_in_route in routes.values():
+            tours.append({
+                'stops': [nodes[k][0] for k in nodes_in_route],
+                'orders': [order_id for k in nodes_in_route for order_id in nodes[k][1]]
+            })
+        for tour in tours:
+            tour['source'] = source
+            tour['length'] = float(matrix.tour_length(source, tour['stops']))
+        return tours
+
+    def assign(self, tours, drones, deadline):
+        """
+        航次分配：按单位订单代价贪心，再做交换/替换局部搜索
+        返回 ([(无人机序号, 航次序号)], 空飞距离 (无人机, 起点)（公里）, 代价 (无人机, 航次)（秒）)
+        """
+        matrix = self.matrix
+        if not tours:
+            return [], None, None
+
+        positions = np.array([drone['position'] for drone in drones], dtype=float)
+        straight = planar_km(positions, matrix.sources) * matrix.detour
+        # 停在宿舍的无人机空飞回起点按航线长度（航线双向等长）
+        target_distance = planar_km(positions, matrix.targets)
+        nearest = np.argmin(target_distance, axis=1)
+        at_target = target_distance[np.arange(len(drones)), nearest] < self.tolerance * KM_PER_DEGREE
+        routed = matrix.lengths[:, nearest].T
+        reposition = np.where(at_target[:, None] & np.isfinite(routed), routed, straight)
+
+        tour_source = np.array([tour['source'] for tour in tours])
+        tour_length = np.array([tour['length'] for tour in tours])
+        tour_size = np.array([len(tour['orders']) for tour in tours])
+        tour_stops = np.array([len(tour['stops']) for tour in tours])
+        drone_capacity = np.array([int(drone.get('capacity', 1)) for drone in drones])
+        available = np.array([float(drone.get('available_in', 0.0)) for drone in drones])
+
+        # 代价：无人机完成该航次所需的时间（秒）
+        costs = (available[:, None]
+                 + (reposition[:, tour_source] + tour_length[None, :]) * 1000.0 / self.speed
+                 + tour_stops[None, :] * self.service_time)
+        costs[drone_capacity[:, None] < tour_size[None, :]] = np.inf
+
+        # 贪心：按单位订单代价，每轮同时指派互为最优的 (无人机, 航次)，
+        # 全局最小的一对总是互为最优，因此每轮至少指派一对
+        per_order = costs / tour_size[None, :]
+        drone_of = np.full(len(tours), -1)
+        tour_of = np.full(len(drones), -1)
+        while True:
+            free_drones = np.nonzero(tour_of < 0)[0]
+            free_tours = np.nonzero(drone_of < 0)[0]
+            if not len(free_drones) or not len(free_tours):
+                break
+            sub = per_order[np.ix_(free_drones, free_tours)]
+            best_tour = np.argmin(sub, axis=1)
+            best_drone = np.argmin(sub, axis=0)
+            rows = np.arange(len(free_drones))
+            mutual = (best_drone[best_tour] == rows) & np.isfinite(sub[rows, best_tour])
+            if not mutual.any():
+                break
+            d = free_drones[mutual]
+            k = free_tours[best_tour[mutual]]
+            tour_of[d] = k
+            drone_of[k] = d
+            if time.perf_counter() >= deadline:
+                break
+
+        # 局部搜索：两架无人机交换航次，或把航次换给更合适的空闲无人机
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            busy = np.nonzero(tour_of >= 0)[0]
+            idle = np.nonzero(tour_of < 0)[0]
+            for i in range(len(busy)):
+                if time.perf_counter() >= deadline:
+                    break
+                a = busy[i]
+                ka = tour_of[a]
+                current = costs[a, ka] + costs[busy, tour_of[busy]]
+                swapped = costs[a, tour_of[busy]] + costs[busy, ka]
+                gains = current - swapped
+                best = int(np.argmax(gains))
+                if gains[best] > 1e-9:
+                    b = busy[best]
+                    tour_of[a], tour_of[b] = tour_of[b], ka
+                    drone_of[tour_of[a]], drone_of[ka] = a, b
+                    improved = True
+                    continue
+                if len(idle):
+                    replace = costs[idle, ka]
+                    best = int(np.argmin(replace))
+                    if replace[best] < costs[a, ka] - 1e-9:
+                        d = idle[best]
+                        tour_of[d], tour_of[a] = ka, -1
+                        drone_of[ka] = d
+                        busy[i], idle[best] = d, a
+                        improved = True
+
+        pairs = [(int(d), int(tour_of[d])) for d in range(len(drones)) if tour_of[d] >= 0]
+        return pairs, reposition, costs
@@ -0,0 +1,222 @@
+"""
+列式几何数据存储
+
+每个 GeoJSON 图层只解析一次，所有要素的坐标存放在一个连续的 (N, 2) float64 数组中：
+ring_offsets[r]:ring_offsets[r + 1] 是第 r 个环（点要素为单个坐标、线要素为整条线）的坐标，
+feature_offsets[f]:feature_offsets[f + 1] 是第 f 个要素的环（多边形第一个环为外环）。
+另存每个要素的几何类型和包围盒 [minx, maxx, miny, maxy]（与 rasterize.polygon_bbox 顺序一致），
+要素属性和要素上的其他字段（id、bbox 等）保留原样，写回 GeoJSON 时原样输出。
+按序号取环返回坐标数组的视图，不复制。不支持的几何类型（MultiPolygon 等）直接报错，不会被静默丢弃。
+
+整个存储可以序列化为一个 .npz 文件（坐标和索引是二进制数组，属性为一段 JSON 文本），
+放在缓存目录下按输入 GeoJSON 内容哈希命名的条目目录中，与障碍物网格条目一起按最近使用时间淘汰；
+再次运行时直接读取，坐标不再经过 JSON 解析。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from grid_cache import GridCache, file_digest
+
+# 存储格式版本，格式变化时递增，使旧文件失效
+STORE_VERSION = 2
+
+GEOMETRY_TYPES = ('Point', 'LineString', 'Polygon')
+POINT, LINESTRING, POLYGON = range(len(GEOMETRY_TYPES))
+
+
+class GeometryLayer:
+    def __init__(self, coords, ring_offsets, feature_offsets, kinds, bboxes, properties, metadata=None,
+                 extras=None):
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.feature_offsets = feature_offsets
+        self.kinds = kinds
+        self.bboxes = bboxes
+        self.properties = properties
+        # 每个要素除 type/properties/geometry 外的字段（id、bbox 等），写回 GeoJSON 时使用
+        self.extras = extras if extras is not None else [{} for _ in properties]
+        # FeatureCollection 的其他字段（name、crs 等），写回 GeoJSON 时使用
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_geojson(cls, data):
+        """由已解析的 FeatureCollection 构造，遇到不支持的几何类型时抛出 ValueError"""
+        chunks = []
+        ring_lengths = []
+        ring_counts = []
+        kinds = []
+        properties = []
+        extras = []
+        for position, feature in enumerate(data.get('features', [])):
+            geometry = feature.get('geometry') or {}
+            kind = geometry.get('type')
+            if kind not in GEOMETRY_TYPES:
+                raise ValueError(f"第{position + 1}个要素的几何类型 {kind} 不受支持（仅支持 {'/'.join(GEOMETRY_TYPES)}）")
+            coordinates = geometry['coordinates']
+            if kind == 'Point':
+                rings = [[coordinates]]
+            elif kind == 'LineString':
+                rings = [coordinates]
+            else:
+                rings = coordinates
+            for ring in rings:
+                chunks.append(np.asarray(ring, dtype=np.float64).reshape(-1, 2))
+                ring_lengths.append(len(ring))
+            ring_counts.append(len(rings))
+            kinds.append(GEOMETRY_TYPES.index(kind))
+            properties.append(feature.get('properties') or {})
+            extras.append({key: value for key, value in feature.items()
+                           if key not in ('type', 'properties', 'geometry')})
+
+        coords = np.concatenate(chunks) if chunks else np.zeros((0, 2))
+        ring_offsets = np.zeros(len(ring_lengths) + 1, dtype=np.int64)
+        np.cumsum(ring_lengths, out=ring_offsets[1:])
+        feature_offsets = np.zeros(len(ring_counts) + 1, dtype=np.int64)
+        np.cumsum(ring_counts, out=feature_offsets[1:])
+
+        # 每个要素的包围盒：按坐标所属要素做分组最值
+        bboxes = np.zeros((len(kinds), 4))
+        if len(kinds):
+            starts = ring_offsets[feature_offsets[:-1]]
+            bboxes[:, 0] = np.minimum.reduceat(coords[:, 0], starts)
+            bboxes[:, 1] = np.maximum.reduceat(coords[:, 0], starts)
+            bboxes[:, 2] = np.minimum.reduceat(coords[:, 1], starts)
+            bboxes[:, 3] = np.maximum.reduceat(coords[:, 1], starts)
+
+        metadata = {key: value for key, value in data.items() if key not in ('features', 'type')}
+        return cls(coords, ring_offsets, feature_offsets, np.array(kinds, dtype=np.int8), bboxes,
+                   properties, metadata, extras)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def ring(self, feature, index=0):
+        """第 feature 个要素的第 index 个环，(n, 2) 视图"""
+        r = self.feature_offsets[feature] + index
+        return self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+
+    def point(self, feature):
+        return self.ring(feature)[0]
+
+    def features(self, kind):
+        """指定几何类型的要素序号"""
+        return np.nonzero(self.kinds == kind)[0]
+
+    def geometry(self, feature):
+        """还原为 GeoJSON 几何对象"""
+        kind = GEOMETRY_TYPES[self.kinds[feature]]
+        if kind == 'Point':
+            coordinates = self.point(feature).tolist()
+        elif kind == 'LineString':
+            coordinates = self.ring(feature).tolist()
+        else:
+            count = self.feature_offsets[feature + 1] - self.feature_offsets[feature]
+            coordinates = [self.ring(feature, k).tolist() for k in range(count)]
+        return {'type': kind, 'coordinates': coordinates}
+
+    def to_geojson(self, order=None):
+        """还原为 FeatureCollection，order 为要素序号顺序（默认原顺序）"""
+        order = range(len(self)) if order is None else order
+        data = {'type': 'FeatureCollection'}
+        data.update(self.metadata)
+        features = []
+        for k in order:
+            feature = {'type': 'Feature'}
+            feature.update(self.extras[k])
+            feature['properties'] = self.properties[k]
+            feature['geometry'] = self.geometry(k)
+            features.append(feature)
+        data['features'] = features
+        return data
+
+
+class GeometryStore:
+    def __init__(self, layers):
+        self.layers = layers
+
+    def __getitem__(self, name):
+        return self.layers[name]
+
+    def __contains__(self, name):
+        return name in self.layers
+
+    @property
+    def nbytes(self):
+        return sum(
+            layer.coords.nbytes + layer.ring_offsets.nbytes + layer.feature_offsets.nbytes + layer.bboxes.nbytes
+            for layer in self.layers.values()
+        )
+
+    @classmethod
+    def from_files(cls, data_dir, names):
+        layers = {}
+        for name in names:
+            with open(os.path.join(data_dir, f"{name}.geojson"), 'r', encoding='utf-8') as f:
+                layers[name] = GeometryLayer.from_geojson(json.load(f))
+        return cls(layers)
+
+    @classmethod
+    def load(cls, data_dir, names, cache_dir=None):
+        """
+        读取 data_dir 下的 <name>.geojson 图层
+        提供 cache_dir 时优先读取 cache_dir/geometry_<输入内容哈希>/store.npz，缺失时解析 GeoJSON 并写入，
+        写入后按 GridCache 的规则淘汰旧条目
+        """
+        if not cache_dir:
+            return cls.from_files(data_dir, names)
+
+        digest = hashlib.sha1(f"v{STORE_VERSION}".encode())
+        for name in names:
+            digest.update(name.encode())
+            digest.update(file_digest(os.path.join(data_dir, f"{name}.geojson")).encode())
+        key = f"geometry_{digest.hexdigest()[:12]}"
+        cache = GridCache(cache_dir)
+        entry = cache.entry_dir(key)
+        path = os.path.join(entry, 'store.npz')
+        if os.path.exists(path):
+            try:
+                store = cls.read(path)
+                # 更新条目目录的修改时间，淘汰时视为最近使用
+                os.utime(entry)
+                return store
+            except (OSError, ValueError, KeyError):
+                pass
+        store = cls.from_files(data_dir, names)
+        store.write(path)
+        cache.evict(keep=key)
+        return store
+
+    def write(self, path):
+        """序列化为单个 .npz 文件（先写临时文件再重命名）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {}
+        header = {'version': STORE_VERSION, 'layers': {}}
+        for name, layer in self.layers.items():
+            for field in ('coords', 'ring_offsets', 'feature_offsets', 'kinds', 'bboxes'):
+                arrays[f"{name}/{field}"] = getattr(layer, field)
+            header['layers'][name] = {
+                'properties': layer.properties, 'metadata': layer.metadata, 'extras': layer.extras
+            }
+        arrays['header'] = np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path):
+        with np.load(path) as data:
+            header = json.loads(data['header'].tobytes().decode('utf-8'))
+            if header.get('version') != STORE_VERSION:
+                raise ValueError("几何存储版本不匹配")
+            layers = {}
+            for name, info in header['layers'].items():
+                layers[name] = GeometryLayer(
+                    data[f"{name}/coords"], data[f"{name}/ring_offsets"], data[f"{name}/feature_offsets"],
+                    data[f"{name}/kinds"], data[f"{name}/bboxes"], info['properties'], info['metadata'],
+                    info['extras']
+                )
+        return cls(layers)
@@ -0,0 +1,182 @@
+"""
+障碍物网格磁盘缓存
+
+每个缓存条目是 cache_dir 下以键命名的目录，包含 meta.json 和若干 .npy 数组。
+数组以 mmap 方式只读加载，同一台机器上的多个进程共享操作系统页缓存。
+键由输入 GeoJSON 的内容哈希与网格参数共同决定，数据或参数变化后自动失效；
+旧条目按最近使用时间淘汰，总大小不超过 max_bytes。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# 缓存格式版本，格式或栅格化规则变化时递增，使旧条目全部失效
+CACHE_VERSION = 1
+
+# 默认缓存目录，航线规划与 sort_dorms 等脚本共用
+DEFAULT_CACHE_DIR = ".grid_cache"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GridCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=512 * 1024 * 1024):
+        """初始化网格缓存"""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, source_files, params):
+        """根据输入文件内容和参数生成缓存键"""
+        digest = hashlib.sha1()
+        digest.update(f"v{CACHE_VERSION}".encode())
+        for path in source_files:
+            digest.update(os.path.basename(path).encode())
+            digest.update(file_digest(path).encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        """
+        加载缓存条目，返回 (meta, arrays)；未命中返回 None
+        arrays 中的数组均为只读 mmap
+        """
+        entry = self.entry_dir(key)
+        meta_path = os.path.join(entry, 'meta.json')
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != CACHE_VERSION:
+                self.misses += 1
+                return None
+            arrays = {}
+            for name in os.listdir(entry):
+                if name.endswith('.npy'):
+                    arrays[name[:-4]] = np.load(os.path.join(entry, name), mmap_mode='r')
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._touch(entry)
+        return meta, arrays
+
+    def store(self, key, meta, arrays):
+        """写入缓存条目（先写临时目录再原子重命名），返回以 mmap 方式重新打开的数组"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = self.entry_dir(key)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=self.cache_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(dict(meta, version=CACHE_VERSION), f, ensure_ascii=False)
+            if os.path.isdir(entry) and not os.path.exists(os.path.join(entry, 'meta.json')):
+                # 残缺条目（写入中断等），直接替换
+                shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.rename(tmp_dir, entry)
+            except OSError:
+                # 其他进程已写入同一条目，使用已有结果
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.evict(keep=key)
+        return {
+            name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r')
+            for name in arrays
+        }
+
+    def load_array(self, key, name):
+        """读取条目中的单个附加数组（如预处理表），不存在返回 None"""
+        path = os.path.join(self.entry_dir(key), f"{name}.npy")
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        self._touch(self.entry_dir(key))
+        return array
+
+    def store_array(self, key, name, array):
+        """向已有条目追加一个数组，返回 mmap 数组"""
+        entry = self.entry_dir(key)
+        if not os.path.isdir(entry):
+            return array
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.npy', dir=entry)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, os.path.join(entry, f"{name}.npy"))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict(keep=key)
+        return np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r')
+
+    def evict(self, keep=None):
+        """
+        按最近使用时间淘汰条目，直到总大小不超过 max_bytes
+        cache_dir 下的其他目录（如几何存储）和散落文件（旧版本遗留）同样计入并参与淘汰
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        total = 0
+        for key in os.listdir(self.cache_dir):
+            entry = self.entry_dir(key)
+            if key.startswith('.'):
+                continue
+            try:
+                if os.path.isdir(entry):
+                    size = sum(
+                        os.path.getsize(os.path.join(entry, name))
+                        for name in os.listdir(entry)
+                    )
+                else:
+                    size = os.path.getsize(entry)
+                mtime = os.path.getmtime(entry)
+            except OSError:
+                # 其他进程正在淘汰或替换该条目
+                continue
+            entries.append((mtime, key, size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self.entry_dir(key)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry)
+                except OSError:
+                    pass
+            total -= size
+
+    def _touch(self, entry):
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
@@ -0,0 +1,297 @@
+"""
+基于扁平数组的网格搜索核心
+
+网格点 (x, y) 的扁平索引为 y * width + x。代价、父节点和关闭标记都保存在按该索引
+排列的 NumPy 数组中，通过 memoryview 做逐元素读写以避免 NumPy 标量开销。
+每个网格点预先计算 8 位邻居掩码（越界或障碍的方向位为 0），掩码值直接映射到
+(索引偏移, 步长代价) 元组，扩展节点时不再逐个判断边界和障碍物。
+开放表使用惰性删除的二叉堆：代价变小时直接再次入堆，出堆时跳过已关闭的旧条目。
+
+代价模型为 (东西向, 南北向, 斜向) 三个步长代价。米制模型（metric_costs）按网格中心纬度
+把经度方向的步长乘以 cos(纬度)，斜向为两者的斜边长；启发式为同一组步长下的八方向（octile）
+距离，即无障碍时的精确代价，可采纳且一致。省略代价模型时每步代价都为 1、启发式为曼哈顿距离
+（历史行为，斜向与直线等价时不可采纳）。
+加权 A*（weight > 1）以 f = g + weight * h 排序：启发式可采纳时，航线代价不超过最优代价的
+weight 倍，扩展的节点通常少得多。astar 也可以使用调用方提供的逐网格点启发式
+（如 landmarks 的三角不等式下界），distances 计算单源全图最短距离供其预处理。
+"""
+import heapq
+import math
+
+import numpy as np
+
+from route_analytics import KM_PER_DEGREE
+
+# 8 个移动方向 (dx, dy)，第 k 位对应 DIRECTIONS[k]
+DIRECTIONS = (
+    (1, 0), (-1, 0), (0, 1), (0, -1),
+    (1, 1), (-1, 1), (1, -1), (-1, -1),
+)
+
+# 每度纬度对应的米数，由 route_analytics.KM_PER_DEGREE 换算，与 calculate_route_length 一致
+METERS_PER_DEGREE = KM_PER_DEGREE * 1000
+
+# 每步代价都为 1（直线与斜向等价）的代价模型
+UNIT_COSTS = (1.0, 1.0, 1.0)
+
+
+def metric_costs(grid_size, latitude):
+    """网格步长的米制代价 (东西向, 南北向, 斜向)，经度方向按 cos(latitude) 缩短"""
+    dy = grid_size * METERS_PER_DEGREE
+    dx = dy * math.cos(math.radians(latitude))
+    return (dx, dy, math.hypot(dx, dy))
+
+
+def octile_cost(ax, ay, costs):
+    """
+    只沿八方向移动时横向 ax、纵向 ay 格（非负）的最小代价，ax/ay 可以是 NumPy 数组
+    costs 为 UNIT_COSTS 时即切比雪夫距离
+    """
+    cx, cy, cd = costs
+    return cx * ax + cy * ay + (cd - cx - cy) * np.minimum(ax, ay)
+
+
+def neighbor_masks(blocked):
+    """根据障碍物网格计算每个网格点的 8 位邻居掩码"""
+    height, width = blocked.shape
+    free = np.zeros((height + 2, width + 2), dtype=bool)
+    free[1:-1, 1:-1] = ~np.asarray(blocked, dtype=bool)
+
+    masks = np.zeros((height, width), dtype=np.uint16)
+    for bit, (dx, dy) in enumerate(DIRECTIONS):
+        shifted = free[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+        masks |= shifted.astype(np.uint16) << bit
+    return masks.ravel()
+
+
+class GridSearch:
+    def __init__(self, width, height, blocked, costs=None, weight=1.0):
+        """
+        初始化搜索核心
+        blocked: (height, width) 的布尔障碍物网格
+        costs: (东西向, 南北向, 斜向) 步长代价（如 metric_costs 的结果），启发式为对应的 octile 距离；
+               省略时每步代价为 1、启发式为曼哈顿距离（历史行为）
+        weight: astar 默认的启发式权重（加权 A*），1 为最优搜索
+        """
+        self.width = width
+        self.height = height
+        self.size = width * height
+
+        # 复制一份，update_region 可以原地修改而不影响调用方的网格
+        self.blocked = np.array(blocked, dtype=bool).ravel().view(np.uint8)
+        self.masks = neighbor_masks(np.asarray(blocked, dtype=bool))
+        self._mask_view = memoryview(self.masks)
+
+        self.costs = costs
+        self.weight = weight
+        if costs is None:
+            self.step_costs = [1.0] * len(DIRECTIONS)
+            # 曼哈顿距离：hx * |dx| + hy * |dy| + hm * min(|dx|, |dy|)
+            self.heuristic_terms = (1.0, 1.0, 0.0)
+        else:
+            cx, cy, cd = costs
+            self.step_costs = [cx, cx, cy, cy, cd, cd, cd, cd]
+            self.heuristic_terms = (cx, cy, cd - cx - cy)
+        self._build_moves()
+
+        self.last_stats = {'expanded': 0, 'pushed': 0}
+
+    def _build_moves(self):
+        """为每个掩码值预先生成 (索引偏移, 代价) 元组"""
+        offsets = [dy * self.width + dx for dx, dy in DIRECTIONS]
+        self.moves = tuple(
+            tuple(
+                (offsets[bit], self.step_costs[bit])
+                for bit in range(len(DIRECTIONS)) if mask >> bit & 1
+            )
+            for mask in range(1 << len(DIRECTIONS))
+        )
+
+    def index(self, cell):
+        return cell[1] * self.width + cell[0]
+
+    def cell(self, idx):
+        y, x = divmod(idx, self.width)
+        return (x, y)
+
+    def update_region(self, window, blocked):
+        """
+        障碍物变化后只刷新窗口 (x0, x1, y0, y1) 内的网格点及其外围一圈的邻居掩码
+        blocked: 更新后完整的 (height, width) 障碍物网格
+        """
+        x0, x1, y0, y1 = window
+        # 掩码受影响的范围 r 与计算掩码所需的范围 e（各向外扩一格）
+        rx0, rx1 = max(0, x0 - 1), min(self.width, x1 + 1)
+        ry0, ry1 = max(0, y0 - 1), min(self.height, y1 + 1)
+        flat_blocked = self.blocked.reshape(self.height, self.width)
+        flat_masks = self.masks.reshape(self.height, self.width)
+
+        flat_blocked[y0:y1, x0:x1] = np.asarray(blocked[y0:y1, x0:x1], dtype=bool)
+        ex0, ex1 = max(0, rx0 - 1), min(self.width, rx1 + 1)
+        ey0, ey1 = max(0, ry0 - 1), min(self.height, ry1 + 1)
+        masks = neighbor_masks(flat_blocked[ey0:ey1, ex0:ex1].astype(bool)).reshape(ey1 - ey0, ex1 - ex0)
+        flat_masks[ry0:ry1, rx0:rx1] = masks[ry0 - ey0:ry1 - ey0, rx0 - ex0:rx1 - ex0]
+
+    def heuristic(self, idx, goal_x, goal_y):
+        """启发式函数（代价模型对应的 octile 距离，省略代价模型时为曼哈顿距离）"""
+        y, x = divmod(idx, self.width)
+        ax, ay = abs(x - goal_x), abs(y - goal_y)
+        hx, hy, hm = self.heuristic_terms
+        return hx * ax + hy * ay + hm * min(ax, ay)
+
+    def astar(self, start, goal, weight=None, h_field=None):
+        """
+        从 start 到 goal 的 A* 搜索，start/goal 为网格坐标 (x, y)
+        weight: 启发式权重，省略时使用 self.weight；大于 1 时为加权 A*，
+                航线代价不超过最优代价的 weight 倍（启发式可采纳时）
+        h_field: 可选的逐网格点启发式（按扁平索引排列的浮点数组，需可采纳，不要求一致），
+                 提供时代替 octile 启发式，如 landmarks.Landmarks.heuristic_field 的结果；
+                 此时已关闭的网格点找到更短路径时会重新打开，结果仍为最优（weight 为 1 时）
+        返回网格坐标列表（含起点和终点），不可达时返回 None
+        """
+        width = self.width
+        start_idx = self.index(start)
+        goal_idx = self.index(goal)
+        goal_x, goal_y = goal
+
+        g_score = np.full(self.size, np.inf)
+        came_from = np.full(self.size, -1, dtype=np.int32)
+        closed = np.zeros(self.size, dtype=np.uint8)
+        g = memoryview(g_score)
+        parent = memoryview(came_from)
+        done = memoryview(closed)
+        mask_of = self._mask_view
+        moves = self.moves
+        weight = self.weight if weight is None else weight
+        hx, hy, hm = (term * weight for term in self.heuristic_terms)
+        h = memoryview(h_field) if h_field is not None else None
+
+        g[start_idx] = 0.0
+        h0 = h[start_idx] if h is not None else self.heuristic(start_idx, goal_x, goal_y)
+        open_set = [(h0 * weight, start_idx)]
+        expanded = 0
+        pushed = 1
+
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+
+            if current == goal_idx:
+                self.last_stats = {'expanded': expanded, 'pushed': pushed}
+                return self.reconstruct(came_from, start_idx, goal_idx)
+
+            done[current] = 1
+            expanded += 1
+            current_g = g[current]
+
+            for offset, cost in moves[mask_of[current]]:
+                neighbor = current + offset
+                # octile 启发式是一致的，关闭的网格点代价已确定；外部启发式可能不一致，需要允许重新打开
+                if done[neighbor] and h is None:
+                    continue
+                tentative_g = current_g + cost
+                if tentative_g < g[neighbor]:
+                    g[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    if h is None:
+                        y, x = divmod(neighbor, width)
+                        ax = abs(x - goal_x)
+                        ay = abs(y - goal_y)
+                        f = tentative_g + hx * ax + hy * ay + hm * (ax if ax < ay else ay)
+                    else:
+                        done[neighbor] = 0
+                        f = tentative_g + weight * h[neighbor]
+                    heapq.heappush(open_set, (f, neighbor))
+                    pushed += 1
+
+        self.last_stats = {'expanded': expanded, 'pushed': pushed}
+        return None
+
+    def dijkstra_many(self, start, targets):
+        """
+        从 start 出发的一对多 Dijkstra 搜索，所有目标出堆（代价确定）后立即停止
+        返回 {目标网格坐标: 网格坐标路径}，不可达的目标不在结果中
+        """
+        start_idx = self.index(start)
+        remaining = {self.index(target) for target in targets}
+
+        g_score = np.full(self.size, np.inf)
+        came_from = np.full(self.size, -1, dtype=np.int32)
+        closed = np.zeros(self.size, dtype=np.uint8)
+        g = memoryview(g_score)
+        parent = memoryview(came_from)
+        done = memoryview(closed)
+        mask_of = self._mask_view
+        moves = self.moves
+
+        g[start_idx] = 0.0
+        open_set = [(0.0, start_idx)]
+        settled = []
+        expanded = 0
+        pushed = 1
+
+        while open_set and remaining:
+            current_g, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+            done[current] = 1
+            expanded += 1
+
+            if current in remaining:
+                remaining.discard(current)
+                settled.append(current)
+
+            for offset, cost in moves[mask_of[current]]:
+                neighbor = current + offset
+                if done[neighbor]:
+                    continue
+                tentative_g = current_g + cost
+                if tentative_g < g[neighbor]:
+                    g[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    heapq.heappush(open_set, (tentative_g, neighbor))
+                    pushed += 1
+
+        self.last_stats = {'expanded': expanded, 'pushed': pushed}
+        return {
+            self.cell(target): self.reconstruct(came_from, start_idx, target)
+            for target in settled
+        }
+
+    def distances(self, start):
+        """从 start 出发的完整 Dijkstra，返回各网格点的最短代价（扁平 float64 数组，不可达为 inf）"""
+        start_idx = self.index(start)
+        g_score = np.full(self.size, np.inf)
+        closed = np.zeros(self.size, dtype=np.uint8)
+        g = memoryview(g_score)
+        done = memoryview(closed)
+        mask_of = self._mask_view
+        moves = self.moves
+
+        g[start_idx] = 0.0
+        open_set = [(0.0, start_idx)]
+        while open_set:
+            current_g, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+            done[current] = 1
+
+            for offset, cost in moves[mask_of[current]]:
+                neighbor = current + offset
+                tentative_g = current_g + cost
+                if tentative_g < g[neighbor]:
+                    g[neighbor] = tentative_g
+                    heapq.heappush(open_set, (tentative_g, neighbor))
+        return g_score
+
+    def reconstruct(self, came_from, start_idx, goal_idx):
+        """沿父节点数组回溯路径"""
+        path = []
+        current = goal_idx
+        while current != start_idx:
+            path.append(self.cell(current))
+            current = int(came_from[current])
+        path.append(self.cell(start_idx))
+        path.reverse()
+        return path
@@ -0,0 +1,263 @@
+"""
+跳点搜索（Jump Point Search）
+
+适用于 8 连通网格，允许斜向穿过障碍物拐角（与 get_neighbors 一致）。步长代价为
+(东西向, 南北向, 斜向)（见 grid_search.metric_costs），默认每步都为 1；剪枝规则只要求
+斜向代价不小于直线、不大于两个直线分量之和，米制代价同样满足。
+直线方向的跳跃距离预先计算成表（JPS+ 的直线部分）：table[d, y, x] 为从 (x, y)
+沿方向 d 出发遇到的第一个跳点的步数（> 0），或撞墙前可走的步数取负（<= 0）。
+斜向跳跃逐步前进，但每一步的两个直线分量检查都是 O(1) 查表。
+"""
+import heapq
+
+import numpy as np
+
+from grid_search import UNIT_COSTS
+
+# 直线方向，与跳跃距离表的第一维对应
+STRAIGHT_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+STRAIGHT_INDEX = {d: i for i, d in enumerate(STRAIGHT_DIRECTIONS)}
+
+ALL_DIRECTIONS = (
+    (1, 0), (-1, 0), (0, 1), (0, -1),
+    (1, 1), (-1, 1), (1, -1), (-1, -1),
+)
+
+
+def _sign(v):
+    return (v > 0) - (v < 0)
+
+
+def jump_tables(blocked):
+    """
+    计算 4 个直线方向的跳跃距离表，返回 int16 数组 (4, height, width)
+    跳点：沿该方向进入该格时存在强制邻居（侧面被挡、侧前方可通行）
+    """
+    blocked = np.asarray(blocked, dtype=bool)
+    height, width = blocked.shape
+    padded = np.ones((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = blocked
+    free = ~padded
+
+    tables = np.zeros((4, height, width), dtype=np.int16)
+    for d, (dx, dy) in enumerate(STRAIGHT_DIRECTIONS):
+        # 沿方向进入 (x, y) 时是否为跳点（在补边坐标系中计算）
+        sy, sx = slice(1, height + 1), slice(1, width + 1)
+        if dy == 0:
+            side_a = padded[2:height + 2, sx] & free[2:height + 2, 1 + dx:width + 1 + dx]
+            side_b = padded[0:height, sx] & free[0:height, 1 + dx:width + 1 + dx]
+        else:
+            side_a = padded[sy, 2:width + 2] & free[1 + dy:height + 1 + dy, 2:width + 2]
+            side_b = padded[sy, 0:width] & free[1 + dy:height + 1 + dy, 0:width]
+        is_jump = (side_a | side_b) & ~blocked
+
+        # 沿反方向扫描，dist[当前] 由 dist[下一格] 推出
+        # 旋转成“沿行向右”后统一处理
+        if dx == 1:
+            free_r, jump_r = ~blocked, is_jump
+        elif dx == -1:
+            free_r, jump_r = ~blocked[:, ::-1], is_jump[:, ::-1]
+        elif dy == 1:
+            free_r, jump_r = ~blocked.T, is_jump.T
+        else:
+            free_r, jump_r = ~blocked[::-1, :].T, is_jump[::-1, :].T
+
+        rows, cols = free_r.shape
+        dist = np.zeros((rows, cols), dtype=np.int32)
+        for x in range(cols - 2, -1, -1):
+            nxt_free = free_r[:, x + 1]
+            nxt_jump = jump_r[:, x + 1]
+            nxt = dist[:, x + 1]
+            step = np.where(nxt > 0, nxt + 1, nxt - 1)
+            dist[:, x] = np.where(nxt_free, np.where(nxt_jump, 1, step), 0)
+
+        if dx == 1:
+            result = dist
+        elif dx == -1:
+            result = dist[:, ::-1]
+        elif dy == 1:
+            result = dist.T
+        else:
+            result = dist.T[::-1, :]
+        tables[d] = np.clip(result, -32768, 32767)
+    return tables
+
+
+class JumpPointSearch:
+    def __init__(self, blocked, tables=None, costs=UNIT_COSTS, weight=1.0):
+        """
+        blocked: (height, width) 布尔障碍物网格
+        tables: 预先计算（或从缓存读取）的跳跃距离表，缺省时现场计算
+        costs: (东西向, 南北向, 斜向) 步长代价，启发式为对应的 octile 距离（默认即切比雪夫距离）
+        weight: 启发式权重，大于 1 时为加权搜索（航线代价不超过最优的 weight 倍）
+        """
+        blocked = np.asarray(blocked, dtype=bool)
+        self.height, self.width = blocked.shape
+        self.stride = self.width + 2
+        padded = np.ones((self.height + 2, self.width + 2), dtype=np.uint8)
+        padded[1:-1, 1:-1] = blocked
+        self._blocked = memoryview(padded.ravel())
+        self.tables = jump_tables(blocked) if tables is None else tables
+        self._tables = [memoryview(np.ascontiguousarray(t, dtype=np.int16).ravel()) for t in self.tables]
+        self.costs = tuple(costs)
+        self.weight = weight
+        self.last_stats = {'expanded': 0, 'pushed': 0}
+
+    def blocked(self, x, y):
+        return self._blocked[(y + 1) * self.stride + x + 1] == 1
+
+    def jump_straight(self, x, y, dx, dy, goal):
+        """沿直线方向查表跳跃，返回跳点（或终点）坐标，无跳点返回 None"""
+        k = self._tables[STRAIGHT_INDEX[(dx, dy)]][y * self.width + x]
+        reach = k if k > 0 else -k
+        gx, gy = goal
+        if dy == 0 and gy == y:
+            t = (gx - x) * dx
+            if 0 < t <= reach:
+                return goal
+        elif dx == 0 and gx == x:
+            t = (gy - y) * dy
+            if 0 < t <= reach:
+                return goal
+        if k > 0:
+            return (x + dx * k, y + dy * k)
+        return None
+
+    def jump_diagonal(self, x, y, dx, dy, goal):
+        """沿斜向逐步跳跃"""
+        blocked = self.blocked
+        while True:
+            x += dx
+            y += dy
+            if blocked(x, y):
+                return None
+            if (x, y) == goal:
+                return (x, y)
+            if (blocked(x - dx, y) and not blocked(x - dx, y + dy)) or \
+                    (blocked(x, y - dy) and not blocked(x + dx, y - dy)):
+                return (x, y)
+            if self.jump_straight(x, y, dx, 0, goal) is not None or \
+                    self.jump_straight(x, y, 0, dy, goal) is not None:
+                return (x, y)
+
+    def successor_directions(self, x, y, parent):
+        """按 JPS 剪枝规则返回需要探索的方向"""
+        blocked = self.blocked
+        if parent is None:
+            return [(dx, dy) for dx, dy in ALL_DIRECTIONS if not blocked(x + dx, y + dy)]
+
+        dx = _sign(x - parent[0])
+        dy = _sign(y - parent[1])
+        directions = []
+        if dx != 0 and dy != 0:
+            directions.extend([(dx, 0), (0, dy), (dx, dy)])
+            if blocked(x - dx, y):
+                directions.append((-dx, dy))
+            if blocked(x, y - dy):
+                directions.append((dx, -dy))
+        elif dx != 0:
+            directions.append((dx, 0))
+            if blocked(x, y + 1) and not blocked(x + dx, y + 1):
+                directions.append((dx, 1))
+            if blocked(x, y - 1) and not blocked(x + dx, y - 1):
+                directions.append((dx, -1))
+        else:
+            directions.append((0, dy))
+            if blocked(x + 1, y) and not blocked(x + 1, y + dy):
+                directions.append((1, dy))
+            if blocked(x - 1, y) and not blocked(x - 1, y + dy):
+                directions.append((-1, dy))
+        return directions
+
+    def search(self, start, goal):
+        """
+        跳点搜索，start/goal 为网格坐标 (x, y)
+        返回逐格展开的网格坐标路径（含起点和终点），不可达返回 None
+        """
+        width = self.width
+        size = width * self.height
+        start_idx = start[1] * width + start[0]
+        goal_idx = goal[1] * width + goal[0]
+        gx, gy = goal
+
+        g_score = np.full(size, np.inf)
+        came_from = np.full(size, -1, dtype=np.int32)
+        closed = np.zeros(size, dtype=np.uint8)
+        g = memoryview(g_score)
+        parent = memoryview(came_from)
+        done = memoryview(closed)
+
+        cx, cy, cd = self.costs
+        # 启发式 hx * |dx| + hy * |dy| + hm * min(|dx|, |dy|)（octile 距离乘以权重）
+        hx, hy, hm = cx * self.weight, cy * self.weight, (cd - cx - cy) * self.weight
+
+        g[start_idx] = 0.0
+        ax, ay = abs(start[0] - gx), abs(start[1] - gy)
+        open_set = [(hx * ax + hy * ay + hm * min(ax, ay), start_idx)]
+        expanded = 0
+        pushed = 1
+
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+            if current == goal_idx:
+                self.last_stats = {'expanded': expanded, 'pushed': pushed}
+                return self.reconstruct(came_from, start_idx, goal_idx)
+            done[current] = 1
+            expanded += 1
+
+            y, x = divmod(current, width)
+            p = parent[current]
+            parent_cell = None if p < 0 else (p % width, p // width)
+
+            for dx, dy in self.successor_directions(x, y, parent_cell):
+                if dx != 0 and dy != 0:
+                    jump_point = self.jump_diagonal(x, y, dx, dy, goal)
+                else:
+                    jump_point = self.jump_straight(x, y, dx, dy, goal)
+                if jump_point is None:
+                    continue
+                jx, jy = jump_point
+                neighbor = jy * width + jx
+                if done[neighbor]:
+                    continue
+                # 跳点与当前点在同一直线或斜线上
+                if dx == 0:
+                    step = cy * abs(jy - y)
+                elif dy == 0:
+                    step = cx * abs(jx - x)
+                else:
+                    step = cd * abs(jx - x)
+                tentative_g = g[current] + step
+                if tentative_g < g[neighbor]:
+                    g[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    ax, ay = abs(jx - gx), abs(jy - gy)
+                    f = tentative_g + hx * ax + hy * ay + hm * min(ax, ay)
+                    heapq.heappush(open_set, (f, neighbor))
+                    pushed += 1
+
+        self.last_stats = {'expanded': expanded, 'pushed': pushed}
+        return None
+
+    def reconstruct(self, came_from, start_idx, goal_idx):
+        """回溯跳点并把相邻跳点之间的直线/斜线段展开成逐格路径"""
+        width = self.width
+        jump_points = []
+        current = goal_idx
+        while current != start_idx:
+            jump_points.append((current % width, current // width))
+            current = int(came_from[current])
+        jump_points.append((start_idx % width, start_idx // width))
+        jump_points.reverse()
+
+        path = [jump_points[0]]
+        for (x0, y0), (x1, y1) in zip(jump_points, jump_points[1:]):
+            dx, dy = _sign(x1 - x0), _sign(y1 - y0)
+            x, y = x0, y0
+            while (x, y) != (x1, y1):
+                x += dx
+                y += dy
+                path.append((x, y))
+        return path
@@ -0,0 +1,153 @@
+"""
+地标（ALT）启发式：A* + 地标 + 三角不等式
+
+预处理时选出 L 个地标网格点，在障碍物网格上从每个地标做完整的 Dijkstra，
+保存各网格点到地标的最短代价表。网格图是无向的，对任意地标 l 有
+    d(n, t) >= |d(l, t) - d(l, n)|
+取各地标下界与 octile 距离中的最大值作为启发式，仍然可采纳，
+绕行越多（octile 低估越严重）的查询扩展的节点减少得越多。
+精确的地标下界是一致的，但量化（向下取整）和扣除误差余量后，相邻网格点的下界之差可能超过边代价，
+不保证一致；GridSearch.astar 使用 h_field 时会重新打开已关闭的网格点，结果仍为最优。
+构建启发式要扫描 使用的地标数 x 网格点数 的距离表，与单次搜索本身的开销相当：
+可以只使用对该起终点下界最大的 active 个地标（活跃地标），开销与 active 成正比；
+也可以对全部地标构建一次后按终点缓存（DroneRoutePlanner.get_heuristic_field），同一终点的查询共用。
+与地标不连通的网格点也与终点不连通，其下界很大（float32 为 inf），不影响可采纳性。
+
+地标用最远点采样选取：第一个地标为离 seeds[0]（如第一个校门）最远的可达网格点，
+之后每次取离已有地标最近距离最大的网格点，地标分散在可达区域的边缘。
+距离表为 (L, 网格点数) 的紧凑数组：
+- float32：保留 inf 表示不可达，下界减去 float32 舍入误差的上限；
+- uint16：按 scale 量化（向下取整），65535 表示不可达，下界减去一个量化步长，内存减半。
+内存为 L x 网格点数 x 2 或 4 字节，由地标数上限控制。
+
+表只对计算它的网格和代价模型有效：新增障碍物只会让真实距离变长，下界仍然成立；
+移除障碍物后需要重新计算。
+"""
+import numpy as np
+
+from grid_search import UNIT_COSTS, octile_cost
+
+# uint16 表中表示不可达的值
+UNREACHABLE = np.iinfo(np.uint16).max
+
+DTYPES = ('float32', 'uint16')
+
+
+class Landmarks:
+    def __init__(self, table, cells, scale=1.0):
+        """
+        table: (L, 网格点数) float32 或 uint16 距离表（见模块说明）
+        cells: (L, 2) 地标网格坐标 (x, y)
+        scale: uint16 表的量化步长（代价单位），float32 表为 1
+        """
+        self.table = table
+        self.cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self.scale = float(scale)
+        if table.dtype == np.uint16:
+            self.slack = self.scale
+        else:
+            finite = np.asarray(table)[np.isfinite(table)]
+            # 存储与 float32 相减、取最大值时的舍入误差上限（留足余量）
+            self.slack = float(finite.max()) * 2.0 ** -20 if len(finite) else 0.0
+        self._coords = None
+
+    @property
+    def count(self):
+        return len(self.cells)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    @classmethod
+    def build(cls, search, count, seeds=(), dtype='float32'):
+        """
+        search: 障碍物网格上的 GridSearch（代价模型决定表中距离的单位）
+        count: 地标数上限；可达区域小于 count 个网格点时取全部
+        seeds: 候选起始网格点 (x, y)，用第一个可通行的点确定首个地标，省略时取网格中心
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"未知的距离表类型: {dtype}")
+        free = search.blocked == 0
+        if count <= 0 or not free.any():
+            return cls(np.zeros((0, search.size), dtype=dtype), np.zeros((0, 2)))
+        origin = next((search.index(cell) for cell in seeds if free[search.index(cell)]), None)
+        if origin is None:
+            candidates = np.nonzero(free)[0]
+            center = search.index((search.width // 2, search.height // 2))
+            origin = int(candidates[np.argmin(np.abs(candidates - center))])
+
+        reach = search.distances(search.cell(origin))
+        reachable = np.isfinite(reach)
+        nearest = np.where(reachable, reach, -1.0)
+        rows, cells = [], []
+        for _ in range(count):
+            landmark = int(np.argmax(nearest))
+            if nearest[landmark] <= 0 and rows:
+                break
+            distances = search.distances(search.cell(landmark))
+            rows.append(distances)
+            cells.append(search.cell(landmark))
+            nearest = np.minimum(nearest, np.where(reachable, distances, -1.0))
+
+        table = np.array(rows)
+        if dtype == 'float32':
+            return cls(table.astype(np.float32), cells)
+        finite = table[np.isfinite(table)]
+        scale = max(float(finite.max()) / (UNREACHABLE - 1), 1e-9) if len(finite) else 1.0
+        quantized = np.full(table.shape, UNREACHABLE, dtype=np.uint16)
+        quantized[np.isfinite(table)] = np.floor(finite / scale).astype(np.uint16)
+        return cls(quantized, cells, scale)
+
+    def usable(self, goal_idx):
+        """终点可达的地标序号（终点与地标不连通时该地标没有信息）"""
+        column = self.table[:, goal_idx]
+        if self.table.dtype == np.uint16:
+            return np.nonzero(column != UNREACHABLE)[0]
+        return np.nonzero(np.isfinite(column))[0]
+
+    def select(self, start_idx, goal_idx, active):
+        """对 start -> goal 下界最大的 active 个地标"""
+        usable = self.usable(goal_idx)
+        if active is None or len(usable) <= active:
+            return usable
+        column = self.table[usable, goal_idx].astype(np.float32)
+        gain = np.abs(self.table[usable, start_idx].astype(np.float32) - column)
+        return usable[np.argsort(-gain, kind='stable')[:active]]
+
+    def lower_bounds(self, goal_idx, landmarks=None):
+        """
+        各网格点到 goal_idx 的地标下界（扁平 float32 数组，已乘以 scale 并扣除误差），
+        landmarks 为使用的地标序号，默认全部可用地标；没有可用地标时为 0
+        """
+        table = self.table
+        bound = np.zeros(table.shape[1], dtype=np.float32)
+        if landmarks is None:
+            landmarks = self.usable(goal_idx)
+        for k in np.asarray(landmarks).tolist():
+            row = table[k].astype(np.float32)
+            np.subtract(row, np.float32(table[k, goal_idx]), out=row)
+            np.maximum(bound, np.abs(row, out=row), out=bound)
+        if self.scale != 1.0:
+            np.multiply(bound, np.float32(self.scale), out=bound)
+        # 扣除量化 / 舍入误差，保证可采纳
+        np.subtract(bound, np.float32(self.slack), out=bound)
+        np.maximum(bound, 0.0, out=bound)
+        return bound
+
+    def heuristic_field(self, goal, search, start=None, active=None):
+        """
+        到 goal 的逐网格点启发式：地标下界与 search 代价模型下的 octile 距离取最大值
+        （unit 模型为切比雪夫距离，而不是不可采纳的曼哈顿距离），结果直接作为 GridSearch.astar 的 h_field
+        start/active: 提供时只使用对 start -> goal 下界最大的 active 个地标
+        """
+        goal_idx = search.index(goal)
+        landmarks = None
+        if start is not None and active is not None:
+            landmarks = self.select(search.index(start), goal_idx, active)
+        if self._coords is None or len(self._coords[0]) != search.size:
+            ys, xs = np.divmod(np.arange(search.size), search.width)
+            self._coords = (xs, ys)
+        xs, ys = self._coords
+        octile = octile_cost(np.abs(xs - goal[0]), np.abs(ys - goal[1]), search.costs or UNIT_COSTS)
+        return np.maximum(octile, self.lower_bounds(goal_idx, landmarks))
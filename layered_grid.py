@@ -0,0 +1,161 @@
+"""
+按飞行高度分层的三维占用网格与三维 A*
+
+每个飞行高度一层，某层的障碍物为：禁飞区（运动场所及其缓冲区等，所有高度都不可
+通行），以及高度加垂直安全间隔超过该层高度的建筑。每层按行用 np.packbits 压缩，
+内存为 层数 x 行数 x ceil(列数 / 8) 字节，而不是完整的三维布尔数组。
+
+搜索状态为 (层, x, y)：同层八方向移动（octile 代价，以南北向网格边长为单位，东西向步长
+按 x_scale 缩放，即纬度的余弦），同一网格点上可以升降到相邻层，
+代价为高度差折算的网格步数乘以爬升系数。起飞（地面到巡航层）和降落也计入爬升代价，
+因此能在低层通过时不会无谓地爬高。weight > 1 时为加权 A*（启发式乘以 weight）。
+"""
+import heapq
+import math
+
+import numpy as np
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+class LayeredGrid:
+    def __init__(self, packed, altitudes, width, height, cell_meters, climb_factor=2.0, x_scale=1.0, weight=1.0):
+        """
+        packed: (层数, height, ceil(width / 8)) uint8，按位压缩的各层障碍物
+        altitudes: 各层飞行高度（米），从低到高
+        cell_meters: 网格（南北向）边长（米），用于把高度差折算成网格步数
+        climb_factor: 升降每米的代价相对水平飞行每米的倍数
+        x_scale: 东西向网格边长相对南北向的比例（经度方向按纬度余弦缩短），1 为正方形网格
+        weight: 启发式权重，大于 1 时航线代价不超过最优代价的 weight 倍
+        """
+        self.packed = np.ascontiguousarray(packed, dtype=np.uint8)
+        self.altitudes = list(altitudes)
+        self.layers = len(self.altitudes)
+        self.width = width
+        self.height = height
+        self.row_bytes = self.packed.shape[2]
+        self._packed = memoryview(self.packed.ravel())
+        self.cell_meters = cell_meters
+        self.climb_factor = climb_factor
+        self.x_scale = x_scale
+        diagonal = math.hypot(x_scale, 1.0)
+        self.moves = tuple((dx, dy, diagonal if dx and dy else (x_scale if dx else 1.0)) for dx, dy in DIRECTIONS)
+        # octile 启发式 hx * |dx| + hy * |dy| + hm * min(|dx|, |dy|)（已乘以权重）
+        self.heuristic_terms = (x_scale * weight, weight, (diagonal - x_scale - 1.0) * weight)
+        self.last_stats = {'expanded': 0, 'pushed': 0}
+
+    @classmethod
+    def build(cls, height_map, no_fly, altitudes, clearance, cell_meters, climb_factor=2.0, x_scale=1.0,
+              weight=1.0):
+        """
+        height_map: (height, width) 建筑高度（米），无建筑为 0
+        no_fly: (height, width) 布尔数组，所有高度都不可通行的区域
+        clearance: 建筑顶部以上的垂直安全间隔（米）
+        """
+        height, width = height_map.shape
+        packed = np.stack([
+            np.packbits(no_fly | (height_map + clearance > altitude), axis=1)
+            for altitude in altitudes
+        ])
+        return cls(packed, altitudes, width, height, cell_meters, climb_factor, x_scale, weight)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def layer(self, index):
+        """展开单层为 (height, width) 布尔数组"""
+        return np.unpackbits(self.packed[index], axis=1, count=self.width).astype(bool)
+
+    def blocked(self, layer, x, y):
+        byte = self._packed[(layer * self.height + y) * self.row_bytes + (x >> 3)]
+        return (byte >> (7 - (x & 7))) & 1 == 1
+
+    def climb_cost(self, from_altitude, to_altitude):
+        return abs(to_altitude - from_altitude) / self.cell_meters * self.climb_factor
+
+    def search(self, start, goal, min_layer=0):
+        """
+        三维 A*，start/goal 为网格坐标 (x, y)，只使用 min_layer 及以上的层
+        返回 [(x, y, 层), ...]（含起降点所在的巡航层），不可达返回 None
+        """
+        width, height = self.width, self.height
+        size = width * height
+        layers = self.layers
+        altitudes = self.altitudes
+        blocked = self.blocked
+        gx, gy = goal
+        goal_cell = gy * width + gx
+        # 虚拟终点：到达终点网格后降落
+        virtual_goal = layers * size
+
+        g_score = np.full(layers * size + 1, np.inf)
+        came_from = np.full(layers * size + 1, -1, dtype=np.int64)
+        closed = np.zeros(layers * size + 1, dtype=np.uint8)
+        g = memoryview(g_score)
+        parent = memoryview(came_from)
+        done = memoryview(closed)
+
+        hx, hy, hm = self.heuristic_terms
+        moves = self.moves
+        sx, sy = start
+        adx, ady = abs(sx - gx), abs(sy - gy)
+        h0 = hx * adx + hy * ady + hm * min(adx, ady)
+        open_set = []
+        for layer in range(min_layer, layers):
+            if blocked(layer, sx, sy):
+                continue
+            idx = layer * size + sy * width + sx
+            g[idx] = self.climb_cost(0.0, altitudes[layer])
+            heapq.heappush(open_set, (g[idx] + h0, idx))
+        expanded = 0
+        pushed = len(open_set)
+
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+            if current == virtual_goal:
+                self.last_stats = {'expanded': expanded, 'pushed': pushed}
+                path = []
+                current = parent[current]
+                while current >= 0:
+                    layer, rest = divmod(current, size)
+                    y, x = divmod(rest, width)
+                    path.append((x, y, layer))
+                    current = parent[current]
+                return path[::-1]
+            done[current] = 1
+            expanded += 1
+
+            layer, rest = divmod(current, size)
+            y, x = divmod(rest, width)
+            current_g = g[current]
+
+            successors = []
+            if rest == goal_cell:
+                successors.append((virtual_goal, self.climb_cost(altitudes[layer], 0.0), 0.0))
+            for dx, dy, cost in moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and not blocked(layer, nx, ny):
+                    adx, ady = abs(nx - gx), abs(ny - gy)
+                    h = hx * adx + hy * ady + hm * min(adx, ady)
+                    successors.append((current + dy * width + dx, cost, h))
+            for other in (layer - 1, layer + 1):
+                if min_layer <= other < layers and not blocked(other, x, y):
+                    adx, ady = abs(x - gx), abs(y - gy)
+                    h = hx * adx + hy * ady + hm * min(adx, ady)
+                    successors.append((other * size + rest, self.climb_cost(altitudes[layer], altitudes[other]), h))
+
+            for neighbor, cost, h in successors:
+                if done[neighbor]:
+                    continue
+                tentative = current_g + cost
+                if tentative < g[neighbor]:
+                    g[neighbor] = tentative
+                    parent[neighbor] = current
+                    heapq.heappush(open_set, (tentative + h, neighbor))
+                    pushed += 1
+
+        self.last_stats = {'expanded': expanded, 'pushed': pushed}
+        return None
@@ -0,0 +1,199 @@
+"""
+规划器的计时与计数
+
+Metrics 收集三类数据：
+- 阶段计时：phase(name) 上下文管理器（或方法装饰器 timed(name)）累计调用次数、总耗时和最长耗时（秒）；
+- 查询计数：每次点对点 / 一对多查询的扩展节点数、入堆次数、路径点数和最终使用的回退层级
+  （strict 严格网格、relaxed 宽松网格、straight 直线路径、unsnapped 端点附近没有可通行点）；
+- 缓存命中率：由调用方在导出时提供（route_cache、distance_fields、grid_cache 等的 hits/misses）。
+
+关闭时（enabled=False，默认）phase 返回共享的空上下文，query 直接返回，热路径上只多一次属性判断。
+导出为 JSON lines（每个计时器、计数器、查询一行）或 Prometheus 文本格式。
+profiled(filename) 用 cProfile 包住一段代码，结束后打印耗时最多的函数并可保存 .prof 文件。
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import time
+from collections import deque
+
+# 查询最终使用的回退层级，按尝试顺序排列
+TIERS = ('strict', 'relaxed', 'straight', 'unsnapped')
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class _Phase:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=False, max_queries=10000):
+        """
+        enabled: 是否收集；关闭时各记录方法几乎没有开销
+        max_queries: 保留的逐查询记录条数上限（只保留最近的），汇总计数不受影响
+        """
+        self.enabled = enabled
+        self.max_queries = max_queries
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.queries = deque(maxlen=self.max_queries)
+
+    def phase(self, name):
+        """阶段计时：with metrics.phase('plan_routes'): ..."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def query(self, kind, tier, expanded=0, pushed=0, points=0):
+        """
+        记录一次查询
+        kind: 查询类型（astar、jps、tree 等）；tier: TIERS 之一
+        expanded/pushed: 各层级搜索合计的扩展节点数与入堆次数；points: 结果路径的航点数
+        """
+        if not self.enabled:
+            return
+        counters = self.counters
+        for name, value in ((f'queries_{kind}_{tier}', 1), ('nodes_expanded', expanded),
+                            ('heap_pushes', pushed), ('path_points', points)):
+            counters[name] = counters.get(name, 0) + value
+        self.queries.append({'kind': kind, 'tier': tier, 'expanded': expanded, 'pushed': pushed, 'points': points})
+
+    def snapshot(self, caches=None):
+        """
+        汇总为普通字典
+        caches: {名称: {'hits', 'misses', ...}}，计算命中率后原样附上
+        """
+        cache_stats = {}
+        for name, stats in (caches or {}).items():
+            total = stats['hits'] + stats['misses']
+            cache_stats[name] = dict(stats, hit_rate=stats['hits'] / total if total else 0.0)
+        return {
+            'timers': {name: {'calls': calls, 'total_s': total, 'max_s': longest}
+                       for name, (calls, total, longest) in self.timers.items()},
+            'counters': dict(self.counters),
+            'caches': cache_stats
+        }
+
+    def to_json_lines(self, caches=None, include_queries=True):
+        """每行一个 JSON 对象：type 为 timer / counter / cache / query"""
+        snapshot = self.snapshot(caches)
+        lines = []
+        for name, timer in snapshot['timers'].items():
+            lines.append(json.dumps(dict(type='timer', name=name, **timer), ensure_ascii=False))
+        for name, value in snapshot['counters'].items():
+            lines.append(json.dumps({'type': 'counter', 'name': name, 'value': value}, ensure_ascii=False))
+        for name, stats in snapshot['caches'].items():
+            lines.append(json.dumps(dict(type='cache', name=name, **stats), ensure_ascii=False))
+        if include_queries:
+            for record in self.queries:
+                lines.append(json.dumps(dict(type='query', **record), ensure_ascii=False))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def to_prometheus(self, caches=None, prefix='uav_planner'):
+        """Prometheus 文本格式（计时器与计数器为 counter，命中率为 gauge）"""
+        snapshot = self.snapshot(caches)
+        out = []
+
+        def family(name, kind, help_text, samples):
+            if not samples:
+                return
+            out.append(f'# HELP {prefix}_{name} {help_text}')
+            out.append(f'# TYPE {prefix}_{name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                value = value if isinstance(value, int) else repr(float(value))
+                out.append(f'{prefix}_{name}{{{label_text}}} {value}' if label_text else f'{prefix}_{name} {value}')
+
+        timers = snapshot['timers']
+        family('phase_seconds_total', 'counter', 'Total wall-clock seconds per phase',
+               [({'phase': name}, timer['total_s']) for name, timer in timers.items()])
+        family('phase_calls_total', 'counter', 'Calls per phase',
+               [({'phase': name}, timer['calls']) for name, timer in timers.items()])
+        family('phase_max_seconds', 'gauge', 'Longest single call per phase',
+               [({'phase': name}, timer['max_s']) for name, timer in timers.items()])
+
+        counters = snapshot['counters']
+        queries = []
+        for name, value in counters.items():
+            if name.startswith('queries_'):
+                kind, tier = name[len('queries_'):].rsplit('_', 1)
+                queries.append(({'kind': kind, 'tier': tier}, value))
+        family('queries_total', 'counter', 'Point-to-point queries by final fallback tier', queries)
+        for name, help_text in (('nodes_expanded', 'Search nodes expanded'), ('heap_pushes', 'Heap pushes'),
+                                ('path_points', 'Waypoints in returned paths')):
+            if name in counters:
+                family(f'{name}_total', 'counter', help_text, [({}, counters[name])])
+        others = [({'name': name}, value) for name, value in counters.items()
+                  if not name.startswith('queries_') and name not in ('nodes_expanded', 'heap_pushes', 'path_points')]
+        family('events_total', 'counter', 'Other planner events', others)
+
+        caches = snapshot['caches']
+        family('cache_hits_total', 'counter', 'Cache hits', [({'cache': name}, s['hits']) for name, s in caches.items()])
+        family('cache_misses_total', 'counter', 'Cache misses',
+               [({'cache': name}, s['misses']) for name, s in caches.items()])
+        family('cache_hit_ratio', 'gauge', 'Cache hit ratio',
+               [({'cache': name}, s['hit_rate']) for name, s in caches.items()])
+        return '\n'.join(out) + '\n' if out else ''
+
+
+def timed(name):
+    """方法装饰器：在 self.metrics 上按 name 计时整个方法调用"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def profiled(filename=None, sort='cumulative', limit=25):
+    """
+    用 cProfile 剖析 with 块内的代码，结束后打印前 limit 个函数（按 sort 排序），
+    提供 filename 时另存为 .prof 文件（可用 snakeviz / pstats 查看）
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if filename:
+            profiler.dump_stats(filename)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        print(stream.getvalue())
@@ -0,0 +1,441 @@
+"""
+两级（粗/细）多分辨率障碍物网格与分层搜索
+
+细网格点 (x, y) 对应坐标 (bounds[0] + x * fine_size, bounds[2] + y * fine_size)。
+细网格按 block x block 分块，每块只记录一个状态：
+    FREE  块内全部可通行      FULL  块内全部为障碍物（或超出服务区域）
+    MIXED 障碍物边界经过该块，按位压缩保存块内细网格
+开阔区域和建筑内部每块只占一个字节，内存随障碍物边界长度增长，而不是随面积增长。
+
+构建时先用障碍物凸包（含缓冲区）在 STRtree 中筛出可能有障碍物的块，再对这些块
+逐块做与 rasterize 一致的精确栅格化，确定其状态。
+
+分层搜索（HPA* 思路）：
+- 抽象图：每个块内的每个八连通可通行分量是一个节点（FREE 块只有一个），相邻块
+  （含对角）中在块边界上直接相邻的分量之间连边。抽象图上的路径一定能在细网格上实现。
+- 查询：先在抽象图上做 A*，再把抽象路径经过的块向外扩一圈作为走廊，只在走廊内的
+  细网格上做 A*（octile 代价与启发）。
+"""
+import heapq
+import math
+
+import numpy as np
+import shapely
+from shapely.geometry import MultiPoint
+from shapely.strtree import STRtree
+
+from rasterize import rasterize_window
+
+FREE = 0
+FULL = 1
+MIXED = 2
+
+SQRT2 = math.sqrt(2.0)
+
+# 8 个移动方向及代价（单位：细网格边长）
+MOVES = (
+    (1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+    (1, 1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (-1, -1, SQRT2),
+)
+
+
+def octile(dx, dy):
+    dx, dy = abs(dx), abs(dy)
+    return max(dx, dy) + (SQRT2 - 1.0) * min(dx, dy)
+
+
+def label_components(free):
+    """
+    对 (n, block, block) 的可通行掩码逐块做八连通分量标记（不跨块）
+    返回同形状的 int64 数组：可通行点为其分量中最小的全局扁平索引，障碍物为 n * block * block
+    """
+    n, b, _ = free.shape
+    size = n * b * b
+    flat_free = free.ravel()
+    labels = np.where(flat_free, np.arange(size), size).reshape(n, b, b)
+    while True:
+        padded = np.full((n, b + 2, b + 2), size, dtype=np.int64)
+        padded[:, 1:-1, 1:-1] = labels
+        new = labels.copy()
+        for dx, dy, _ in MOVES:
+            np.minimum(new, padded[:, 1 + dy:1 + dy + b, 1 + dx:1 + dx + b], out=new)
+        new[~free] = size
+        # 指针跳跃：标签指向的点的标签更小时直接采用
+        flat = new.ravel()
+        for _ in range(4):
+            valid = flat < size
+            flat[valid] = flat[flat[valid]]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+class TwoLevelGrid:
+    def __init__(self, bounds, fine_size, block, states, index, blocks, node_block, node_offset, edges):
+        """
+        states: (coarse_height, coarse_width) int8 块状态
+        index: (coarse_height, coarse_width) int32，MIXED 块在 blocks 中的行号，其余为 -1
+        blocks: (MIXED 块数, block * block / 8) uint8，按位压缩的细网格（1 为障碍物）
+        node_block: (节点数, 2) int32，抽象图节点所在的块 (bx, by)
+        node_offset: (coarse_height, coarse_width) int32，块内第一个节点的编号，FULL 块为 -1
+        edges: (边数, 2) int32，抽象图的无向边
+        """
+        self.bounds = list(bounds)
+        self.fine_size = fine_size
+        self.block = block
+        self.width = int((bounds[1] - bounds[0]) / fine_size) + 1
+        self.height = int((bounds[3] - bounds[2]) / fine_size) + 1
+        self.states = states
+        self.index = index
+        self.blocks = blocks
+        self.node_block = node_block
+        self.node_offset = node_offset
+        self.edges = edges
+        self.coarse_height, self.coarse_width = states.shape
+
+        self.adjacency = [[] for _ in range(len(node_block))]
+        block_xy = node_block.tolist()
+        for u, v in edges.tolist():
+            cost = octile(block_xy[u][0] - block_xy[v][0], block_xy[u][1] - block_xy[v][1])
+            self.adjacency[u].append((v, cost))
+            self.adjacency[v].append((u, cost))
+        self.last_stats = {'coarse_expanded': 0, 'expanded': 0, 'corridor_blocks': 0}
+
+    @classmethod
+    def build(cls, bounds, fine_size, block, polygons=(), buffered_polygons=(),
+              buffer_distance=0.0, mode='vertex'):
+        """由多边形构建两级网格（polygons 不加缓冲区，buffered_polygons 加 buffer_distance）"""
+        if block % 8:
+            raise ValueError("block 必须是 8 的倍数")
+        width = int((bounds[1] - bounds[0]) / fine_size) + 1
+        height = int((bounds[3] - bounds[2]) / fine_size) + 1
+        coarse_width = -(-width // block)
+        coarse_height = -(-height // block)
+
+        jobs = [(list(p), 0.0) for p in polygons if len(p) >= 3]
+        jobs += [(list(p), buffer_distance) for p in buffered_polygons if len(p) > 0]
+        # 凸包外扩（缓冲区 + 一个细网格）一定覆盖栅格化判为障碍物的所有网格点
+        hulls = [MultiPoint(p).convex_hull.buffer(d + fine_size) for p, d in jobs]
+        tree = STRtree(hulls)
+
+        bx, by = np.meshgrid(np.arange(coarse_width), np.arange(coarse_height))
+        x0 = bounds[0] + bx.ravel() * block * fine_size
+        y0 = bounds[2] + by.ravel() * block * fine_size
+        span = (block - 1) * fine_size
+        block_idx, job_idx = tree.query(shapely.box(x0, y0, x0 + span, y0 + span), predicate='intersects')
+
+        candidates = {}
+        for b, j in zip(block_idx.tolist(), job_idx.tolist()):
+            candidates.setdefault(b, []).append(j)
+        # 超出服务区域的部分按障碍物处理，边缘块总是逐格栅格化
+        for cy in range(coarse_height):
+            for cx in range(coarse_width):
+                if (cx + 1) * block > width or (cy + 1) * block > height:
+                    candidates.setdefault(cy * coarse_width + cx, [])
+
+        states = np.zeros((coarse_height, coarse_width), dtype=np.int8)
+        index = np.full((coarse_height, coarse_width), -1, dtype=np.int32)
+        mixed = []
+        for b in sorted(candidates):
+            cy, cx = divmod(b, coarse_width)
+            window = (cx * block, min(width, (cx + 1) * block), cy * block, min(height, (cy + 1) * block))
+            plain = [jobs[j][0] for j in candidates[b] if jobs[j][1] == 0.0]
+            buffered = [jobs[j][0] for j in candidates[b] if jobs[j][1] > 0.0]
+            cells = np.ones((block, block), dtype=bool)
+            cells[:window[3] - window[2], :window[1] - window[0]] = rasterize_window(
+                window, bounds, fine_size, plain, buffered, buffer_distance, mode
+            )
+            if not cells.any():
+                continue
+            if cells.all():
+                states[cy, cx] = FULL
+                continue
+            states[cy, cx] = MIXED
+            index[cy, cx] = len(mixed)
+            mixed.append(cells)
+
+        mixed = np.array(mixed, dtype=bool).reshape(len(mixed), block, block)
+        blocks = np.packbits(mixed.reshape(len(mixed), -1), axis=1)
+        node_block, node_offset, edges = cls.build_abstract_graph(states, index, mixed)
+        return cls(bounds, fine_size, block, states, index, blocks, node_block, node_offset, edges)
+
+    @staticmethod
+    def build_abstract_graph(states, index, mixed):
+        """块内连通分量作为节点，块边界上相邻的分量之间连边"""
+        coarse_height, coarse_width = states.shape
+        n_mixed, block = len(mixed), mixed.shape[1] if len(mixed) else 0
+        bb = block * block
+
+        labels = label_components(~mixed) if n_mixed else np.zeros((0, 0, 0), dtype=np.int64)
+        roots = np.unique(labels[labels < n_mixed * bb]) if n_mixed else np.zeros(0, dtype=np.int64)
+
+        # 节点编号：先按块顺序给 FREE 块和 MIXED 块的各分量编号
+        counts = np.zeros((coarse_height, coarse_width), dtype=np.int64)
+        counts[states == FREE] = 1
+        if n_mixed:
+            per_block = np.bincount(roots // bb, minlength=n_mixed)
+            counts[states == MIXED] = per_block[index[states == MIXED]]
+        offset = np.cumsum(counts.ravel()) - counts.ravel()
+        node_offset = np.where(counts.ravel() > 0, offset, -1).reshape(coarse_height, coarse_width).astype(np.int32)
+
+        node_count = int(counts.sum())
+        node_block = np.zeros((node_count, 2), dtype=np.int32)
+        ys, xs = np.nonzero(counts)
+        starts = node_offset[ys, xs]
+        for x, y, start, count in zip(xs.tolist(), ys.tolist(), starts.tolist(), counts[ys, xs].tolist()):
+            node_block[start:start + count] = (x, y)
+
+        # 每块四条边上的节点编号（-1 为障碍物）
+        side = np.full((4, coarse_height, coarse_width, block), -1, dtype=np.int64)  # 左 右 下 上
+        free_mask = states == FREE
+        side[:, free_mask, :] = node_offset[free_mask][np.newaxis, :, np.newaxis]
+        if n_mixed:
+            my, mx = np.nonzero(states == MIXED)
+            rows = index[my, mx]
+            # 分量编号 = 块内第一个节点编号 + 该分量根在块内所有根中的序号
+            first_root = np.searchsorted(roots, rows.astype(np.int64) * bb)
+            for s, border in enumerate((labels[rows, :, 0], labels[rows, :, -1],
+                                        labels[rows, 0, :], labels[rows, -1, :])):
+                rank = np.searchsorted(roots, border) - first_root[:, np.newaxis]
+                node = node_offset[my, mx][:, np.newaxis] + rank
+                side[s, my, mx] = np.where(border < n_mixed * bb, node, -1)
+
+        pairs = []
+
+        def connect(a, b):
+            keep = (a >= 0) & (b >= 0)
+            pairs.append(np.stack([a[keep], b[keep]], axis=1))
+
+        left, right, bottom, top = side
+        for o in (-1, 0, 1):
+            lo, hi = max(0, -o), block - max(0, o)
+            # 左右相邻块：A 的右边第 y 行 与 B 的左边第 y + o 行
+            connect(right[:, :-1, lo:hi], left[:, 1:, lo + o:hi + o])
+            # 上下相邻块：A 的上边第 x 列 与 C 的下边第 x + o 列
+            connect(top[:-1, :, lo:hi], bottom[1:, :, lo + o:hi + o])
+        # 对角相邻块只通过角点相连
+        connect(top[:-1, :-1, -1], bottom[1:, 1:, 0])
+        connect(top[:-1, 1:, 0], bottom[1:, :-1, -1])
+
+        edges = np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0) if pairs else np.zeros((0, 2))
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        return node_block, node_offset, edges.astype(np.int32)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.states, self.index, self.blocks,
+                                      self.node_block, self.node_offset, self.edges))
+
+    def block_cells(self, bx, by):
+        """块内细网格的 (block, block) 布尔数组（1 为障碍物）"""
+        state = self.states[by, bx]
+        if state == FREE:
+            return np.zeros((self.block, self.block), dtype=bool)
+        if state == FULL:
+            return np.ones((self.block, self.block), dtype=bool)
+        row = self.blocks[self.index[by, bx]]
+        return np.unpackbits(row).reshape(self.block, self.block).astype(bool)
+
+    def blocked(self, x, y):
+        """细网格点是否为障碍物（越界视为障碍物）"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        bx, by = x // self.block, y // self.block
+        return bool(self.block_cells(bx, by)[y - by * self.block, x - bx * self.block])
+
+    def to_dense(self):
+        """展开为完整的细网格（仅用于检查和可视化）"""
+        b = self.block
+        dense = np.repeat(np.repeat(self.states == FULL, b, axis=0), b, axis=1)
+        for by, bx in zip(*np.nonzero(self.states == MIXED)):
+            dense[by * b:(by + 1) * b, bx * b:(bx + 1) * b] = self.block_cells(bx, by)
+        return dense[:self.height, :self.width]
+
+    def cell_node(self, cell):
+        """细网格点所在的抽象图节点"""
+        x, y = cell
+        bx, by = x // self.block, y // self.block
+        if self.states[by, bx] == FREE:
+            return int(self.node_offset[by, bx])
+        labels = label_components(~self.block_cells(bx, by)[np.newaxis])[0]
+        roots = np.unique(labels[labels < self.block * self.block])
+        rank = int(np.searchsorted(roots, labels[y - by * self.block, x - bx * self.block]))
+        return int(self.node_offset[by, bx]) + rank
+
+    def coord_to_cell(self, coord):
+        x = int(round((coord[0] - self.bounds[0]) / self.fine_size))
+        y = int(round((coord[1] - self.bounds[2]) / self.fine_size))
+        return max(0, min(x, self.width - 1)), max(0, min(y, self.height - 1))
+
+    def cell_to_coord(self, cell):
+        return [self.bounds[0] + cell[0] * self.fine_size, self.bounds[2] + cell[1] * self.fine_size]
+
+    def nearest_free(self, cell, radius=64):
+        """按切比雪夫半径由近到远查找最近的可通行细网格点"""
+        x, y = cell
+        if not self.blocked(x, y):
+            return cell
+        for r in range(1, radius + 1):
+            for dx in range(-r, r + 1):
+                for dy in (-r, r) if abs(dx) != r else range(-r, r + 1):
+                    if not self.blocked(x + dx, y + dy):
+                        return (x + dx, y + dy)
+        return None
+
+    def abstract_path(self, start_node, goal_node):
+        """抽象图上的 A*，返回节点列表，不可达返回 None"""
+        block_xy = self.node_block
+        gx, gy = block_xy[goal_node].tolist()
+        g_score = {start_node: 0.0}
+        came_from = {}
+        sx, sy = block_xy[start_node].tolist()
+        open_set = [(octile(sx - gx, sy - gy), start_node)]
+        closed = set()
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal_node:
+                self.last_stats['coarse_expanded'] = len(closed)
+                path = [current]
+                while current in came_from:
+                    current = came_from[current]
+                    path.append(current)
+                return path[::-1]
+            closed.add(current)
+            for v, cost in self.adjacency[current]:
+                if v in closed:
+                    continue
+                tentative = g_score[current] + cost
+                if tentative < g_score.get(v, math.inf):
+                    g_score[v] = tentative
+                    came_from[v] = current
+                    vx, vy = block_xy[v].tolist()
+                    heapq.heappush(open_set, (tentative + octile(vx - gx, vy - gy), v))
+        self.last_stats['coarse_expanded'] = len(closed)
+        return None
+
+    def corridor_path(self, start, goal, corridor):
+        """
+        只在走廊块内的细网格上做 A*
+        走廊块解压到 (块数, block, block) 的紧凑数组中，跨块移动通过相邻块槽位表换算
+        """
+        b = self.block
+        bb = b * b
+        slots = {blk: k for k, blk in enumerate(corridor)}
+        cells = np.stack([self.block_cells(bx, by) for bx, by in corridor]).astype(np.uint8)
+        blocked = memoryview(cells.ravel())
+        neighbors = [
+            {(sx, sy): slots.get((bx + sx, by + sy), -1) for sx in (-1, 0, 1) for sy in (-1, 0, 1)}
+            for bx, by in corridor
+        ]
+        origin = [(bx * b, by * b) for bx, by in corridor]
+
+        def local(cell):
+            k = slots[(cell[0] // b, cell[1] // b)]
+            return k * bb + (cell[1] % b) * b + cell[0] % b
+
+        size = len(corridor) * bb
+        g_score = np.full(size, np.inf)
+        came_from = np.full(size, -1, dtype=np.int64)
+        closed = np.zeros(size, dtype=np.uint8)
+        g = memoryview(g_score)
+        parent = memoryview(came_from)
+        done = memoryview(closed)
+
+        gx, gy = goal
+        start_idx, goal_idx = local(start), local(goal)
+        g[start_idx] = 0.0
+        h0 = octile(start[0] - gx, start[1] - gy)
+        open_set = [(h0, h0, start_idx)]
+        expanded = 0
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if done[current]:
+                continue
+            if current == goal_idx:
+                self.last_stats['expanded'] = expanded
+                path = []
+                while current != start_idx:
+                    path.append(current)
+                    current = parent[current]
+                path.append(start_idx)
+                result = []
+                for idx in reversed(path):
+                    k, rest = divmod(idx, bb)
+                    ly, lx = divmod(rest, b)
+                    result.append((origin[k][0] + lx, origin[k][1] + ly))
+                return result
+            done[current] = 1
+            expanded += 1
+
+            k, rest = divmod(current, bb)
+            ly, lx = divmod(rest, b)
+            ox, oy = origin[k]
+            current_g = g[current]
+            for dx, dy, cost in MOVES:
+                nx, ny = lx + dx, ly + dy
+                if 0 <= nx < b and 0 <= ny < b:
+                    neighbor = k * bb + ny * b + nx
+                else:
+                    sx = -1 if nx < 0 else (1 if nx >= b else 0)
+                    sy = -1 if ny < 0 else (1 if ny >= b else 0)
+                    slot = neighbors[k][(sx, sy)]
+                    if slot < 0:
+                        continue
+                    nx -= sx * b
+                    ny -= sy * b
+                    neighbor = slot * bb + ny * b + nx
+                if blocked[neighbor] or done[neighbor]:
+                    continue
+                tentative = current_g + cost
+                if tentative < g[neighbor]:
+                    g[neighbor] = tentative
+                    parent[neighbor] = current
+                    h = octile(ox + lx + dx - gx, oy + ly + dy - gy)
+                    heapq.heappush(open_set, (tentative + h, h, neighbor))
+        self.last_stats['expanded'] = expanded
+        return None
+
+    def search(self, start, goal, radius=1):
+        """
+        分层搜索，start/goal 为可通行的细网格坐标
+        返回细网格坐标路径（已去掉共线的中间点），不可达返回 None
+        """
+        nodes = self.abstract_path(self.cell_node(start), self.cell_node(goal))
+        if nodes is None:
+            return None
+        corridor = set()
+        for bx, by in self.node_block[nodes].tolist():
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    nx, ny = bx + dx, by + dy
+                    if 0 <= nx < self.coarse_width and 0 <= ny < self.coarse_height \
+                            and self.states[ny, nx] != FULL:
+                        corridor.add((nx, ny))
+        self.last_stats['corridor_blocks'] = len(corridor)
+        cells = self.corridor_path(start, goal, sorted(corridor))
+        return compress_path(cells) if cells is not None else None
+
+    def shortest_path(self, start, goal):
+        """start/goal 为经纬度，返回经纬度路径，不可达返回 None"""
+        start_cell = self.nearest_free(self.coord_to_cell(start))
+        goal_cell = self.nearest_free(self.coord_to_cell(goal))
+        if start_cell is None or goal_cell is None:
+            return None
+        cells = self.search(start_cell, goal_cell)
+        if cells is None:
+            return None
+        return [self.cell_to_coord(cell) for cell in cells]
+
+
+def compress_path(cells):
+    """去掉同方向连续移动中的中间点（路径形状不变）"""
+    if len(cells) <= 2:
+        return list(cells)
+    result = [cells[0]]
+    for prev, cur, nxt in zip(cells, cells[1:], cells[2:]):
+        if (cur[0] - prev[0], cur[1] - prev[1]) != (nxt[0] - cur[0], nxt[1] - cur[1]):
+            result.append(cur)
+    result.append(cells[-1])
+    return result
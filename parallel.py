@@ -0,0 +1,147 @@
+"""
+多进程航线规划
+
+父进程把障碍物网格（严格与宽松两份）及跳点表、地标距离表（使用时）复制到共享内存中，工作进程在初始化时按名称挂载，
+直接在共享页上构造只含网格的规划器（DroneRoutePlanner.from_grid），不需要
+pickle 整个规划器。任务以起点为单位分发，结果按提交顺序返回，保证与串行
+规划的输出顺序一致。
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmarks import Landmarks
+
+# 工作进程内的规划器与共享内存句柄
+_worker_planner = None
+_worker_segments = []
+
+
+class SharedArray:
+    def __init__(self, array):
+        """在共享内存中创建 array 的副本"""
+        array = np.ascontiguousarray(array)
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(self.shape, dtype=array.dtype, buffer=self.shm.buf)[...] = array
+
+    @property
+    def spec(self):
+        """工作进程挂载所需的描述信息 (名称, 形状, 数据类型)"""
+        return (self.shm.name, self.shape, self.dtype)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_array(spec):
+    """按描述信息挂载共享内存数组，返回 (共享内存句柄, 只读数组)"""
+    name, shape, dtype = spec
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 没有 track 参数；进程池子进程与父进程共用同一个
+        # resource tracker，重复登记不会产生额外条目，由父进程负责 unlink
+        shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    array.flags.writeable = False
+    return shm, array
+
+
+def _init_worker(grid_spec, relaxed_spec, bounds, grid_size, buildings, sports, engine, jps_spec, safety_margin,
+                 building_heights, cost_model, search_weight, landmark_spec):
+    global _worker_planner
+    from route_planner import DroneRoutePlanner
+
+    shm, grid = attach_array(grid_spec)
+    _worker_segments.append(shm)
+    relaxed_shm, relaxed_grid = attach_array(relaxed_spec)
+    _worker_segments.append(relaxed_shm)
+    jps_tables = None
+    if jps_spec is not None:
+        jps_shm, jps_tables = attach_array(jps_spec)
+        _worker_segments.append(jps_shm)
+    landmarks = None
+    if landmark_spec is not None:
+        table_spec, cells, scale = landmark_spec
+        table_shm, table = attach_array(table_spec)
+        _worker_segments.append(table_shm)
+        landmarks = Landmarks(table, cells, scale)
+    _worker_planner = DroneRoutePlanner.from_grid(
+        grid, bounds, grid_size, buildings, sports,
+        planner=engine, jps_tables=jps_tables, safety_margin=safety_margin, relaxed_grid=relaxed_grid,
+        building_heights=building_heights, cost_model=cost_model, search_weight=search_weight,
+        landmarks=landmarks
+    )
+
+
+def _plan_job(job):
+    source, goals, mode = job
+    return _worker_planner.plan_from_source(source, goals, mode)
+
+
+class RoutePool:
+    def __init__(self, planner, workers=1):
+        """
+        航线规划任务池
+        workers <= 1 时在当前进程串行执行，否则启动 workers 个工作进程
+        """
+        self.planner = planner
+        self.workers = workers
+        self.pool = None
+        self.shared = []
+
+    def __enter__(self):
+        if self.workers > 1:
+            planner = self.planner
+            grid = self._share(planner.obstacle_grid)
+            relaxed_grid = self._share(planner.relaxed_grid)
+            jps_spec = None
+            if planner.search_engine == 'jps':
+                jps_spec = self._share(planner.get_jps().tables)
+            landmark_spec = None
+            landmarks = planner.get_landmarks()
+            if landmarks is not None:
+                landmark_spec = (self._share(landmarks.table), np.array(landmarks.cells), landmarks.scale)
+            self.pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(
+                    grid, relaxed_grid, planner.bounds, planner.grid_size,
+                    planner.buildings, planner.sports,
+                    planner.search_engine, jps_spec, planner.safety_margin, planner.building_heights,
+                    planner.cost_model, planner.search_weight, landmark_spec
+                )
+            )
+        return self
+
+    def _share(self, array):
+        shared = SharedArray(array)
+        self.shared.append(shared)
+        return shared.spec
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.pool is not None:
+            self.pool.terminate() if exc_type else self.pool.close()
+            self.pool.join()
+            self.pool = None
+        for shared in self.shared:
+            shared.release()
+        self.shared = []
+        return False
+
+    def map_sources(self, sources, targets, mode="tree"):
+        """按 sources 顺序逐个产出 (起点, 对应 targets 的路径列表)"""
+        if self.pool is None:
+            for source in sources:
+                yield source, self.planner.plan_from_source(source, targets, mode)
+            return
+
+        goals = [target['coordinates'] for target in targets]
+        jobs = [({'coordinates': source['coordinates']}, [{'coordinates': g} for g in goals], mode)
+                for source in sources]
+        for source, paths in zip(sources, self.pool.imap(_plan_job, jobs)):
+            yield source, paths
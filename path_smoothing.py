@@ -0,0 +1,128 @@
+"""
+航线平滑与航点压缩
+
+网格路径每格一个点。这里用障碍物网格上的视线检查做拉绳（string pulling）：
+从当前锚点出发尽量连到最远的可见航点，中间的点全部删掉；可选再做一次
+Douglas–Peucker 简化，同样只在弦线可见时才删除中间点。
+弦线不长于被替换的折线，因此航线长度不会增加（最后再用 calculate_route_length
+复核一次，极端浮点情况下保留原路径）。
+"""
+import json
+import math
+
+import numpy as np
+
+
+class GridLineOfSight:
+    def __init__(self, grid, bounds, grid_size):
+        """
+        grid: (height, width) 布尔障碍物网格，网格点 (j, i) 代表以
+        (bounds[0] + j * grid_size, bounds[2] + i * grid_size) 为中心的一个格子
+        """
+        self.grid = np.asarray(grid, dtype=bool)
+        self.height, self.width = self.grid.shape
+        self.bounds = bounds
+        self.grid_size = grid_size
+
+    def to_grid(self, coord):
+        """经纬度 -> 连续网格坐标"""
+        return ((coord[0] - self.bounds[0]) / self.grid_size,
+                (coord[1] - self.bounds[2]) / self.grid_size)
+
+    def cells(self, a, b):
+        """
+        线段 a -> b 经过的所有格子 (xs, ys)
+        求出线段与格子边界（半整数坐标）的全部交点参数，取相邻交点之间的中点定位格子
+        """
+        ax, ay = self.to_grid(a)
+        bx, by = self.to_grid(b)
+        dx, dy = bx - ax, by - ay
+
+        ts = [np.array([0.0, 1.0])]
+        if dx != 0:
+            lo, hi = sorted((ax, bx))
+            ks = np.arange(math.floor(lo - 0.5), math.ceil(hi - 0.5) + 1) + 0.5
+            ts.append((ks - ax) / dx)
+        if dy != 0:
+            lo, hi = sorted((ay, by))
+            ks = np.arange(math.floor(lo - 0.5), math.ceil(hi - 0.5) + 1) + 0.5
+            ts.append((ks - ay) / dy)
+        t = np.unique(np.clip(np.concatenate(ts), 0.0, 1.0))
+
+        mid = (t[:-1] + t[1:]) / 2 if len(t) > 1 else t
+        xs = np.floor(ax + mid * dx + 0.5).astype(np.int64)
+        ys = np.floor(ay + mid * dy + 0.5).astype(np.int64)
+        return xs, ys
+
+    def __call__(self, a, b):
+        """线段 a -> b 是否只经过网格内的可通行格子"""
+        xs, ys = self.cells(a, b)
+        if xs.min() < 0 or ys.min() < 0 or xs.max() >= self.width or ys.max() >= self.height:
+            return False
+        return not self.grid[ys, xs].any()
+
+
+def string_pull(path, line_of_sight):
+    """拉绳：从锚点出发，保留最后一个可见航点作为下一个锚点"""
+    if len(path) <= 2:
+        return list(path)
+
+    result = [path[0]]
+    anchor = 0
+    for k in range(2, len(path)):
+        if not line_of_sight(path[anchor], path[k]):
+            anchor = k - 1
+            result.append(path[anchor])
+    result.append(path[-1])
+    return result
+
+
+def douglas_peucker(path, tolerance, line_of_sight):
+    """
+    Douglas–Peucker 简化（tolerance 与坐标同单位，即度）
+    只有弦线与障碍物无冲突时才删除中间点
+    """
+    if len(path) <= 2:
+        return list(path)
+
+    pts = np.asarray(path, dtype=np.float64)
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        seg = pts[j] - pts[i]
+        rel = pts[i + 1:j] - pts[i]
+        length = math.hypot(*seg)
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        k = int(np.argmax(dist))
+        if dist[k] <= tolerance and line_of_sight(path[i], path[j]):
+            continue
+        k += i + 1
+        keep[k] = True
+        stack.append((i, k))
+        stack.append((k, j))
+    return [p for p, flag in zip(path, keep) if flag]
+
+
+def smooth_path(path, line_of_sight, route_length, tolerance=None):
+    """
+    拉绳 + 可选 Douglas–Peucker，返回压缩后的路径
+    route_length 用于复核长度不增加
+    """
+    smoothed = string_pull(path, line_of_sight)
+    if tolerance:
+        smoothed = douglas_peucker(smoothed, tolerance, line_of_sight)
+    if route_length(smoothed) > route_length(path):
+        return list(path)
+    return smoothed
+
+
+def path_bytes(path):
+    """路径序列化为 JSON 后的字节数"""
+    return len(json.dumps(path, separators=(',', ':')).encode('utf-8'))
@@ -0,0 +1,182 @@
+"""
+障碍物网格栅格化引擎
+
+网格点 (j, i) 对应坐标 (bounds[0] + j * grid_size, bounds[2] + i * grid_size)，
+与 DroneRoutePlanner.grid_to_coord 一致。每个多边形只在其包围盒覆盖的网格范围内
+做向量化的点在多边形内判断，判断规则与 DroneRoutePlanner.point_in_polygon
+（射线法）逐位一致，因此结果与逐点判断完全相同。
+"""
+import math
+
+import numpy as np
+
+# 运动场所缓冲区的计算方式
+#   vertex:   到多边形顶点的距离（与旧版逐顶点判断一致）
+#   geometry: 到多边形边界的真实几何距离
+BUFFER_MODES = ('vertex', 'geometry')
+
+
+def grid_window(bbox, bounds, grid_size, grid_width, grid_height):
+    """返回覆盖包围盒 [minx, maxx, miny, maxy] 的网格索引范围 (j0, j1, i0, i1)，右开区间"""
+    minx, maxx, miny, maxy = bbox
+    # 多留一格余量，边界上的点交给精确判断处理
+    j0 = max(0, int(math.floor((minx - bounds[0]) / grid_size)) - 1)
+    j1 = min(grid_width, int(math.ceil((maxx - bounds[0]) / grid_size)) + 2)
+    i0 = max(0, int(math.floor((miny - bounds[2]) / grid_size)) - 1)
+    i1 = min(grid_height, int(math.ceil((maxy - bounds[2]) / grid_size)) + 2)
+    return j0, j1, i0, i1
+
+
+def window_coords(window, bounds, grid_size):
+    """返回窗口内网格点的经度 (1, nx) 与纬度 (ny, 1) 数组"""
+    j0, j1, i0, i1 = window
+    xs = bounds[0] + np.arange(j0, j1) * grid_size
+    ys = bounds[2] + np.arange(i0, i1) * grid_size
+    return xs[np.newaxis, :], ys[:, np.newaxis]
+
+
+def polygon_bbox(polygon):
+    """多边形包围盒 [minx, maxx, miny, maxy]"""
+    pts = np.asarray(polygon, dtype=np.float64)
+    return [pts[:, 0].min(), pts[:, 0].max(), pts[:, 1].min(), pts[:, 1].max()]
+
+
+def points_in_polygon(xs, ys, polygon):
+    """
+    向量化的射线法判断，xs 与 ys 可广播
+    逐条边翻转 inside 标记，与 point_in_polygon 的判断顺序和浮点运算保持一致
+    """
+    pts = np.asarray(polygon, dtype=np.float64)
+    inside = np.zeros(np.broadcast(xs, ys).shape, dtype=bool)
+    p1 = pts
+    p2 = np.roll(pts, -1, axis=0)
+
+    for (p1x, p1y), (p2x, p2y) in zip(p1.tolist(), p2.tolist()):
+        if p1y == p2y:
+            # 水平边不会满足 min(p1y, p2y) < y <= max(p1y, p2y)
+            continue
+        y_hit = (ys > min(p1y, p2y)) & (ys <= max(p1y, p2y))
+        if not y_hit.any():
+            continue
+        hit = y_hit & (xs <= max(p1x, p2x))
+        if p1x != p2x:
+            xinters = (ys - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+            hit &= xs <= xinters
+        inside ^= hit
+
+    return inside
+
+
+def points_near_vertices(xs, ys, polygon, distance):
+    """判断点到多边形任一顶点的距离是否不超过 distance"""
+    near = np.zeros(np.broadcast(xs, ys).shape, dtype=bool)
+    for px, py in np.asarray(polygon, dtype=np.float64).tolist():
+        near |= np.sqrt((xs - px) ** 2 + (ys - py) ** 2) <= distance
+    return near
+
+
+def points_near_boundary(xs, ys, polygon, distance):
+    """判断点到多边形边界（线段）的距离是否不超过 distance"""
+    pts = np.asarray(polygon, dtype=np.float64)
+    near = np.zeros(np.broadcast(xs, ys).shape, dtype=bool)
+    limit = distance * distance
+
+    for (ax, ay), (bx, by) in zip(pts.tolist(), np.roll(pts, -1, axis=0).tolist()):
+        ex, ey = bx - ax, by - ay
+        length2 = ex * ex + ey * ey
+        if length2 == 0:
+            near |= (xs - ax) ** 2 + (ys - ay) ** 2 <= limit
+            continue
+        t = np.clip(((xs - ax) * ex + (ys - ay) * ey) / length2, 0.0, 1.0)
+        dx = xs - (ax + t * ex)
+        dy = ys - (ay + t * ey)
+        near |= dx * dx + dy * dy <= limit
+
+    return near
+
+
+def rasterize_polygons(grid, polygons, bounds, grid_size):
+    """将多边形内部的网格点标记为 True（原地修改 grid）"""
+    grid_height, grid_width = grid.shape
+    for polygon in polygons:
+        if len(polygon) < 3:
+            continue
+        window = grid_window(polygon_bbox(polygon), bounds, grid_size, grid_width, grid_height)
+        j0, j1, i0, i1 = window
+        if j0 >= j1 or i0 >= i1:
+            continue
+        xs, ys = window_coords(window, bounds, grid_size)
+        grid[i0:i1, j0:j1] |= points_in_polygon(xs, ys, polygon)
+    return grid
+
+
+def rasterize_buffered_polygons(grid, polygons, bounds, grid_size, buffer_distance, mode='vertex'):
+    """将多边形内部及其缓冲区内的网格点标记为 True（原地修改 grid）"""
+    if mode not in BUFFER_MODES:
+        raise ValueError(f"未知的缓冲区模式: {mode}")
+    near = points_near_vertices if mode == 'vertex' else points_near_boundary
+
+    grid_height, grid_width = grid.shape
+    for polygon in polygons:
+        if len(polygon) == 0:
+            continue
+        minx, maxx, miny, maxy = polygon_bbox(polygon)
+        bbox = [minx - buffer_distance, maxx + buffer_distance,
+                miny - buffer_distance, maxy + buffer_distance]
+        window = grid_window(bbox, bounds, grid_size, grid_width, grid_height)
+        j0, j1, i0, i1 = window
+        if j0 >= j1 or i0 >= i1:
+            continue
+        xs, ys = window_coords(window, bounds, grid_size)
+        mask = near(xs, ys, polygon, buffer_distance)
+        if len(polygon) >= 3:
+            mask |= points_in_polygon(xs, ys, polygon)
+        grid[i0:i1, j0:j1] |= mask
+    return grid
+
+
+def rasterize_window(window, bounds, grid_size, polygons=(), buffered_polygons=(),
+                     buffer_distance=0.0, mode='vertex'):
+    """
+    只重新栅格化窗口 (j0, j1, i0, i1) 内的网格点，返回窗口大小的布尔数组
+    网格点坐标按全局索引计算，结果与整体栅格化中对应的部分逐位一致
+    """
+    if mode not in BUFFER_MODES:
+        raise ValueError(f"未知的缓冲区模式: {mode}")
+    near = points_near_vertices if mode == 'vertex' else points_near_boundary
+
+    j0, j1, i0, i1 = window
+    result = np.zeros((max(0, i1 - i0), max(0, j1 - j0)), dtype=bool)
+    jobs = [(polygon, 0.0) for polygon in polygons if len(polygon) >= 3]
+    jobs += [(polygon, buffer_distance) for polygon in buffered_polygons if len(polygon) > 0]
+
+    for polygon, distance in jobs:
+        minx, maxx, miny, maxy = polygon_bbox(polygon)
+        bbox = [minx - distance, maxx + distance, miny - distance, maxy + distance]
+        pj0, pj1, pi0, pi1 = grid_window(bbox, bounds, grid_size, j1, i1)
+        pj0, pi0 = max(pj0, j0), max(pi0, i0)
+        if pj0 >= pj1 or pi0 >= pi1:
+            continue
+        xs, ys = window_coords((pj0, pj1, pi0, pi1), bounds, grid_size)
+        mask = near(xs, ys, polygon, distance) if distance > 0 else np.zeros((pi1 - pi0, pj1 - pj0), dtype=bool)
+        if len(polygon) >= 3:
+            mask |= points_in_polygon(xs, ys, polygon)
+        result[pi0 - i0:pi1 - i0, pj0 - j0:pj1 - j0] |= mask
+    return result
+
+
+def rasterize_heights(height_grid, polygons, heights, bounds, grid_size):
+    """网格点的高度取覆盖它的所有多边形高度的最大值（原地修改 height_grid）"""
+    grid_height, grid_width = height_grid.shape
+    for polygon, height in zip(polygons, heights):
+        if len(polygon) < 3:
+            continue
+        window = grid_window(polygon_bbox(polygon), bounds, grid_size, grid_width, grid_height)
+        j0, j1, i0, i1 = window
+        if j0 >= j1 or i0 >= i1:
+            continue
+        xs, ys = window_coords(window, bounds, grid_size)
+        inside = points_in_polygon(xs, ys, polygon)
+        region = height_grid[i0:i1, j0:j1]
+        region[inside] = np.maximum(region[inside], height)
+    return height_grid
@@ -0,0 +1,195 @@
+"""
+时空预约表与时空 A*
+
+同一高度层上同时飞行的无人机不能在同一时刻占用同一网格点。预约表是
+(高度, 网格扁平索引, 时间片) -> 无人机 的哈希表，查询和预约都是 O(1)；每个时间片
+另记一份键列表，collect 时按时间片整片删除已经过去的预约，表的大小只与空中的无人机数
+成正比。
+
+时空 A* 的状态为 (网格点, 时间片)，每一步（八方向移动或原地悬停）占用一个时间片。
+启发式为障碍物网格上到终点的精确步数（distance_field，按终点缓存）：没有冲突时几乎只扩展
+最短路径上的状态，不会因为可以原地悬停而在绕障时展开大量 (网格点, 时间片)。
+除了同一时刻的点冲突，还检查两架无人机在相邻时间片互换位置的对穿冲突。
+起飞前可以在地面等待（不占用空域），降落后不再占用空域。
+多架无人机按优先级依次规划，每架都避开已预约的航线（prioritized planning）。
+"""
+import heapq
+
+import numpy as np
+
+# 地面等待状态（起飞前，不占用空域）
+GROUND = -1
+
+
+class ReservationTable:
+    def __init__(self, slot_seconds=1.0):
+        """slot_seconds: 每个时间片的长度（秒），默认与网格边长 / 无人机速度相当"""
+        self.slot_seconds = slot_seconds
+        self.cells = {}
+        self.slots = {}
+        self.by_drone = {}
+        self.oldest = None
+
+    def __len__(self):
+        return len(self.cells)
+
+    def slot(self, seconds):
+        return int(seconds // self.slot_seconds)
+
+    def owner(self, layer, cell, slot):
+        return self.cells.get((layer, cell, slot))
+
+    def is_free(self, layer, cell, slot, drone=None):
+        owner = self.cells.get((layer, cell, slot))
+        return owner is None or owner == drone
+
+    def move_conflicts(self, layer, cell, next_cell, slot, drone=None):
+        """从 cell（时间片 slot）移动到 next_cell（slot + 1）是否与其他无人机冲突"""
+        owner = self.cells.get((layer, next_cell, slot + 1))
+        if owner is not None and owner != drone:
+            return True
+        # 对穿：另一架无人机同时从 next_cell 移动到 cell
+        other = self.cells.get((layer, next_cell, slot))
+        return other is not None and other != drone and self.cells.get((layer, cell, slot + 1)) == other
+
+    def reserve(self, drone, layer, cells, start_slot):
+        """预约 cells[k] 在时间片 start_slot + k 的占用"""
+        keys = self.by_drone.setdefault(drone, [])
+        for k, cell in enumerate(cells):
+            slot = start_slot + k
+            key = (layer, cell, slot)
+            self.cells[key] = drone
+            self.slots.setdefault(slot, []).append(key)
+            keys.append(key)
+        if cells and (self.oldest is None or start_slot < self.oldest):
+            self.oldest = start_slot
+
+    def release(self, drone):
+        """取消无人机的全部预约（任务取消或重新规划）"""
+        for key in self.by_drone.pop(drone, ()):
+            if self.cells.get(key) == drone:
+                del self.cells[key]
+
+    def collect(self, now):
+        """删除早于 now（秒）的全部预约，返回删除的条数"""
+        if self.oldest is None:
+            return 0
+        current = self.slot(now)
+        removed = 0
+        for slot in range(self.oldest, current):
+            for key in self.slots.pop(slot, ()):
+                if self.cells.pop(key, None) is not None:
+                    removed += 1
+        self.oldest = max(self.oldest, current)
+        if not self.cells:
+            self.slots.clear()
+            self.by_drone.clear()
+            self.oldest = None
+        else:
+            for drone in list(self.by_drone):
+                keys = [key for key in self.by_drone[drone] if key[2] >= current]
+                if keys:
+                    self.by_drone[drone] = keys
+                else:
+                    del self.by_drone[drone]
+        return removed
+
+
+def distance_field(blocked, goal):
+    """
+    八方向、每步代价 1 时各网格点到 goal (x, y) 的最少步数（按波前整体膨胀的 BFS），
+    不可达或障碍物为 -1，返回扁平 int32 数组
+    """
+    height, width = blocked.shape
+    free = ~np.asarray(blocked, dtype=bool)
+    distance = np.full((height, width), -1, dtype=np.int32)
+    frontier = np.zeros((height, width), dtype=bool)
+    frontier[goal[1], goal[0]] = True
+    distance[frontier] = 0
+    step = 0
+    while frontier.any():
+        step += 1
+        grown = np.zeros((height + 2, width + 2), dtype=bool)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                grown[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] |= frontier
+        frontier = grown[1:-1, 1:-1] & free & (distance < 0)
+        distance[frontier] = step
+    return distance.ravel()
+
+
+def space_time_astar(search, table, layer, drone, start, goal, start_slot, max_delay=60, horizon=None,
+                     field=None):
+    """
+    在 GridSearch 的障碍物网格上做时空 A*，避开 table 中其他无人机的预约
+    start/goal: 网格坐标 (x, y)；start_slot: 最早起飞的时间片
+    max_delay: 最多在地面等待的时间片数；horizon: 最多飞行的时间片数（默认按距离估计）
+    field: distance_field 算出的到终点步数，省略时现场计算
+    返回 (起飞时间片, [网格扁平索引, ...])，路径第 k 个点占用时间片 起飞时间片 + k；找不到时返回 None
+    """
+    start_idx = search.index(start)
+    goal_idx = search.index(goal)
+    if field is None:
+        field = distance_field(search.blocked.reshape(search.height, search.width) == 1, goal)
+    h = memoryview(field)
+    distance = h[start_idx]
+    if distance < 0:
+        return None
+    if horizon is None:
+        horizon = 2 * distance + 100
+    last_slot = start_slot + max_delay + horizon
+
+    mask_of = search._mask_view
+    moves = search.moves
+    cells = table.cells
+
+    # 状态 (网格点, 时间片)；g 为自 start_slot 起经过的时间片数
+    open_set = [(distance, 0, GROUND, start_slot)]
+    parent = {(GROUND, start_slot): None}
+    closed = set()
+
+    while open_set:
+        _, neg_g, current, slot = heapq.heappop(open_set)
+        state = (current, slot)
+        if state in closed:
+            continue
+        closed.add(state)
+
+        if current == goal_idx:
+            path = []
+            while state[0] != GROUND:
+                path.append(state[0])
+                state = parent[state]
+            path.reverse()
+            return state[1] + 1, path
+
+        next_slot = slot + 1
+        if next_slot > last_slot:
+            continue
+        g = -neg_g + 1
+        successors = []
+        if current == GROUND:
+            if next_slot - start_slot <= max_delay:
+                successors.append(GROUND)
+            owner = cells.get((layer, start_idx, next_slot))
+            if owner is None or owner == drone:
+                successors.append(start_idx)
+        else:
+            # 原地悬停与八方向移动
+            owner = cells.get((layer, current, next_slot))
+            if owner is None or owner == drone:
+                successors.append(current)
+            for offset, _ in moves[mask_of[current]]:
+                neighbor = current + offset
+                if not table.move_conflicts(layer, current, neighbor, slot, drone):
+                    successors.append(neighbor)
+
+        for neighbor in successors:
+            next_state = (neighbor, next_slot)
+            if next_state in closed or next_state in parent:
+                continue
+            parent[next_state] = state
+            f = g + (distance + 1 if neighbor == GROUND else h[neighbor])
+            heapq.heappush(open_set, (f, -g, neighbor, next_slot))
+
+    return None
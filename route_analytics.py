@@ -0,0 +1,206 @@
+"""
+向量化航线分析
+
+所有航线的航点打包成一个 (N, 2) 坐标数组加 (航线数 + 1,) 的偏移数组，航段长度、航线长度、
+飞行时间、绕行系数（航线长度 / 起终点大圆距离）和分位数都在打包数组上一次算完，
+不再逐航线、逐航点循环。航段长度与 calculate_route_length 使用相同的局部平面近似，
+结果一致（浮点误差范围内）。
+
+起点 x 宿舍的航线长度矩阵可导出为 .npy 或 CSV，供调度（dispatch.DistanceMatrix）使用。
+"""
+import csv
+import math
+from itertools import chain
+
+import numpy as np
+
+KM_PER_DEGREE = 111.32
+# 与 KM_PER_DEGREE 对应的地球半径，使大圆距离与平面近似在小范围内一致
+EARTH_RADIUS_KM = KM_PER_DEGREE * 180 / math.pi
+
+ROUTE_TYPES = ('canteen_to_dorm', 'gate_to_dorm')
+
+
+class PackedRoutes:
+    def __init__(self, coords, offsets, kinds):
+        """
+        coords: (N, 2) 所有航点（经度, 纬度）
+        offsets: (R + 1,) 第 r 条航线的航点为 coords[offsets[r]:offsets[r + 1]]
+        kinds: (R,) 航线类型在 ROUTE_TYPES 中的序号
+        """
+        self.coords = coords
+        self.offsets = offsets
+        self.kinds = kinds
+
+    @classmethod
+    def from_routes(cls, routes):
+        """打包 plan_routes 的结果（跳过没有路径的航线）"""
+        paths = []
+        kinds = []
+        for kind, route_type in enumerate(ROUTE_TYPES):
+            for route in routes.get(route_type, []):
+                if route.get('path'):
+                    paths.append(route['path'])
+                    kinds.append(kind)
+        counts = np.fromiter((len(path) for path in paths), dtype=np.int64, count=len(paths))
+        offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        coords = np.fromiter(
+            chain.from_iterable(point[:2] for path in paths for point in path),
+            dtype=float, count=2 * int(offsets[-1])
+        ).reshape(-1, 2)
+        return cls(coords, offsets, np.array(kinds, dtype=np.int8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def starts(self):
+        return self.coords[self.offsets[:-1]]
+
+    def ends(self):
+        return self.coords[self.offsets[1:] - 1]
+
+    def lengths(self):
+        """每条航线的长度（公里）"""
+        if len(self.coords) < 2:
+            return np.zeros(len(self))
+        # 相邻航点之间的航段（包括跨航线的假航段，前缀和相减时抵消）
+        segments = segment_km(self.coords[:-1], self.coords[1:])
+        cumulative = np.concatenate(([0.0], np.cumsum(segments)))
+        return cumulative[self.offsets[1:] - 1] - cumulative[self.offsets[:-1]]
+
+
+def segment_km(a, b):
+    """逐对航段长度（公里），与 calculate_route_length 相同的局部平面近似"""
+    mean_lat = np.radians((a[:, 1] + b[:, 1]) / 2)
+    dx = (b[:, 0] - a[:, 0]) * KM_PER_DEGREE * np.cos(mean_lat)
+    dy = (b[:, 1] - a[:, 1]) * KM_PER_DEGREE
+    return np.hypot(dx, dy)
+
+
+def great_circle_km(a, b):
+    """逐对大圆距离（公里，haversine）"""
+    lon1, lat1 = np.radians(a[:, 0]), np.radians(a[:, 1])
+    lon2, lat2 = np.radians(b[:, 0]), np.radians(b[:, 1])
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def summarize(values, percentiles):
+    if len(values) == 0:
+        return None
+    summary = {
+        'mean': float(np.mean(values)),
+        'min': float(np.min(values)),
+        'max': float(np.max(values))
+    }
+    for q, value in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f'p{q}'] = float(value)
+    return summary
+
+
+def analyze(packed, speed=10.0, percentiles=(50, 90, 95, 99)):
+    """
+    航线统计：按航线类型给出长度（公里）、飞行时间（秒，speed 米/秒）和绕行系数的
+    均值、最值与分位数；起终点重合的航线不计入绕行系数
+    """
+    lengths = packed.lengths()
+    direct = great_circle_km(packed.starts(), packed.ends())
+    detour = np.divide(lengths, direct, out=np.full(len(lengths), np.nan), where=direct > 0)
+
+    report = {}
+    for kind, route_type in enumerate(ROUTE_TYPES):
+        selected = packed.kinds == kind
+        ratios = detour[selected]
+        report[route_type] = {
+            'routes': int(selected.sum()),
+            'points': int(np.sum(np.diff(packed.offsets)[selected])),
+            'length_km': summarize(lengths[selected], percentiles),
+            'flight_time_s': summarize(lengths[selected] * 1000.0 / speed, percentiles),
+            'detour_ratio': summarize(ratios[~np.isnan(ratios)], percentiles)
+        }
+    return report
+
+
+def route_pairs(planner, routes):
+    """
+    每条航线（PackedRoutes 的顺序）对应的起点序号（食堂 + 校门）和宿舍序号，
+    重名地点按航线端点坐标取最近的一个（planner.find_place）；
+    航线的起点或宿舍名称在当前数据中不存在（结果文件与 data/ 不一致）时抛出 ValueError，指明是哪条航线
+    """
+    sources = planner.canteens + planner.gates
+    targets = planner.dorms
+    source_index = {id(place): k for k, place in enumerate(sources)}
+    target_index = {id(place): k for k, place in enumerate(targets)}
+
+    rows = []
+    cols = []
+    for route_type in ROUTE_TYPES:
+        for route in routes.get(route_type, []):
+            path = route.get('path')
+            if not path:
+                continue
+            try:
+                source = planner.find_place(route['from'], path[0], sources)
+                target = planner.find_place(route['to'], path[-1], targets)
+            except ValueError as e:
+                raise ValueError(f"{route_type} 航线 {route['from']} -> {route['to']} 无法对应到当前数据: {e}") from e
+            rows.append(source_index[id(source)])
+            cols.append(target_index[id(target)])
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def od_length_matrix(planner, routes, packed=None):
+    """
+    起点（食堂 + 校门）x 宿舍的航线长度矩阵（公里），没有航线的为 inf，
+    同一对起终点有多条航线时取最短的一条
+    """
+    if packed is None:
+        packed = PackedRoutes.from_routes(routes)
+    rows, cols = route_pairs(planner, routes)
+    lengths = np.full((len(planner.canteens) + len(planner.gates), len(planner.dorms)), np.inf)
+    np.minimum.at(lengths, (rows, cols), packed.lengths())
+    return lengths
+
+
+def export_od_matrix(filename, lengths, source_names, target_names):
+    """导出航线长度矩阵：.npy 保存原始数组，其他扩展名写 CSV（首行宿舍名，首列起点名，无航线为空）"""
+    if filename.endswith('.npy'):
+        np.save(filename, lengths)
+        return
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([''] + list(target_names))
+        for name, row in zip(source_names, lengths):
+            writer.writerow([name] + [f'{value:.6f}' if np.isfinite(value) else '' for value in row])
+
+
+def route_density(packed, bounds, grid_size, width, height):
+    """
+    航线密度：每个网格点被多少条航线经过（同一条航线重复经过只计一次），返回 (height, width) int32
+    航段按不超过半个网格的步长加密采样（取各小段中点），长航段（平滑后的航线）也不会漏掉经过的网格
+    """
+    counts = np.zeros(height * width, dtype=np.int32)
+    if len(packed) == 0:
+        return counts.reshape(height, width)
+    coords = packed.coords
+    route_of_point = np.repeat(np.arange(len(packed)), np.diff(packed.offsets))
+
+    # 同一条航线内的航段（去掉跨航线的相邻点对）
+    same = route_of_point[:-1] == route_of_point[1:]
+    a, b = coords[:-1][same], coords[1:][same]
+    owner = route_of_point[:-1][same]
+    steps = np.maximum(1, np.ceil(np.abs(b - a).max(axis=1) / (grid_size / 2)).astype(np.int64))
+    segment = np.repeat(np.arange(len(a)), steps)
+    t = (np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps) + 0.5) / steps[segment]
+    samples = a[segment] + (b[segment] - a[segment]) * t[:, None]
+    samples = np.vstack([samples, coords])
+    owners = np.concatenate([owner[segment], route_of_point])
+
+    # 网格点 j 的坐标为 bounds[0] + j * grid_size，取最近的网格点
+    x = np.floor((samples[:, 0] - bounds[0]) / grid_size + 0.5).astype(np.int64)
+    y = np.floor((samples[:, 1] - bounds[2]) / grid_size + 0.5).astype(np.int64)
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    cells = np.unique(owners[inside] * (height * width) + y[inside] * width + x[inside]) % (height * width)
+    np.add.at(counts, cells, 1)
+    return counts.reshape(height, width)
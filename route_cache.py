@@ -0,0 +1,52 @@
+"""
+按需规划航线的 LRU 缓存
+
+键为吸附到可通行网格点后的 (起点网格, 终点网格, 搜索引擎)，值为规划好的航线。
+条目数有上限，超出时淘汰最久未使用的条目；命中/未命中次数可用于观察缓存效果。
+各方法在锁内执行，可以被查询服务的多个线程同时调用。
+"""
+import threading
+from collections import OrderedDict
+
+
+class RouteCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """返回缓存的航线并标记为最近使用，未命中返回 None"""
+        with self.lock:
+            path = self.entries.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def put(self, key, path):
+        with self.lock:
+            self.entries[key] = path
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """障碍物变化后清空（计数保留）"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
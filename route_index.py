@@ -0,0 +1,113 @@
+"""
+航线到网格的反向索引
+
+记录每条航线经过的网格点（扁平索引 y * width + x），障碍物变化时据此找出需要
+重规划的航线：
+- 新增障碍物：航线经过的网格点被占用
+- 移除障碍物：释放的网格点 c 满足 d(s, c) + d(c, t) < 航线代价，
+  即绕经 c 有可能得到更短的航线（d 为与网格搜索代价模型一致的 octile 距离，
+  是经过 c 的任意航线代价的下界；单位代价时即切比雪夫距离）
+"""
+import numpy as np
+
+from grid_search import UNIT_COSTS, octile_cost
+from path_smoothing import GridLineOfSight
+
+
+class RouteIndex:
+    def __init__(self, routes, bounds, grid_size, grid_width, grid_height, costs=UNIT_COSTS):
+        """
+        routes: plan_routes 返回的航线字典，航线以 (航线类型, 序号) 为键
+        costs: 网格搜索的 (东西向, 南北向, 对角) 步长代价，见 grid_search.metric_costs
+        """
+        self.routes = routes
+        self.step_costs = costs
+        self.width = grid_width
+        self.height = grid_height
+        self.line_cells = GridLineOfSight(np.zeros((grid_height, grid_width), dtype=bool), bounds, grid_size)
+
+        self.cell_routes = {}
+        self.route_cells = {}
+        self.endpoints = {}
+        self.costs = {}
+        for route_type, route_list in routes.items():
+            for i, route in enumerate(route_list):
+                self.add((route_type, i), route['path'])
+
+    def path_cells(self, path):
+        """航线经过的网格点 (xs, ys)；相邻航点跨越多格时（平滑后的航线）补全线段经过的格子"""
+        pts = np.array([self.line_cells.to_grid(p) for p in path])
+        cells = np.floor(pts + 0.5).astype(np.int64)
+        steps = np.abs(np.diff(cells, axis=0)).max(axis=1) if len(cells) > 1 else np.zeros(0)
+        xs, ys = [cells[:, 0]], [cells[:, 1]]
+        for k in np.nonzero(steps > 1)[0]:
+            sx, sy = self.line_cells.cells(path[k], path[k + 1])
+            xs.append(sx)
+            ys.append(sy)
+        xs, ys = np.concatenate(xs), np.concatenate(ys)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        return xs[inside], ys[inside], pts
+
+    def add(self, key, path):
+        xs, ys, pts = self.path_cells(path)
+        cells = np.unique(ys * self.width + xs)
+        self.route_cells[key] = cells
+        for cell in cells.tolist():
+            self.cell_routes.setdefault(cell, set()).add(key)
+        self.endpoints[key] = (pts[0], pts[-1])
+        # 航线代价：各段 octile 长度之和（逐格航线即网格搜索的路径代价）
+        if len(pts) > 1:
+            delta = np.abs(np.diff(pts, axis=0))
+            self.costs[key] = float(octile_cost(delta[:, 0], delta[:, 1], self.step_costs).sum())
+        else:
+            self.costs[key] = 0.0
+
+    def remove(self, key):
+        for cell in self.route_cells.pop(key).tolist():
+            keys = self.cell_routes.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cell_routes[cell]
+        del self.endpoints[key]
+        del self.costs[key]
+
+    def update(self, key, path):
+        self.remove(key)
+        self.add(key, path)
+
+    def routes_through(self, cells):
+        """经过任一网格点（扁平索引）的航线"""
+        found = set()
+        for cell in np.asarray(cells).tolist():
+            found |= self.cell_routes.get(cell, set())
+        return found
+
+    def routes_improvable(self, cells):
+        """释放网格点后可能变短的航线（octile 下界小于当前代价）"""
+        cells = np.asarray(cells)
+        if len(cells) == 0 or not self.costs:
+            return set()
+        keys = list(self.costs)
+        cy, cx = np.divmod(cells, self.width)
+        freed = np.stack([cx, cy], axis=1).astype(np.float64)
+        starts = np.array([self.endpoints[key][0] for key in keys])
+        goals = np.array([self.endpoints[key][1] for key in keys])
+        costs = np.array([self.costs[key] for key in keys])
+
+        found = set()
+        # 分块计算，避免 航线数 x 释放点数 的矩阵过大
+        for lo in range(0, len(freed), 256):
+            block = freed[lo:lo + 256]
+            to_cell = np.abs(starts[:, np.newaxis, :] - block[np.newaxis, :, :])
+            from_cell = np.abs(block[np.newaxis, :, :] - goals[:, np.newaxis, :])
+            to_cell = octile_cost(to_cell[..., 0], to_cell[..., 1], self.step_costs)
+            from_cell = octile_cost(from_cell[..., 0], from_cell[..., 1], self.step_costs)
+            hit = ((to_cell + from_cell).min(axis=1) < costs - 1e-9)
+            found.update(keys[k] for k in np.nonzero(hit)[0].tolist())
+        return found
+
+    def routes_blocked(self, grid):
+        """经过障碍物网格点的航线（宽松检测或直线回退得到的航线）"""
+        flat = np.asarray(grid, dtype=bool).ravel()
+        return {key for key, cells in self.route_cells.items() if flat[cells].any()}
@@ -1,125 +1,278 @@
+import argparse
 import json
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.colors import LinearSegmentedColormap
-from shapely.geometry import Point, Polygon, LineString
-from shapely.ops import unary_union
-import heapq
 import math
 from typing import List, Tuple, Dict, Set
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+from rasterize import (rasterize_polygons, rasterize_buffered_polygons, rasterize_window, rasterize_heights,
+                       grid_window, polygon_bbox)
+from grid_cache import GridCache, DEFAULT_CACHE_DIR
+from grid_search import GridSearch, UNIT_COSTS, metric_costs, octile_cost
+from parallel import RoutePool
+from jps import JumpPointSearch, jump_tables
+from landmarks import Landmarks
+from path_smoothing import GridLineOfSight, smooth_path, path_bytes
+from route_index import RouteIndex
+from route_cache import RouteCache
+from geometry_store import GeometryStore, POINT, POLYGON
+from layered_grid import LayeredGrid
+from reservation import ReservationTable, space_time_astar, distance_field
+from route_analytics import (PackedRoutes, analyze, od_length_matrix, export_od_matrix, route_density,
+                             KM_PER_DEGREE)
+from metrics import Metrics, timed, profiled
+
+
+def load_pyplot():
+    """
+    按需导入 matplotlib（只有绘图时需要，导入约 0.5 秒）并设置中文字体
+    shapely 同样只在构建可视图、多分辨率网格时导入（见 get_visibility_graph、get_multires）
+    """
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
 
 class DroneRoutePlanner:
-    def __init__(self, data_dir="data"):
-        """初始化航线规划器"""
+    # 航线高度分层
+    DEFAULT_HEIGHT_LEVELS = {
+        'low': 50,
+        'medium': 75,
+        'high': 100
+    }
+    
+    # 从 data_dir 读取的 GeoJSON 图层（道路数据未使用，不加载）
+    GEOMETRY_LAYERS = ('gates', 'canteens', 'dorms', 'buildings', 'sports', 'campus_boundary')
+    
+    # 可选的点对点搜索引擎
+    SEARCH_ENGINES = ('astar', 'jps', 'visibility', 'hierarchical')
+    
+    # 网格搜索的代价模型：'metric' 按米计算（经度方向按纬度余弦缩短，octile 启发式），
+    # 'unit' 每步代价为 1、曼哈顿启发式（历史结果）
+    COST_MODELS = ('metric', 'unit')
+    
+    # 多分辨率网格：每个障碍物网格边长细分的份数（约 1 米）与块边长（细网格数）
+    MULTIRES_SUBDIVISION = 10
+    MULTIRES_BLOCK = 32
+    
+    # 三维分层规划：每层楼高、未标注高度的建筑按此高度处理（偏保守，高于数据中已标注的建筑）、
+    # 建筑顶部以上的垂直安全间隔（米），以及升降每米相对水平飞行每米的代价倍数
+    LEVEL_HEIGHT = 3.0
+    DEFAULT_BUILDING_HEIGHT = 45.0
+    BUILDING_CLEARANCE = 10.0
+    CLIMB_FACTOR = 2.0
+    
+    # 地标（ALT）启发式：距离表的存储类型
+    LANDMARK_DTYPE = 'uint16'
+    
+    def __init__(self, data_dir="data", buffer_mode="vertex", cache_dir=DEFAULT_CACHE_DIR, planner="astar",
+                 safety_margin=10.0, grid_size=0.0001, metrics=None, cost_model="metric", search_weight=1.0,
+                 landmarks=0):
+        """
+        初始化航线规划器
+        buffer_mode: 运动场所缓冲区计算方式，'vertex' 按到顶点的距离（默认，与历史结果一致），
+                     'geometry' 按到多边形边界的真实距离
+        cache_dir: 障碍物网格磁盘缓存目录，None 表示不使用缓存
+        planner: 点对点搜索引擎，'astar'、'jps'（跳点搜索）、'visibility'（任意角度可视图）
+                 或 'hierarchical'（多分辨率网格上的分层搜索）
+        safety_margin: 可视图规划时障碍物多边形的外扩安全距离（米）
+        grid_size: 障碍物网格边长（度），默认约 10 米
+        metrics: 计时与计数（metrics.Metrics），省略时创建关闭状态的实例，可用 enable_metrics 开启
+        cost_model: 网格搜索的代价模型，'metric'（默认）或 'unit'（与历史结果一致）
+        search_weight: 启发式权重，大于 1 时为加权 A*（astar / jps / 三维分层），
+                       航线代价不超过最优代价的 search_weight 倍，扩展的节点更少
+        landmarks: a_star 使用的地标数（ALT 启发式，距离表与障碍物网格一起缓存），0 表示不使用；
+                   距离表内存为 地标数 x 网格点数 x 2 字节
+        """
+        if planner not in self.SEARCH_ENGINES:
+            raise ValueError(f"未知的搜索引擎: {planner}")
+        if cost_model not in self.COST_MODELS:
+            raise ValueError(f"未知的代价模型: {cost_model}")
+        if search_weight < 1.0:
+            raise ValueError(f"启发式权重不能小于 1: {search_weight}")
         self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.search_engine = planner
+        self.cost_model = cost_model
+        self.search_weight = search_weight
+        self.landmark_count = landmarks
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.safety_margin = safety_margin
         self.gates = []
         self.canteens = []
         self.dorms = []
         self.buildings = []
+        self.building_heights = []
         self.sports = []
         self.roads = []
         self.campus_boundary = None
         
         self.load_data()
         
-        self.grid_size = 0.0001
+        self.grid_size = grid_size
+        self.buffer_distance = 0.0005  # 运动场所缓冲区，约50米
+        self.buffer_mode = buffer_mode
         self.bounds = self.calculate_bounds()
         self.grid_width = int((self.bounds[1] - self.bounds[0]) / self.grid_size) + 1
         self.grid_height = int((self.bounds[3] - self.bounds[2]) / self.grid_size) + 1
         
-        # 创建障碍物网格
-        self.obstacle_grid = self.create_obstacle_grid()
+        # 障碍物网格与搜索核心在首次使用时创建（网格优先读取磁盘缓存），
+        # 只做长度计算、分析或绘图时不需要栅格化
+        self.grid_cache = GridCache(cache_dir) if cache_dir else None
+        self.grid_cache_key = None
+        self._obstacle_grid = None
+        self._relaxed_grid = None
+        self._grid_search = None
+        
+        # 宽松版本的搜索核心在首次回退时创建
+        self.relaxed_search = None
+        self.jps = None
+        self.landmarks = None
+        self.visibility_graph = None
+        self.multires = None
+        self.layered_grid = None
+        self.route_index = None
+        self.route_cache = RouteCache()
+        self.reservations = ReservationTable()
+        self.distance_fields = RouteCache(max_entries=256)
+        self.heuristic_fields = RouteCache(max_entries=128)
         
         # 航线高度分层
-        self.height_levels = {
-            'low': 50,    
-            'medium': 75, 
-            'high': 100   
-        }
-        
+        self.height_levels = dict(self.DEFAULT_HEIGHT_LEVELS)
+    
+    @classmethod
+    def from_grid(cls, obstacle_grid, bounds, grid_size, buildings=None, sports=None,
+                  planner="astar", jps_tables=None, safety_margin=10.0, relaxed_grid=None,
+                  building_heights=None, cost_model="metric", search_weight=1.0, landmarks=None):
+        """
+        由现成的障碍物网格构造规划器，不加载 GeoJSON、不读写缓存
+        buildings/sports 仅用于宽松障碍物检测和三维分层规划，可省略
+        building_heights: 与 buildings 对应的建筑高度（米），省略时都按 DEFAULT_BUILDING_HEIGHT 处理
+        jps_tables: 预先计算的跳点搜索跳跃距离表，可省略
+        relaxed_grid: 预先计算的宽松障碍物网格，省略时由 buildings/sports 栅格化
+        landmarks: 预先计算的地标距离表（landmarks.Landmarks），提供时 a_star 使用 ALT 启发式
+        """
+        engine = planner
+        planner = cls.__new__(cls)
+        planner.data_dir = None
+        planner.cache_dir = None
+        planner.geometry = None
+        planner.metrics = Metrics()
+        planner.search_engine = engine
+        planner.cost_model = cost_model
+        planner.search_weight = search_weight
+        planner.landmark_count = landmarks.count if landmarks is not None else 0
+        planner.safety_margin = safety_margin
+        planner.gates = []
+        planner.canteens = []
+        planner.dorms = []
+        planner.buildings = list(buildings or [])
+        if building_heights is None:
+            building_heights = [cls.DEFAULT_BUILDING_HEIGHT] * len(planner.buildings)
+        planner.building_heights = list(building_heights)
+        planner.sports = list(sports or [])
+        planner.roads = []
+        planner.campus_boundary = None
+        
+        planner.grid_size = grid_size
+        planner.buffer_distance = 0.0005
+        planner.buffer_mode = 'vertex'
+        planner.bounds = list(bounds)
+        planner.grid_height, planner.grid_width = obstacle_grid.shape
+        
+        planner.grid_cache = None
+        planner.grid_cache_key = None
+        planner._obstacle_grid = obstacle_grid
+        planner._relaxed_grid = relaxed_grid if relaxed_grid is not None else planner.create_relaxed_grid()
+        planner._grid_search = None
+        planner.relaxed_search = None
+        planner.jps = None
+        if jps_tables is not None:
+            planner.jps = JumpPointSearch(obstacle_grid, jps_tables, planner.octile_costs, search_weight)
+        planner.landmarks = landmarks
+        planner.visibility_graph = None
+        planner.multires = None
+        planner.layered_grid = None
+        planner.route_index = None
+        planner.route_cache = RouteCache()
+        planner.reservations = ReservationTable()
+        planner.distance_fields = RouteCache(max_entries=256)
+        planner.heuristic_fields = RouteCache(max_entries=128)
+        
+        planner.height_levels = dict(cls.DEFAULT_HEIGHT_LEVELS)
+        return planner
+        
+    @timed('load_data')
     def load_data(self):
-        """加载所有GeoJSON数据"""
+        """加载所有GeoJSON数据（经列式几何存储，坐标为连续数组的视图）"""
         print("正在加载数据...")
+        self.geometry = GeometryStore.load(self.data_dir, self.GEOMETRY_LAYERS, self.cache_dir)
         
         # 加载校门
-        with open(f"{self.data_dir}/gates.geojson", 'r', encoding='utf-8') as f:
-            gates_data = json.load(f)
-            for feature in gates_data['features']:
-                coords = feature['geometry']['coordinates']
-                self.gates.append({
-                    'name': f"校门{len(self.gates)+1}",
-                    'coordinates': coords
+        gates = self.geometry['gates']
+        for k in gates.features(POINT):
+            self.gates.append({
+                'name': f"校门{len(self.gates)+1}",
+                'coordinates': gates.point(k).tolist()
+            })
+        
+        # 加载食堂与宿舍
+        for layer_name, places, default in (('canteens', self.canteens, '食堂'), ('dorms', self.dorms, '宿舍')):
+            layer = self.geometry[layer_name]
+            for k in layer.features(POLYGON):
+                coords = layer.ring(k)
+                name = layer.properties[k].get('name', f"{default}{len(places)+1}")
+                places.append({
+                    'name': name,
+                    'coordinates': self.calculate_polygon_center(coords),
+                    'polygon': coords
                 })
         
-        # 加载食堂
-        with open(f"{self.data_dir}/canteens.geojson", 'r', encoding='utf-8') as f:
-            canteens_data = json.load(f)
-            for feature in canteens_data['features']:
-                if feature['geometry']['type'] == 'Polygon':
-                    coords = feature['geometry']['coordinates'][0]
-                    center = self.calculate_polygon_center(coords)
-                    name = feature['properties'].get('name', f"食堂{len(self.canteens)+1}")
-                    self.canteens.append({
-                        'name': name,
-                        'coordinates': center,
-                        'polygon': coords
-                    })
-        
-        # 加载宿舍
-        with open(f"{self.data_dir}/dorms.geojson", 'r', encoding='utf-8') as f:
-            dorms_data = json.load(f)
-            for feature in dorms_data['features']:
-                if feature['geometry']['type'] == 'Polygon':
-                    coords = feature['geometry']['coordinates'][0]
-                    center = self.calculate_polygon_center(coords)
-                    name = feature['properties'].get('name', f"宿舍{len(self.dorms)+1}")
-                    self.dorms.append({
-                        'name': name,
-                        'coordinates': center,
-                        'polygon': coords
-                    })
-        
         # 加载建筑
-        with open(f"{self.data_dir}/buildings.geojson", 'r', encoding='utf-8') as f:
-            buildings_data = json.load(f)
-            for feature in buildings_data['features']:
-                if feature['geometry']['type'] == 'Polygon':
-                    coords = feature['geometry']['coordinates'][0]
-                    self.buildings.append(coords)
+        buildings = self.geometry['buildings']
+        for k in buildings.features(POLYGON):
+            self.buildings.append(buildings.ring(k))
+            self.building_heights.append(self.parse_building_height(buildings.properties[k]))
         
         # 加载运动场所
-        with open(f"{self.data_dir}/sports.geojson", 'r', encoding='utf-8') as f:
-            sports_data = json.load(f)
-            for feature in sports_data['features']:
-                if feature['geometry']['type'] == 'Polygon':
-                    coords = feature['geometry']['coordinates'][0]
-                    name = feature['properties'].get('name', f"运动场所{len(self.sports)+1}")
-                    self.sports.append({
-                        'name': name,
-                        'polygon': coords
-                    })
+        sports = self.geometry['sports']
+        for k in sports.features(POLYGON):
+            name = sports.properties[k].get('name', f"运动场所{len(self.sports)+1}")
+            self.sports.append({
+                'name': name,
+                'polygon': sports.ring(k)
+            })
         
         # 加载校园边界
-        with open(f"{self.data_dir}/campus_boundary.geojson", 'r', encoding='utf-8') as f:
-            boundary_data = json.load(f)
-            if boundary_data['features']:
-                coords = boundary_data['features'][0]['geometry']['coordinates'][0]
-                self.campus_boundary = coords
+        boundary = self.geometry['campus_boundary']
+        if len(boundary):
+            self.campus_boundary = boundary.ring(0)
         
         print(f"数据加载完成: {len(self.gates)}个校门, {len(self.canteens)}个食堂, {len(self.dorms)}个宿舍")
     
+    def parse_building_height(self, properties):
+        """从 OSM 属性解析建筑高度（米）：优先 height，其次 building:levels，都没有时取默认高度"""
+        height = properties.get('height')
+        if height is not None:
+            try:
+                return float(str(height).split()[0])
+            except ValueError:
+                pass
+        levels = properties.get('building:levels')
+        if levels is not None:
+            try:
+                return float(levels) * self.LEVEL_HEIGHT
+            except ValueError:
+                pass
+        return self.DEFAULT_BUILDING_HEIGHT
+    
     def calculate_polygon_center(self, coords):
         """计算多边形中心点"""
-        x_coords = [coord[0] for coord in coords]
-        y_coords = [coord[1] for coord in coords]
-        return [np.mean(x_coords), np.mean(y_coords)]
+        coords = np.asarray(coords, dtype=float)
+        return [float(np.mean(coords[:, 0])), float(np.mean(coords[:, 1]))]
     
     def calculate_bounds(self):
         """计算校园边界"""
@@ -133,7 +286,7 @@ class DroneRoutePlanner:
         for dorm in self.dorms:
             all_coords.append(dorm['coordinates'])
         
-        if self.campus_boundary:
+        if self.campus_boundary is not None:
             all_coords.extend(self.campus_boundary)
         
         if not all_coords:
@@ -181,50 +334,130 @@ class DroneRoutePlanner:
         
         return inside
     
+    @property
+    def obstacle_grid(self):
+        """严格障碍物网格，首次访问时从磁盘缓存加载或栅格化"""
+        if self._obstacle_grid is None:
+            self._obstacle_grid = self.load_or_create_obstacle_grid()
+        return self._obstacle_grid
+    
+    @obstacle_grid.setter
+    def obstacle_grid(self, grid):
+        self._obstacle_grid = grid
+    
+    @property
+    def relaxed_grid(self):
+        """宽松障碍物网格（建筑和运动场所本身），与严格网格一起创建"""
+        if self._relaxed_grid is None and self._obstacle_grid is None:
+            self._obstacle_grid = self.load_or_create_obstacle_grid()
+        return self._relaxed_grid
+    
+    @relaxed_grid.setter
+    def relaxed_grid(self, grid):
+        self._relaxed_grid = grid
+    
+    @property
+    def grid_search(self):
+        """严格网格上的搜索核心，首次使用时创建"""
+        if self._grid_search is None:
+            self._grid_search = GridSearch(self.grid_width, self.grid_height, blocked=self.obstacle_grid,
+                                           costs=self.step_costs, weight=self.search_weight)
+        return self._grid_search
+    
+    @property
+    def step_costs(self):
+        """网格搜索的 (东西向, 南北向, 斜向) 步长代价（米），unit 模型为 None（每步代价 1）"""
+        if self.cost_model == 'unit':
+            return None
+        return metric_costs(self.grid_size, (self.bounds[2] + self.bounds[3]) / 2)
+    
+    @property
+    def octile_costs(self):
+        """octile 距离使用的步长代价，unit 模型为 UNIT_COSTS（切比雪夫距离）"""
+        return self.step_costs or UNIT_COSTS
+    
+    def ensure_grid(self):
+        """确保障碍物网格已创建（同时确定磁盘缓存键，跳点表等派生数据按该键缓存）"""
+        return self.obstacle_grid
+    
+    @timed('obstacle_grid')
+    def load_or_create_obstacle_grid(self):
+        """从磁盘缓存加载障碍物网格，未命中时重新栅格化并写入缓存"""
+        if self.grid_cache is None:
+            return self.create_obstacle_grid()
+        
+        source_files = [f"{self.data_dir}/{name}.geojson" for name in ('buildings', 'sports', 'campus_boundary')]
+        params = {
+            'grid_size': self.grid_size,
+            'buffer_distance': self.buffer_distance,
+            'buffer_mode': self.buffer_mode,
+            'bounds': self.bounds
+        }
+        self.grid_cache_key = self.grid_cache.make_key(source_files, params)
+        
+        cached = self.grid_cache.load(self.grid_cache_key)
+        if cached is not None and 'obstacle_grid' in cached[1]:
+            meta, arrays = cached
+            self.bounds = meta['bounds']
+            self.grid_width = meta['grid_width']
+            self.grid_height = meta['grid_height']
+            print(f"从缓存加载障碍物网格: {self.grid_cache_key[:12]}")
+            relaxed_grid = arrays.get('relaxed_grid')
+            if relaxed_grid is None:
+                # 旧缓存条目只有严格网格，补算宽松网格
+                relaxed_grid = self.grid_cache.store_array(
+                    self.grid_cache_key, 'relaxed_grid', self.create_relaxed_grid()
+                )
+            self.relaxed_grid = relaxed_grid
+            return arrays['obstacle_grid']
+        
+        grid = self.create_obstacle_grid()
+        meta = {
+            'bounds': self.bounds,
+            'grid_width': self.grid_width,
+            'grid_height': self.grid_height
+        }
+        arrays = self.grid_cache.store(
+            self.grid_cache_key, meta, {'obstacle_grid': grid, 'relaxed_grid': self.relaxed_grid}
+        )
+        self.relaxed_grid = arrays['relaxed_grid']
+        return arrays['obstacle_grid']
+    
+    def create_relaxed_grid(self):
+        """宽松障碍物网格：建筑和运动场所本身（不含缓冲区），与 is_major_obstacle 的判断一致"""
+        grid = np.zeros((self.grid_height, self.grid_width), dtype=bool)
+        rasterize_polygons(grid, self.buildings, self.bounds, self.grid_size)
+        rasterize_polygons(grid, [sport['polygon'] for sport in self.sports], self.bounds, self.grid_size)
+        return grid
+    
+    @timed('create_obstacle_grid')
     def create_obstacle_grid(self):
-        """创建障碍物网格"""
+        """
+        创建障碍物网格（按多边形包围盒向量化栅格化）
+        先栅格化宽松网格（建筑 + 运动场所本身），严格网格在其基础上加入运动场所缓冲区
+        """
         print("正在创建障碍物网格...")
-        grid = np.zeros((self.grid_height, self.grid_width), dtype=bool)
         
-        # 标记建筑为障碍物
+        # 标记建筑和运动场所为障碍物
         print("标记建筑为障碍物...")
-        for building in self.buildings:
-            for i in range(self.grid_height):
-                for j in range(self.grid_width):
-                    coord = self.grid_to_coord([j, i])
-                    if self.point_in_polygon(coord, building):
-                        grid[i, j] = True
-        
-        # 标记运动场所为障碍物（增加缓冲区）
-        print("标记运动场所为障碍物...")
-        buffer_distance = 0.0005  # 约50米的缓冲区
+        self.relaxed_grid = self.create_relaxed_grid()
+        grid = self.relaxed_grid.copy()
         
-        for sport in self.sports:
-            sport_polygon = sport['polygon']
-            
-            # 标记运动场所及其周围区域为障碍物
-            for i in range(self.grid_height):
-                for j in range(self.grid_width):
-                    coord = self.grid_to_coord([j, i])
-                    
-                    # 检查是否在运动场所内
-                    if self.point_in_polygon(coord, sport_polygon):
-                        grid[i, j] = True
-                        continue
-                    
-                    # 检查是否在缓冲区范围内
-                    for point in sport_polygon:
-                        distance = math.sqrt((coord[0] - point[0])**2 + (coord[1] - point[1])**2)
-                        if distance <= buffer_distance:
-                            grid[i, j] = True
-                            break
+        # 运动场所增加缓冲区
+        print("标记运动场所为障碍物...")
+        rasterize_buffered_polygons(
+            grid, [sport['polygon'] for sport in self.sports], self.bounds, self.grid_size,
+            self.buffer_distance, self.buffer_mode
+        )
         
         print(f"障碍物网格创建完成: {np.sum(grid)}个障碍物点")
         return grid
     
     def heuristic(self, a, b):
-        """A*算法的启发式函数（曼哈顿距离）"""
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+        """A*算法的启发式函数：metric 模型为 octile 距离（米），unit 模型为曼哈顿距离"""
+        if self.cost_model == 'unit':
+            return abs(a[0] - b[0]) + abs(a[1] - b[1])
+        return float(octile_cost(abs(a[0] - b[0]), abs(a[1] - b[1]), self.octile_costs))
     
     def get_neighbors(self, node):
         """获取节点的邻居"""
@@ -247,60 +480,372 @@ class DroneRoutePlanner:
         
         return neighbors
     
+    def find_path(self, start, goal):
+        """按 search_engine 选择的搜索引擎规划点对点航线"""
+        if self.search_engine == 'jps':
+            return self.jump_point_search(start, goal)
+        if self.search_engine == 'visibility':
+            return self.visibility_path(start, goal)
+        if self.search_engine == 'hierarchical':
+            return self.hierarchical_path(start, goal)
+        return self.a_star(start, goal)
+    
+    def plan_between(self, start, goal):
+        """
+        任意坐标之间的按需规划：起终点吸附到最近的可通行网格点，以网格中心为端点调用 find_path，
+        结果按 (起点网格, 终点网格, 搜索引擎) 存入 LRU 缓存（route_cache）；
+        可视图、分层搜索和直线回退保留输入端点，不吸附时同一网格内的不同查询会拿到别人的端点
+        返回的航线与缓存共享，调用方不要原地修改
+        """
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            return None
+        
+        key = (start_grid, goal_grid, self.search_engine)
+        path = self.route_cache.get(key)
+        if path is None:
+            # 取网格中心而不是 grid_to_coord 的角点，避免浮点误差使其再次落入相邻网格
+            path = self.find_path(
+                self.grid_to_coord((start_grid[0] + 0.5, start_grid[1] + 0.5)),
+                self.grid_to_coord((goal_grid[0] + 0.5, goal_grid[1] + 0.5))
+            )
+            if path is not None:
+                self.route_cache.put(key, path)
+        return path
+    
+    def visibility_path(self, start, goal):
+        """可视图上的任意角度最短航线，只包含起终点和少量拐点"""
+        path = self.get_visibility_graph().shortest_path(start, goal)
+        if path is not None:
+            return path
+        
+        # 可视图不可达（如端点被障碍物完全包围）时回退到网格搜索
+        return self.a_star(start, goal)
+    
+    def get_visibility_graph(self):
+        """可视图在首次使用时构建；运动场所额外外扩与网格相同的缓冲区"""
+        if self.visibility_graph is None:
+            from visibility_graph import VisibilityGraph, METERS_PER_DEGREE
+            print("正在构建可视图...")
+            sports_margin = self.safety_margin + self.buffer_distance * METERS_PER_DEGREE
+            obstacles = list(self.buildings) + [sport['polygon'] for sport in self.sports]
+            margins = [self.safety_margin] * len(self.buildings) + [sports_margin] * len(self.sports)
+            origin = [(self.bounds[0] + self.bounds[1]) / 2, (self.bounds[2] + self.bounds[3]) / 2]
+            self.visibility_graph = VisibilityGraph(obstacles, margins, origin)
+            print(f"可视图构建完成: {len(self.visibility_graph.nodes)}个节点, {self.visibility_graph.edge_count}条边")
+        return self.visibility_graph
+    
+    def hierarchical_path(self, start, goal):
+        """多分辨率网格上的分层搜索：障碍物附近约 1 米精度，只保留拐点"""
+        path = self.get_multires().shortest_path(start, goal)
+        if path is not None:
+            return path
+        
+        # 细网格上不可达时回退到网格搜索（含宽松检测 / 直线路径）
+        return self.a_star(start, goal)
+    
+    def get_multires(self):
+        """两级多分辨率网格在首次使用时构建，数组与障碍物网格一起缓存"""
+        if self.multires is None:
+            from multires import TwoLevelGrid, MIXED
+            self.ensure_grid()
+            fine_size = self.grid_size / self.MULTIRES_SUBDIVISION
+            block = self.MULTIRES_BLOCK
+            prefix = f"multires_{self.MULTIRES_SUBDIVISION}x{block}_"
+            names = ('states', 'index', 'blocks', 'node_block', 'node_offset', 'edges')
+            use_cache = self.grid_cache is not None and self.grid_cache_key is not None
+            
+            arrays = None
+            if use_cache:
+                arrays = [self.grid_cache.load_array(self.grid_cache_key, prefix + name) for name in names]
+                if any(array is None for array in arrays):
+                    arrays = None
+            if arrays is not None:
+                self.multires = TwoLevelGrid(self.bounds, fine_size, block, *arrays)
+            else:
+                print("正在构建多分辨率网格...")
+                self.multires = TwoLevelGrid.build(
+                    self.bounds, fine_size, block, self.buildings,
+                    [sport['polygon'] for sport in self.sports], self.buffer_distance, self.buffer_mode
+                )
+                if use_cache:
+                    for name in names:
+                        self.grid_cache.store_array(self.grid_cache_key, prefix + name, getattr(self.multires, name))
+            print(f"多分辨率网格: {np.count_nonzero(self.multires.states == MIXED)}个边界块, "
+                  f"{len(self.multires.node_block)}个抽象节点, {self.multires.nbytes / 1024:.0f} KB")
+        return self.multires
+    
+    def get_layered_grid(self):
+        """
+        按 height_levels 分层的三维占用网格（按位压缩），首次使用时构建
+        运动场所及其缓冲区在所有高度都不可通行，建筑只阻挡低于其高度加安全间隔的层
+        """
+        if self.layered_grid is None:
+            height_map = np.zeros((self.grid_height, self.grid_width), dtype=np.float32)
+            rasterize_heights(height_map, self.buildings, self.building_heights, self.bounds, self.grid_size)
+            no_fly = np.zeros((self.grid_height, self.grid_width), dtype=bool)
+            rasterize_buffered_polygons(
+                no_fly, [sport['polygon'] for sport in self.sports], self.bounds, self.grid_size,
+                self.buffer_distance, self.buffer_mode
+            )
+            altitudes = sorted(self.height_levels.values())
+            cell_meters = self.grid_size * KM_PER_DEGREE * 1000
+            x_scale = 1.0
+            if self.cost_model == 'metric':
+                x_scale = math.cos(math.radians((self.bounds[2] + self.bounds[3]) / 2))
+            self.layered_grid = LayeredGrid.build(
+                height_map, no_fly, altitudes, self.BUILDING_CLEARANCE,
+                cell_meters, self.CLIMB_FACTOR, x_scale, self.search_weight
+            )
+        return self.layered_grid
+    
+    def plan_3d(self, start, goal, min_height=None):
+        """
+        三维分层规划：可以飞越低矮建筑，升降按高度差计入代价（含起飞和降落）
+        min_height: 最低巡航高度（米），只使用不低于它的高度层
+        返回 (路径, 各航点的飞行高度)，不可达时返回 None
+        """
+        layered = self.get_layered_grid()
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            return None
+        
+        min_layer = 0
+        if min_height is not None:
+            min_layer = next((k for k, altitude in enumerate(layered.altitudes) if altitude >= min_height),
+                             layered.layers)
+        cells = layered.search(start_grid, goal_grid, min_layer)
+        if cells is None:
+            return None
+        path = [self.grid_to_coord((x, y)) for x, y, _ in cells]
+        altitudes = [layered.altitudes[layer] for _, _, layer in cells]
+        return path, altitudes
+    
+    def plan_mission(self, drone, start, goal, depart_time=0.0, height=None, max_delay=60):
+        """
+        为一架即将起飞的无人机规划无冲突航线：在障碍物网格上做时空 A*，避开同一高度层上
+        其他无人机已预约的 (网格点, 时间片)，成功后预约该航线
+        depart_time: 最早起飞时间（秒），起飞点被占用时在地面等待，最多 max_delay 个时间片
+        height: 飞行高度（米），默认 height_levels['medium']
+        重新规划已有预约的无人机时，搜索忽略它自己的预约，成功后才替换；失败时原预约保留
+        已经过去的预约不会自动删除，按时间推进调度时调用 collect_reservations（plan_missions 会调用）
+        返回 {'drone', 'path', 'times', 'height'}，times 为每个航点的到达时间（秒）；找不到时返回 None
+        """
+        height = self.height_levels['medium'] if height is None else height
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            return None
+        
+        table = self.reservations
+        index = start_grid[1] * self.grid_width + start_grid[0]
+        search = self.grid_search
+        field = self.get_distance_field(goal_grid)
+        if field[index] < 0:
+            # 严格网格上不可达时与 a_star 一样改用宽松网格
+            search = self.get_relaxed_search()
+            field = self.get_distance_field(goal_grid, relaxed=True)
+            if field[index] < 0:
+                return None
+        result = space_time_astar(
+            search, table, height, drone, start_grid, goal_grid,
+            table.slot(depart_time), max_delay, field=field
+        )
+        if result is None:
+            return None
+        depart_slot, cells = result
+        # 新航线确定后再释放同一架无人机原来的预约
+        table.release(drone)
+        table.reserve(drone, height, cells, depart_slot)
+        return {
+            'drone': drone,
+            'path': [self.grid_to_coord(self.grid_search.cell(idx)) for idx in cells],
+            'times': [(depart_slot + k) * table.slot_seconds for k in range(len(cells))],
+            'height': height
+        }
+    
+    def collect_reservations(self, now):
+        """删除早于 now（秒）的全部时空预约，返回删除的条数；now 之前不能再规划起飞的任务"""
+        return self.reservations.collect(now)
+    
+    def get_distance_field(self, goal_grid, relaxed=False):
+        """各网格点到 goal_grid 的最少步数（时空 A* 的启发式），按终点缓存"""
+        key = (goal_grid, relaxed)
+        field = self.distance_fields.get(key)
+        if field is None:
+            field = distance_field(self.relaxed_grid if relaxed else self.obstacle_grid, goal_grid)
+            self.distance_fields.put(key, field)
+        return field
+    
+    def plan_missions(self, missions, max_delay=60):
+        """
+        一批任务的优先级规划：按起飞时间（相同时按列表顺序）依次调用 plan_mission，
+        后规划的无人机避开先规划的
+        missions: [{'drone', 'start', 'goal', 'depart_time', 'height'}, ...]（后两项可省略）
+        规划前删除早于本批最早起飞时间的预约（collect_reservations），这些预约不会再与本批冲突
+        返回与 missions 对应的结果列表
+        """
+        order = sorted(range(len(missions)), key=lambda k: missions[k].get('depart_time', 0.0))
+        if order:
+            self.collect_reservations(missions[order[0]].get('depart_time', 0.0))
+        results = [None] * len(missions)
+        for k in order:
+            mission = missions[k]
+            results[k] = self.plan_mission(
+                mission['drone'], mission['start'], mission['goal'],
+                mission.get('depart_time', 0.0), mission.get('height'), max_delay
+            )
+        return results
+    
+    def jump_point_search(self, start, goal):
+        """跳点搜索实现（最优路径，逐格展开为与 a_star 相同的格式）"""
+        # 如果起点或终点在障碍物内，尝试找到最近的可通行点
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            self.metrics.query('jps', 'unsnapped')
+            return None
+        
+        cells = self.get_jps().search(start_grid, goal_grid)
+        if cells is not None:
+            self.metrics.query('jps', 'strict', points=len(cells))
+            return [self.grid_to_coord(cell) for cell in cells]
+        
+        # 如果跳点搜索失败，尝试使用更宽松的障碍物检测
+        return self.a_star_relaxed(start, goal, 'jps')
+    
+    def get_jps(self):
+        """跳点搜索引擎，跳跃距离表与障碍物网格一起缓存"""
+        if self.jps is None:
+            self.ensure_grid()
+            tables = None
+            if self.grid_cache is not None and self.grid_cache_key is not None:
+                tables = self.grid_cache.load_array(self.grid_cache_key, 'jps_tables')
+            if tables is None:
+                tables = jump_tables(self.obstacle_grid)
+                if self.grid_cache is not None and self.grid_cache_key is not None:
+                    tables = self.grid_cache.store_array(self.grid_cache_key, 'jps_tables', tables)
+            self.jps = JumpPointSearch(self.obstacle_grid, tables, self.octile_costs, self.search_weight)
+        return self.jps
+    
+    def get_landmarks(self):
+        """
+        地标距离表（landmarks.Landmarks），与障碍物网格一起缓存；
+        首个地标由第一个可通行的校门 / 食堂确定，其余按最远点采样
+        """
+        if self.landmarks is None and self.landmark_count > 0:
+            self.ensure_grid()
+            name = f"landmarks_{self.cost_model}_{self.landmark_count}_{self.LANDMARK_DTYPE}"
+            cached = None
+            if self.grid_cache is not None and self.grid_cache_key is not None:
+                cached = [self.grid_cache.load_array(self.grid_cache_key, f"{name}_{part}")
+                          for part in ('table', 'cells', 'scale')]
+            if cached is not None and all(array is not None for array in cached):
+                table, cells, scale = cached
+                self.landmarks = Landmarks(table, cells, float(scale[0]))
+            else:
+                print(f"正在计算地标距离表（{self.landmark_count} 个地标）...")
+                seeds = [self.snap_to_free(place['coordinates']) for place in self.gates + self.canteens]
+                landmarks = Landmarks.build(self.grid_search, self.landmark_count,
+                                            [seed for seed in seeds if seed is not None], self.LANDMARK_DTYPE)
+                if self.grid_cache is not None and self.grid_cache_key is not None:
+                    arrays = {'table': landmarks.table, 'cells': landmarks.cells,
+                              'scale': np.array([landmarks.scale])}
+                    for part, array in arrays.items():
+                        arrays[part] = self.grid_cache.store_array(self.grid_cache_key, f"{name}_{part}", array)
+                    landmarks = Landmarks(arrays['table'], arrays['cells'], landmarks.scale)
+                self.landmarks = landmarks
+        return self.landmarks
+    
+    def get_heuristic_field(self, goal_grid):
+        """
+        各网格点到 goal_grid 的 ALT 启发式（全部可用地标的下界与 octile 距离取最大值），按终点缓存：
+        构建一次要扫描 地标数 x 网格点数 的距离表，同一终点的查询（各起点到同一宿舍）只构建一次
+        """
+        field = self.heuristic_fields.get(goal_grid)
+        if field is None:
+            field = self.landmarks.heuristic_field(goal_grid, self.grid_search)
+            self.heuristic_fields.put(goal_grid, field)
+        return field
+    
     def a_star(self, start, goal):
-        """A*算法实现"""
-        start_grid = self.coord_to_grid(start)
-        goal_grid = self.coord_to_grid(goal)
-        
+        """
+        A*算法实现（扁平数组 + 惰性删除堆，见 grid_search.GridSearch）
+        设置了地标数时使用 ALT 启发式（地标三角不等式下界与 octile 距离取最大值，按终点缓存）
+        """
         # 如果起点或终点在障碍物内，尝试找到最近的可通行点
-        if self.obstacle_grid[start_grid[1], start_grid[0]]:
-            start_grid = self.find_nearest_free_point(start_grid)
-            if start_grid is None:
-                return None
-        
-        if self.obstacle_grid[goal_grid[1], goal_grid[0]]:
-            goal_grid = self.find_nearest_free_point(goal_grid)
-            if goal_grid is None:
-                return None
-        
-        open_set = []
-        heapq.heappush(open_set, (0, start_grid))
-        came_from = {}
-        g_score = {start_grid: 0}
-        f_score = {start_grid: self.heuristic(start_grid, goal_grid)}
-        closed_set = set()
-        
-        while open_set:
-            current = heapq.heappop(open_set)[1]
-            
-            if current == goal_grid:
-                # 重建路径
-                path = []
-                while current in came_from:
-                    path.append(self.grid_to_coord(current))
-                    current = came_from[current]
-                path.append(self.grid_to_coord(start_grid))
-                path.reverse()
-                return path
-            
-            closed_set.add(current)
-            
-            for neighbor in self.get_neighbors(current):
-                if neighbor in closed_set:
-                    continue
-                
-                tentative_g_score = g_score[current] + 1
-                
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = g_score[neighbor] + self.heuristic(neighbor, goal_grid)
-                    
-                    if neighbor not in [item[1] for item in open_set]:
-                        heapq.heappush(open_set, (f_score[neighbor], neighbor))
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            self.metrics.query('astar', 'unsnapped')
+            return None
+        
+        h_field = None
+        if self.get_landmarks() is not None:
+            h_field = self.get_heuristic_field(goal_grid)
+        cells = self.grid_search.astar(start_grid, goal_grid, h_field=h_field)
+        if cells is not None:
+            stats = self.grid_search.last_stats
+            self.metrics.query('astar', 'strict', stats['expanded'], stats['pushed'], len(cells))
+            return [self.grid_to_coord(cell) for cell in cells]
         
         # 如果A*算法失败，尝试使用更宽松的障碍物检测
-        return self.a_star_relaxed(start, goal)
+        return self.a_star_relaxed(start, goal, 'astar', self.grid_search.last_stats)
+    
+    def a_star_many(self, start, goals):
+        """
+        一对多航线规划：从 start 做一次 Dijkstra 扩展，所有目标确定后停止，
+        从同一棵最短路径树中提取每条路径；返回与 goals 对应的路径列表
+        严格网格不可达的目标在宽松网格上再做一次一对多搜索，仍不可达时使用直线路径
+        """
+        metrics = self.metrics
+        start_grid = self.snap_to_free(start)
+        if start_grid is None:
+            for _ in goals:
+                metrics.query('tree', 'unsnapped')
+            return [None] * len(goals)
+        
+        goal_grids = [self.snap_to_free(goal) for goal in goals]
+        targets = [g for g in goal_grids if g is not None]
+        tree = self.grid_search.dijkstra_many(start_grid, targets)
+        metrics.count('nodes_expanded', self.grid_search.last_stats['expanded'])
+        metrics.count('heap_pushes', self.grid_search.last_stats['pushed'])
+        
+        missing = [g for g in targets if g not in tree]
+        relaxed_tree = {}
+        if missing:
+            relaxed_search = self.get_relaxed_search()
+            relaxed_tree = relaxed_search.dijkstra_many(start_grid, missing)
+            metrics.count('nodes_expanded', relaxed_search.last_stats['expanded'])
+            metrics.count('heap_pushes', relaxed_search.last_stats['pushed'])
+        
+        # 一对多搜索的节点数按整棵树计入，逐目标只记录回退层级与航点数
+        paths = []
+        for goal, goal_grid in zip(goals, goal_grids):
+            if goal_grid is None:
+                paths.append(None)
+                metrics.query('tree', 'unsnapped')
+                continue
+            if goal_grid in tree:
+                tier = 'strict'
+                paths.append([self.grid_to_coord(cell) for cell in tree[goal_grid]])
+            elif goal_grid in relaxed_tree:
+                tier = 'relaxed'
+                paths.append([self.grid_to_coord(cell) for cell in relaxed_tree[goal_grid]])
+            else:
+                tier = 'straight'
+                paths.append(self.create_straight_path(start, goal))
+            metrics.query('tree', tier, points=len(paths[-1]))
+        return paths
+    
+    def snap_to_free(self, coord):
+        """将坐标转换为网格索引，落在障碍物内时取最近的可通行点"""
+        grid_pos = self.coord_to_grid(coord)
+        if self.obstacle_grid[grid_pos[1], grid_pos[0]]:
+            return self.find_nearest_free_point(grid_pos)
+        return grid_pos
     
     def find_nearest_free_point(self, grid_pos):
         """找到最近的可通行点"""
@@ -316,60 +861,37 @@ class DroneRoutePlanner:
                         return (new_x, new_y)
         return None
     
-    def a_star_relaxed(self, start, goal):
-        """使用更宽松的障碍物检测的A*算法"""
-        start_grid = self.coord_to_grid(start)
-        goal_grid = self.coord_to_grid(goal)
-        
+    def a_star_relaxed(self, start, goal, kind='relaxed', previous=None):
+        """
+        使用更宽松的障碍物检测的A*算法
+        kind/previous: 记录查询时的查询类型，以及严格网格上那次失败搜索的 last_stats（计入节点数）
+        """
         # 如果起点或终点在障碍物内，尝试找到最近的可通行点
-        if self.obstacle_grid[start_grid[1], start_grid[0]]:
-            start_grid = self.find_nearest_free_point(start_grid)
-            if start_grid is None:
-                return None
-        
-        if self.obstacle_grid[goal_grid[1], goal_grid[0]]:
-            goal_grid = self.find_nearest_free_point(goal_grid)
-            if goal_grid is None:
-                return None
-        
-        open_set = []
-        heapq.heappush(open_set, (0, start_grid))
-        came_from = {}
-        g_score = {start_grid: 0}
-        f_score = {start_grid: self.heuristic(start_grid, goal_grid)}
-        closed_set = set()
-        
-        while open_set:
-            current = heapq.heappop(open_set)[1]
-            
-            if current == goal_grid:
-                # 重建路径
-                path = []
-                while current in came_from:
-                    path.append(self.grid_to_coord(current))
-                    current = came_from[current]
-                path.append(self.grid_to_coord(start_grid))
-                path.reverse()
-                return path
-            
-            closed_set.add(current)
-            
-            for neighbor in self.get_neighbors_relaxed(current):
-                if neighbor in closed_set:
-                    continue
-                
-                tentative_g_score = g_score[current] + 1
-                
-                if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = g_score[neighbor] + self.heuristic(neighbor, goal_grid)
-                    
-                    if neighbor not in [item[1] for item in open_set]:
-                        heapq.heappush(open_set, (f_score[neighbor], neighbor))
+        start_grid = self.snap_to_free(start)
+        goal_grid = self.snap_to_free(goal)
+        if start_grid is None or goal_grid is None:
+            self.metrics.query(kind, 'unsnapped')
+            return None
+        
+        search = self.get_relaxed_search()
+        cells = search.astar(start_grid, goal_grid)
+        expanded = search.last_stats['expanded'] + (previous['expanded'] if previous else 0)
+        pushed = search.last_stats['pushed'] + (previous['pushed'] if previous else 0)
+        if cells is not None:
+            self.metrics.query(kind, 'relaxed', expanded, pushed, len(cells))
+            return [self.grid_to_coord(cell) for cell in cells]
         
         # 如果仍然失败，返回直线路径
-        return self.create_straight_path(start, goal)
+        path = self.create_straight_path(start, goal)
+        self.metrics.query(kind, 'straight', expanded, pushed, len(path))
+        return path
+    
+    def get_relaxed_search(self):
+        """宽松版本的搜索核心，使用预先栅格化的宽松障碍物网格"""
+        if self.relaxed_search is None:
+            self.relaxed_search = GridSearch(self.grid_width, self.grid_height, blocked=self.relaxed_grid,
+                                             costs=self.step_costs, weight=self.search_weight)
+        return self.relaxed_search
     
     def get_neighbors_relaxed(self, node):
         """获取节点的邻居（宽松版本，使用更简单的障碍物检测）"""
@@ -393,20 +915,8 @@ class DroneRoutePlanner:
         return neighbors
     
     def is_major_obstacle(self, x, y):
-        """检查是否为主要障碍物（避开建筑和运动场所）"""
-        coord = self.grid_to_coord([x, y])
-        
-        # 检查建筑
-        for building in self.buildings:
-            if self.point_in_polygon(coord, building):
-                return True
-        
-        # 检查运动场所
-        for sport in self.sports:
-            if self.point_in_polygon(coord, sport['polygon']):
-                return True
-        
-        return False
+        """检查是否为主要障碍物（避开建筑和运动场所），查宽松障碍物网格"""
+        return bool(self.relaxed_grid[y, x])
     
     def create_straight_path(self, start, goal):
         """创建直线路径（最后备选方案）"""
@@ -420,8 +930,25 @@ class DroneRoutePlanner:
             path.append([x, y])
         return path
     
-    def plan_routes(self):
-        """规划所有航线"""
+    @timed('plan_routes')
+    def plan_routes(self, mode="tree", workers=1, profile=None):
+        """
+        规划所有航线
+        mode: 'tree' 每个起点一次一对多搜索（默认），'pair' 逐对调用 search_engine 指定的搜索，
+              '3d' 逐对做三维分层规划（航线额外带 altitudes，height 为最高巡航高度）
+        workers: 工作进程数，大于 1 时按起点并行规划（障碍物网格通过共享内存共享；
+                 逐查询计数只在当前进程中收集，工作进程内的查询不计入 metrics）
+        profile: 为 True 时用 cProfile 剖析规划过程并打印耗时最多的函数，为字符串时另存为该 .prof 文件
+        """
+        if mode not in ('tree', 'pair', '3d'):
+            raise ValueError(f"未知的规划模式: {mode}")
+        if not profile:
+            return self.plan_all_routes(mode, workers)
+        with profiled(profile if isinstance(profile, str) else None):
+            return self.plan_all_routes(mode, workers)
+    
+    def plan_all_routes(self, mode, workers):
+        """plan_routes 的规划过程：依次规划食堂、校门到所有宿舍的航线"""
         print("正在规划航线...")
         
         routes = {
@@ -429,125 +956,310 @@ class DroneRoutePlanner:
             'gate_to_dorm': []
         }
         
-        # 规划食堂到宿舍的航线
-        print("规划食堂到宿舍的航线...")
-        canteen_count = 0
-        for canteen in self.canteens:
-            for dorm in self.dorms:
-                route = self.a_star(canteen['coordinates'], dorm['coordinates'])
-                if route:
-                    routes['canteen_to_dorm'].append({
-                        'from': canteen['name'],
-                        'to': dorm['name'],
-                        'path': route,
-                        'height': self.height_levels['medium']
-                    })
-                    canteen_count += 1
-                    if canteen_count % 100 == 0:
-                        print(f"已规划 {canteen_count} 条食堂-宿舍航线...")
-        
-        # 规划校门到宿舍的航线
-        print("规划校门到宿舍的航线...")
-        gate_count = 0
-        for gate in self.gates:
-            for dorm in self.dorms:
-                route = self.a_star(gate['coordinates'], dorm['coordinates'])
-                if route:
-                    routes['gate_to_dorm'].append({
-                        'from': gate['name'],
-                        'to': dorm['name'],
-                        'path': route,
-                        'height': self.height_levels['high']
-                    })
-                    gate_count += 1
-                    if gate_count % 50 == 0:
-                        print(f"已规划 {gate_count} 条校门-宿舍航线...")
+        with RoutePool(self, workers) as pool:
+            if workers > 1:
+                print(f"使用 {workers} 个工作进程并行规划")
+            
+            # 规划食堂到宿舍的航线
+            print("规划食堂到宿舍的航线...")
+            canteen_count = 0
+            for canteen, paths in pool.map_sources(self.canteens, self.dorms, mode):
+                for dorm, route in zip(self.dorms, paths):
+                    if route:
+                        routes['canteen_to_dorm'].append(self.make_route(canteen, dorm, route, 'medium'))
+                        canteen_count += 1
+                        if canteen_count % 100 == 0:
+                            print(f"已规划 {canteen_count} 条食堂-宿舍航线...")
+            
+            # 规划校门到宿舍的航线
+            print("规划校门到宿舍的航线...")
+            gate_count = 0
+            for gate, paths in pool.map_sources(self.gates, self.dorms, mode):
+                for dorm, route in zip(self.dorms, paths):
+                    if route:
+                        routes['gate_to_dorm'].append(self.make_route(gate, dorm, route, 'high'))
+                        gate_count += 1
+                        if gate_count % 50 == 0:
+                            print(f"已规划 {gate_count} 条校门-宿舍航线...")
         
         print(f"航线规划完成: {len(routes['canteen_to_dorm'])}条食堂-宿舍航线, {len(routes['gate_to_dorm'])}条校门-宿舍航线")
         return routes
     
-    def visualize_routes(self, routes):
-        """可视化航线"""
+    def make_route(self, source, target, route, level):
+        """
+        组装航线字典；route 为二维路径，或三维模式下的 (路径, 各航点高度)
+        二维航线的 height 为 level 对应的固定高度层，三维航线为实际最高巡航高度
+        """
+        if isinstance(route, tuple):
+            path, altitudes = route
+            return {
+                'from': source['name'],
+                'to': target['name'],
+                'path': path,
+                'height': max(altitudes),
+                'altitudes': altitudes
+            }
+        return {
+            'from': source['name'],
+            'to': target['name'],
+            'path': route,
+            'height': self.height_levels[level]
+        }
+    
+    @timed('plan_from_source')
+    def plan_from_source(self, source, targets, mode="tree"):
+        """
+        规划一个起点到多个目标的航线，返回与 targets 对应的路径列表
+        '3d' 模式下每个元素为 (路径, 各航点高度) 或 None
+        """
+        goals = [target['coordinates'] for target in targets]
+        if mode == 'tree':
+            return self.a_star_many(source['coordinates'], goals)
+        if mode == '3d':
+            return [self.plan_3d(source['coordinates'], goal) for goal in goals]
+        return [self.find_path(source['coordinates'], goal) for goal in goals]
+    
+    @timed('update_obstacles')
+    def update_obstacles(self, routes, added=None, removed=None):
+        """
+        增量更新障碍物，只重新栅格化受影响的网格区域、只重规划受影响的航线（原地修改 routes）
+        added: 新增障碍物多边形列表（如临时禁飞区），与建筑一样不加缓冲区
+        removed: 要移除的障碍物多边形列表，需与某个建筑或运动场所的多边形完全相同
+        返回重规划的航线数
+        """
+        added = [list(polygon) for polygon in (added or [])]
+        removed = list(removed or [])
+        if not added and not removed:
+            return 0
+        
+        index = self.get_route_index(routes)
+        
+        # 变化区域：所有变化多边形（运动场所含缓冲区）的包围盒
+        boxes = [polygon_bbox(polygon) for polygon in added]
+        for polygon in removed:
+            position = next((k for k, building in enumerate(self.buildings)
+                             if np.array_equal(building, polygon)), None)
+            if position is not None:
+                del self.buildings[position]
+                del self.building_heights[position]
+                boxes.append(polygon_bbox(polygon))
+                continue
+            sport = next((sport for sport in self.sports if np.array_equal(sport['polygon'], polygon)), None)
+            if sport is None:
+                raise ValueError("未找到要移除的障碍物多边形")
+            self.sports.remove(sport)
+            minx, maxx, miny, maxy = polygon_bbox(polygon)
+            d = self.buffer_distance
+            boxes.append([minx - d, maxx + d, miny - d, maxy + d])
+        self.buildings.extend(added)
+        # 新增障碍物（禁飞区）在所有高度都不可通行
+        self.building_heights.extend([math.inf] * len(added))
+        
+        boxes = np.array(boxes)
+        bbox = [boxes[:, 0].min(), boxes[:, 1].max(), boxes[:, 2].min(), boxes[:, 3].max()]
+        window = grid_window(bbox, self.bounds, self.grid_size, self.grid_width, self.grid_height)
+        j0, j1, i0, i1 = window
+        
+        # 只重新栅格化变化窗口（严格网格与宽松网格）
+        sport_polygons = [sport['polygon'] for sport in self.sports]
+        new = rasterize_window(
+            window, self.bounds, self.grid_size, self.buildings,
+            sport_polygons, self.buffer_distance, self.buffer_mode
+        )
+        relaxed = rasterize_window(window, self.bounds, self.grid_size, self.buildings + sport_polygons)
+        if not self.obstacle_grid.flags.writeable:
+            # 缓存中的网格是只读内存映射，修改前复制一份
+            self.obstacle_grid = np.array(self.obstacle_grid)
+        if not self.relaxed_grid.flags.writeable:
+            self.relaxed_grid = np.array(self.relaxed_grid)
+        old = np.array(self.obstacle_grid[i0:i1, j0:j1])
+        self.obstacle_grid[i0:i1, j0:j1] = new
+        self.relaxed_grid[i0:i1, j0:j1] = relaxed
+        
+        ys, xs = np.nonzero(new & ~old)
+        blocked_cells = (ys + i0) * self.grid_width + xs + j0
+        ys, xs = np.nonzero(old & ~new)
+        freed_cells = (ys + i0) * self.grid_width + xs + j0
+        print(f"障碍物更新: 新增 {len(blocked_cells)} 个障碍物点, 释放 {len(freed_cells)} 个障碍物点")
+        
+        # 搜索结构只刷新变化窗口；跳点表、可视图按需重建，网格已与磁盘缓存不一致
+        self.grid_search.update_region(window, self.obstacle_grid)
+        if self.relaxed_search is not None:
+            self.relaxed_search.update_region(window, self.relaxed_grid)
+        self.jps = None
+        if len(freed_cells):
+            # 新增障碍物只会让距离变长，地标下界仍然可采纳；释放障碍物后需要重新计算
+            self.landmarks = None
+        self.visibility_graph = None
+        self.multires = None
+        self.layered_grid = None
+        self.grid_cache_key = None
+        self.route_cache.clear()
+        self.distance_fields.clear()
+        self.heuristic_fields.clear()
+        
+        affected = index.routes_through(blocked_cells)
+        if len(freed_cells):
+            affected |= index.routes_improvable(freed_cells)
+            affected |= index.routes_blocked(self.obstacle_grid)
+        
+        # 按起点分组，每个起点做一次一对多规划
+        groups = {}
+        for key in sorted(affected):
+            route = routes[key[0]][key[1]]
+            source = self.find_place(route['from'], route['path'][0], self.canteens + self.gates)
+            mode = '3d' if 'altitudes' in route else 'tree'
+            groups.setdefault((key[0], id(source), mode), (source, mode, []))[2].append(key)
+        
+        dropped = False
+        for source, mode, keys in groups.values():
+            targets = [self.find_place(routes[t][i]['to'], routes[t][i]['path'][-1], self.dorms) for t, i in keys]
+            paths = self.plan_from_source(source, targets, mode)
+            for key, path in zip(keys, paths):
+                if path and mode == '3d':
+                    path, altitudes = path
+                    routes[key[0]][key[1]].update(path=path, altitudes=altitudes, height=max(altitudes))
+                    index.update(key, path)
+                elif path:
+                    routes[key[0]][key[1]]['path'] = path
+                    index.update(key, path)
+                else:
+                    routes[key[0]][key[1]]['path'] = None
+                    dropped = True
+        
+        if dropped:
+            # 与 plan_routes 一致，不保留无法规划的航线；序号变化后重建索引
+            for route_type in routes:
+                routes[route_type] = [route for route in routes[route_type] if route['path']]
+            self.route_index = None
+        
+        print(f"增量重规划完成: {len(affected)} 条航线")
+        return len(affected)
+    
+    def find_place(self, name, point, places):
+        """按名称查找地点，重名时取坐标离 point 最近的一个；没有该名称的地点时抛出 ValueError"""
+        candidates = [place for place in places if place['name'] == name]
+        if not candidates:
+            raise ValueError(f"当前数据中没有名为 {name} 的地点")
+        return min(candidates, key=lambda place: (place['coordinates'][0] - point[0]) ** 2 +
+                                                 (place['coordinates'][1] - point[1]) ** 2)
+    
+    def get_route_index(self, routes):
+        """航线到网格点的反向索引，routes 变化（不是同一个对象）时重建"""
+        if self.route_index is None or self.route_index.routes is not routes:
+            self.route_index = RouteIndex(routes, self.bounds, self.grid_size, self.grid_width, self.grid_height,
+                                          self.octile_costs)
+        return self.route_index
+    
+    @timed('smooth_routes')
+    def smooth_routes(self, routes, tolerance=None):
+        """
+        航线平滑与航点压缩：在障碍物网格上做视线检查的拉绳，可选 Douglas–Peucker
+        tolerance: Douglas–Peucker 容差（度），None 表示只做拉绳
+        返回 (新的航线字典, 统计信息)，原航线不修改
+        """
+        print("正在平滑航线...")
+        line_of_sight = GridLineOfSight(self.obstacle_grid, self.bounds, self.grid_size)
+        
+        smoothed = {}
+        stats = {
+            'routes': 0,
+            'points_before': 0,
+            'points_after': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+            'length_before': 0.0,
+            'length_after': 0.0
+        }
+        for route_type, route_list in routes.items():
+            smoothed[route_type] = []
+            for route in route_list:
+                path = route['path']
+                if 'altitudes' in route:
+                    # 三维航线可能飞越建筑，二维视线检查不适用，保持原样
+                    smoothed[route_type].append(route)
+                    continue
+                new_path = smooth_path(path, line_of_sight, self.calculate_route_length, tolerance)
+                smoothed[route_type].append(dict(route, path=new_path))
+                
+                stats['routes'] += 1
+                stats['points_before'] += len(path)
+                stats['points_after'] += len(new_path)
+                stats['bytes_before'] += path_bytes(path)
+                stats['bytes_after'] += path_bytes(new_path)
+                stats['length_before'] += self.calculate_route_length(path)
+                stats['length_after'] += self.calculate_route_length(new_path)
+        
+        stats['points_removed'] = stats['points_before'] - stats['points_after']
+        stats['bytes_saved'] = stats['bytes_before'] - stats['bytes_after']
+        print(f"航线平滑完成: 航点 {stats['points_before']} -> {stats['points_after']} "
+              f"(删除 {stats['points_removed']} 个), 路径数据 {stats['bytes_before'] / 1024:.1f} KB -> "
+              f"{stats['bytes_after'] / 1024:.1f} KB, 总长度 {stats['length_before']:.2f} km -> "
+              f"{stats['length_after']:.2f} km")
+        return smoothed, stats
+    
+    @timed('visualize_routes')
+    def visualize_routes(self, routes, mode="routes", filename="drone_delivery_routes.png", dpi=150):
+        """
+        可视化航线（建筑、运动场所和航线各用一个集合对象批量绘制）
+        mode: 'routes' 绘制每条航线，'heatmap' 绘制航线密度热力图（每个网格点经过的航线数）
+        """
+        if mode not in ('routes', 'heatmap'):
+            raise ValueError(f"未知的可视化模式: {mode}")
         print("正在生成可视化...")
+        plt = load_pyplot()
+        from matplotlib.collections import LineCollection, PolyCollection
         
         fig, ax = plt.subplots(1, 1, figsize=(15, 12))
         
-        total_steps = 4 + len(self.buildings) + len(self.sports) + len(routes['canteen_to_dorm']) + len(routes['gate_to_dorm'])
-        current_step = 0
-        
         # 绘制校园边界
-        if self.campus_boundary:
-            boundary_x = [coord[0] for coord in self.campus_boundary]
-            boundary_y = [coord[1] for coord in self.campus_boundary]
-            ax.plot(boundary_x, boundary_y, 'k-', linewidth=2, label='校园边界')
-            current_step += 1
-            print(f"可视化进度: {current_step}/{total_steps} - 绘制校园边界")
-        
-        # 绘制建筑
-        print("正在绘制建筑...")
-        for i, building in enumerate(self.buildings):  # 绘制所有建筑
-            building_x = [coord[0] for coord in building]
-            building_y = [coord[1] for coord in building]
-            ax.fill(building_x, building_y, color='gray', alpha=0.3)
-            current_step += 1
-            if i % 50 == 0 or i == len(self.buildings) - 1:  # 每50个建筑显示一次进度
-                print(f"可视化进度: {current_step}/{total_steps} - 绘制建筑 ({i+1}/{len(self.buildings)})")
-        
-        # 绘制运动场所
-        print("正在绘制运动场所...")
-        for i, sport in enumerate(self.sports):
-            sport_x = [coord[0] for coord in sport['polygon']]
-            sport_y = [coord[1] for coord in sport['polygon']]
-            ax.fill(sport_x, sport_y, color='red', alpha=0.3, label='运动场所' if sport == self.sports[0] else "")
-            current_step += 1
-            print(f"可视化进度: {current_step}/{total_steps} - 绘制运动场所 ({i+1}/{len(self.sports)})")
-        
-        # 绘制校门
-        gate_x = [gate['coordinates'][0] for gate in self.gates]
-        gate_y = [gate['coordinates'][1] for gate in self.gates]
-        ax.scatter(gate_x, gate_y, c='blue', s=100, marker='s', label='校门', zorder=5)
-        current_step += 1
-        print(f"可视化进度: {current_step}/{total_steps} - 绘制校门")
-        
-        # 绘制食堂
-        canteen_x = [canteen['coordinates'][0] for canteen in self.canteens]
-        canteen_y = [canteen['coordinates'][1] for canteen in self.canteens]
-        ax.scatter(canteen_x, canteen_y, c='orange', s=100, marker='^', label='食堂', zorder=5)
-        current_step += 1
-        print(f"可视化进度: {current_step}/{total_steps} - 绘制食堂")
-        
-        # 绘制宿舍
-        dorm_x = [dorm['coordinates'][0] for dorm in self.dorms]
-        dorm_y = [dorm['coordinates'][1] for dorm in self.dorms]
-        ax.scatter(dorm_x, dorm_y, c='green', s=100, marker='o', label='宿舍', zorder=5)
-        current_step += 1
-        print(f"可视化进度: {current_step}/{total_steps} - 绘制宿舍")
-        
-        # 绘制食堂到宿舍的航线
-        print("正在绘制食堂到宿舍的航线...")
-        for i, route in enumerate(routes['canteen_to_dorm']):
-            path_x = [coord[0] for coord in route['path']]
-            path_y = [coord[1] for coord in route['path']]
-            ax.plot(path_x, path_y, 'b-', linewidth=1, alpha=0.6, label='食堂-宿舍航线' if route == routes['canteen_to_dorm'][0] else "")
-            current_step += 1
-            if i % 100 == 0 or i == len(routes['canteen_to_dorm']) - 1:  # 每100条航线显示一次进度
-                print(f"可视化进度: {current_step}/{total_steps} - 绘制食堂-宿舍航线 ({i+1}/{len(routes['canteen_to_dorm'])})")
-        
-        # 绘制校门到宿舍的航线
-        print("正在绘制校门到宿舍的航线...")
-        for i, route in enumerate(routes['gate_to_dorm']):
-            path_x = [coord[0] for coord in route['path']]
-            path_y = [coord[1] for coord in route['path']]
-            ax.plot(path_x, path_y, 'r-', linewidth=1, alpha=0.6, label='校门-宿舍航线' if route == routes['gate_to_dorm'][0] else "")
-            current_step += 1
-            if i % 50 == 0 or i == len(routes['gate_to_dorm']) - 1:  # 每50条航线显示一次进度
-                print(f"可视化进度: {current_step}/{total_steps} - 绘制校门-宿舍航线 ({i+1}/{len(routes['gate_to_dorm'])})")
-        
+        if self.campus_boundary is not None:
+            boundary = np.asarray(self.campus_boundary)
+            ax.plot(boundary[:, 0], boundary[:, 1], 'k-', linewidth=2, label='校园边界')
+        
+        # 绘制建筑与运动场所
+        print(f"正在绘制建筑 ({len(self.buildings)}) 与运动场所 ({len(self.sports)})...")
+        ax.add_collection(PolyCollection(
+            [np.asarray(building) for building in self.buildings], facecolors='gray', edgecolors='none', alpha=0.3
+        ))
+        ax.add_collection(PolyCollection(
+            [np.asarray(sport['polygon']) for sport in self.sports], facecolors='red', edgecolors='none',
+            alpha=0.3, label='运动场所'
+        ))
+        
+        # 绘制校门、食堂、宿舍
+        for places, color, marker, label in ((self.gates, 'blue', 's', '校门'),
+                                             (self.canteens, 'orange', '^', '食堂'),
+                                             (self.dorms, 'green', 'o', '宿舍')):
+            points = np.array([place['coordinates'] for place in places]).reshape(-1, 2)
+            ax.scatter(points[:, 0], points[:, 1], c=color, s=100, marker=marker, label=label, zorder=5)
+        
+        packed = PackedRoutes.from_routes(routes)
+        if mode == 'heatmap':
+            print("正在绘制航线密度热力图...")
+            density = route_density(packed, self.bounds, self.grid_size, self.grid_width, self.grid_height)
+            half = self.grid_size / 2
+            image = ax.imshow(
+                np.ma.masked_equal(density, 0), origin='lower', cmap='inferno_r', interpolation='nearest',
+                extent=[self.bounds[0] - half, self.bounds[0] + (self.grid_width - 0.5) * self.grid_size,
+                        self.bounds[2] - half, self.bounds[2] + (self.grid_height - 0.5) * self.grid_size],
+                zorder=3
+            )
+            fig.colorbar(image, ax=ax, shrink=0.7, label='经过的航线数')
+        else:
+            # 绘制食堂到宿舍、校门到宿舍的航线
+            for kind, (color, label) in enumerate((('b', '食堂-宿舍航线'), ('r', '校门-宿舍航线'))):
+                selected = np.nonzero(packed.kinds == kind)[0]
+                print(f"正在绘制{label} ({len(selected)})...")
+                ax.add_collection(LineCollection(
+                    [packed.coords[packed.offsets[r]:packed.offsets[r + 1]] for r in selected],
+                    colors=color, linewidths=1, alpha=0.6, label=label
+                ))
         
         ax.set_xlabel('经度')
         ax.set_ylabel('纬度')
-        ax.set_title('清华大学无人机外卖航线规划图')
-        ax.legend()
+        ax.set_title('清华大学无人机外卖航线规划图' if mode == 'routes' else '清华大学无人机外卖航线密度图')
+        ax.legend(loc="upper right")  # 固定位置，避免 "best" 逐个候选位置计算重叠
         ax.grid(True, alpha=0.3)
         
         # 设置坐标轴范围
@@ -555,14 +1267,15 @@ class DroneRoutePlanner:
         ax.set_ylim(self.bounds[2], self.bounds[3])
         
         plt.tight_layout()
-        plt.savefig('drone_delivery_routes.png', dpi=300, bbox_inches='tight')
-        print("可视化图像已保存到 drone_delivery_routes.png")
+        plt.savefig(filename, dpi=dpi, bbox_inches='tight')
+        print(f"可视化图像已保存到 {filename}")
         plt.close()  # 关闭图形，释放内存
         
         return fig
     
+    @timed('analyze_routes')
     def analyze_routes(self, routes):
-        """分析航线"""
+        """分析航线，打印统计并返回 route_analytics.analyze 的报告"""
         print("\n=== 航线分析报告 ===")
         
         # 统计信息
@@ -574,30 +1287,67 @@ class DroneRoutePlanner:
         print(f"食堂-宿舍航线: {total_canteen_routes}")
         print(f"校门-宿舍航线: {total_gate_routes}")
         
-        # 航线长度统计
-        canteen_lengths = []
-        gate_lengths = []
-        
-        for route in routes['canteen_to_dorm']:
-            length = self.calculate_route_length(route['path'])
-            canteen_lengths.append(length)
-        
-        for route in routes['gate_to_dorm']:
-            length = self.calculate_route_length(route['path'])
-            gate_lengths.append(length)
-        
-        if canteen_lengths:
-            print(f"\n食堂-宿舍航线长度统计:")
-            print(f"  平均长度: {np.mean(canteen_lengths):.2f} km")
-            print(f"  最短长度: {np.min(canteen_lengths):.2f} km")
-            print(f"  最长长度: {np.max(canteen_lengths):.2f} km")
-        
-        if gate_lengths:
-            print(f"\n校门-宿舍航线长度统计:")
-            print(f"  平均长度: {np.mean(gate_lengths):.2f} km")
-            print(f"  最短长度: {np.min(gate_lengths):.2f} km")
-            print(f"  最长长度: {np.max(gate_lengths):.2f} km")
+        # 航线长度、飞行时间与绕行系数统计（向量化，见 route_analytics）
+        report = analyze(PackedRoutes.from_routes(routes))
+        titles = {'canteen_to_dorm': '食堂-宿舍', 'gate_to_dorm': '校门-宿舍'}
+        for route_type, title in titles.items():
+            stats = report[route_type]
+            if not stats['routes']:
+                continue
+            lengths = stats['length_km']
+            print(f"\n{title}航线长度统计:")
+            print(f"  平均长度: {lengths['mean']:.2f} km")
+            print(f"  最短长度: {lengths['min']:.2f} km")
+            print(f"  最长长度: {lengths['max']:.2f} km")
+            print(f"  长度分位数: P50 {lengths['p50']:.2f} km, P90 {lengths['p90']:.2f} km, P99 {lengths['p99']:.2f} km")
+            print(f"  平均飞行时间: {stats['flight_time_s']['mean']:.0f} 秒")
+            if stats['detour_ratio']:
+                print(f"  绕行系数: 平均 {stats['detour_ratio']['mean']:.3f}, P90 {stats['detour_ratio']['p90']:.3f}")
+        return report
     
+    def export_od_matrix(self, routes, filename):
+        """导出起点（食堂 + 校门）x 宿舍的航线长度矩阵（.npy 或 CSV），返回矩阵"""
+        lengths = od_length_matrix(self, routes)
+        export_od_matrix(
+            filename, lengths,
+            [place['name'] for place in self.canteens + self.gates],
+            [place['name'] for place in self.dorms]
+        )
+        return lengths
+
+    def enable_metrics(self, enabled=True):
+        """开启（或关闭）计时与计数，已收集的数据保留"""
+        self.metrics.enabled = enabled
+        return self.metrics
+
+    def cache_stats(self):
+        """各缓存的命中 / 未命中次数"""
+        caches = {
+            'route_cache': self.route_cache.stats(),
+            'distance_fields': self.distance_fields.stats(),
+            'heuristic_fields': self.heuristic_fields.stats()
+        }
+        if self.grid_cache is not None:
+            caches['grid_cache'] = {'hits': self.grid_cache.hits, 'misses': self.grid_cache.misses}
+        return caches
+
+    def export_metrics(self, filename=None, fmt="jsonl"):
+        """
+        导出计时、计数与缓存命中率
+        fmt: 'jsonl'（每行一个 JSON 对象，含逐查询记录）或 'prometheus'（文本格式）
+        提供 filename 时写入文件，返回导出的文本
+        """
+        if fmt == 'jsonl':
+            text = self.metrics.to_json_lines(self.cache_stats())
+        elif fmt == 'prometheus':
+            text = self.metrics.to_prometheus(self.cache_stats())
+        else:
+            raise ValueError(f"未知的导出格式: {fmt}")
+        if filename:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
     def calculate_route_length(self, path):
         """计算航线长度（公里）"""
         total_length = 0
@@ -607,49 +1357,206 @@ class DroneRoutePlanner:
             lat2, lon2 = path[i+1][1], path[i+1][0]
             
             # 简化的距离计算（适用于小范围）
-            dx = (lon2 - lon1) * 111.32 * math.cos(math.radians((lat1 + lat2) / 2))
-            dy = (lat2 - lat1) * 111.32
+            dx = (lon2 - lon1) * KM_PER_DEGREE * math.cos(math.radians((lat1 + lat2) / 2))
+            dy = (lat2 - lat1) * KM_PER_DEGREE
             distance = math.sqrt(dx*dx + dy*dy)
             total_length += distance
         
         return total_length
 
-def main():
-    """主函数"""
+def save_results(routes, filename="route_planning_results.json", smoothing_stats=None):
+    """保存规划结果（前端与 route_service 读取的格式）"""
+    results = {
+        'routes': routes,
+        'statistics': {
+            'total_canteen_routes': len(routes['canteen_to_dorm']),
+            'total_gate_routes': len(routes['gate_to_dorm'])
+        }
+    }
+    if smoothing_stats:
+        results['statistics']['smoothing'] = smoothing_stats
+    
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {filename}")
+
+
+def load_results(filename="route_planning_results.json"):
+    """读取 save_results 保存的航线"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)['routes']
+
+
+def resolve_point(planner, text):
+    """命令行中的地点：'经度,纬度' 或食堂 / 宿舍 / 校门的名称（重名时取第一个）"""
+    parts = text.split(',')
+    if len(parts) == 2:
+        try:
+            return [float(parts[0]), float(parts[1])]
+        except ValueError:
+            pass
+    for place in planner.canteens + planner.dorms + planner.gates:
+        if place['name'] == text:
+            return place['coordinates']
+    raise ValueError(f"未知的地点: {text}（应为 '经度,纬度' 或食堂、宿舍、校门名称）")
+
+
+def run_pipeline(planner, smooth=False):
+    """
+    完整流程：规划、（可选）平滑、绘图、分析并保存结果
+    smooth: 是否在保存前平滑航线（前端按航点逐帧推进动画，默认保留逐格航点）
+    """
+    print("清华大学无人机外卖航线规划系统")
+    print("=" * 50)
+    
+    # 规划航线
+    routes = planner.plan_routes()
+    smoothing_stats = None
+    if smooth:
+        routes, smoothing_stats = planner.smooth_routes(routes)
+    
+    # 可视化
+    planner.visualize_routes(routes)
+    
+    # 分析航线
+    planner.analyze_routes(routes)
+    
+    # 保存结果
+    save_results(routes, smoothing_stats=smoothing_stats)
+    print("可视化图已保存到 drone_delivery_routes.png")
+
+
+def add_common_arguments(parser, defaults=True):
+    """
+    各子命令共用的参数；子命令上的副本不设默认值（argparse.SUPPRESS），
+    否则会覆盖写在子命令之前的同名参数
+    """
+    def default(value):
+        return value if defaults else argparse.SUPPRESS
+    
+    parser.add_argument('--data-dir', default=default('data'), help="GeoJSON 数据目录")
+    parser.add_argument('--cache-dir', default=default(DEFAULT_CACHE_DIR), help="障碍物网格与几何数据的磁盘缓存目录")
+    parser.add_argument('--no-cache', action='store_true', default=default(False), help="不读写磁盘缓存")
+    parser.add_argument('--grid-size', type=float, default=default(0.0001), help="障碍物网格边长（度）")
+    parser.add_argument('--engine', choices=DroneRoutePlanner.SEARCH_ENGINES, default=default('astar'),
+                        help="点对点搜索引擎")
+    parser.add_argument('--cost-model', choices=DroneRoutePlanner.COST_MODELS, default=default('metric'),
+                        help="网格搜索的代价模型（unit 与历史结果一致）")
+    parser.add_argument('--weight', type=float, default=default(1.0),
+                        help="启发式权重，大于 1 时为加权 A*（航线代价不超过最优的该倍数）")
+    parser.add_argument('--landmarks', type=int, default=default(0),
+                        help="a_star 使用的地标数（ALT 启发式），0 表示不使用")
+    parser.add_argument('--metrics', default=default(None), help="把计时与计数写入该文件")
+    parser.add_argument('--metrics-format', choices=('jsonl', 'prometheus'), default=default('jsonl'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="清华大学无人机外卖航线规划；不带子命令时执行完整流程（规划、绘图、分析、保存）"
+    )
+    add_common_arguments(parser)
+    common = argparse.ArgumentParser(add_help=False)
+    add_common_arguments(common, defaults=False)
+    parser.add_argument('--smooth', action='store_true', help="完整流程中保存前平滑航线")
+    commands = parser.add_subparsers(dest='command')
+    
+    build = commands.add_parser('build-grid', parents=[common], help="构建障碍物网格并写入磁盘缓存")
+    build.add_argument('--jps', action='store_true', help="同时预先计算跳点搜索的跳跃距离表")
+    build.add_argument('--multires', action='store_true', help="同时预先构建多分辨率网格")
+    
+    plan = commands.add_parser('plan', parents=[common], help="规划所有航线并保存结果")
+    plan.add_argument('--mode', choices=('tree', 'pair', '3d'), default='tree')
+    plan.add_argument('--workers', type=int, default=1)
+    plan.add_argument('--smooth', action='store_true', default=argparse.SUPPRESS, help="保存前平滑航线")
+    plan.add_argument('--output', default='route_planning_results.json')
+    plan.add_argument('--profile', nargs='?', const=True, default=None, metavar='FILE',
+                      help="用 cProfile 剖析规划过程，可选保存为 .prof 文件")
+    
+    query = commands.add_parser('query', parents=[common], help="规划单条航线")
+    query.add_argument('start', help="起点：'经度,纬度' 或地点名称")
+    query.add_argument('goal', help="终点：'经度,纬度' 或地点名称")
+    query.add_argument('--output', help="把航线写入该 JSON 文件，默认打印到标准输出")
+    
+    analyze_command = commands.add_parser('analyze', parents=[common], help="分析已保存的航线")
+    analyze_command.add_argument('--results', default='route_planning_results.json')
+    analyze_command.add_argument('--od-matrix', help="导出起点 x 宿舍的航线长度矩阵（.npy 或 .csv）")
+    analyze_command.add_argument('--report', help="把分析报告写入该 JSON 文件")
+    
+    render = commands.add_parser('render', parents=[common], help="绘制已保存的航线")
+    render.add_argument('--results', default='route_planning_results.json')
+    render.add_argument('--mode', choices=('routes', 'heatmap'), default='routes')
+    render.add_argument('--output', default='drone_delivery_routes.png')
+    render.add_argument('--dpi', type=int, default=150)
+    return parser
+
+
+def main(argv=None):
+    """命令行入口，子命令只做各自需要的工作（见 build_parser）"""
+    args = build_parser().parse_args(argv)
     try:
-        print("清华大学无人机外卖航线规划系统")
-        print("=" * 50)
-        
-        # 创建规划器
-        planner = DroneRoutePlanner()
-        
-        # 规划航线
-        routes = planner.plan_routes()
-        
-        # 可视化
-        planner.visualize_routes(routes)
-        
-        # 分析航线
-        planner.analyze_routes(routes)
-        
-        # 保存结果
-        results = {
-            'routes': routes,
-            'statistics': {
-                'total_canteen_routes': len(routes['canteen_to_dorm']),
-                'total_gate_routes': len(routes['gate_to_dorm'])
+        planner = DroneRoutePlanner(
+            data_dir=args.data_dir, cache_dir=None if args.no_cache else args.cache_dir,
+            planner=args.engine, grid_size=args.grid_size, metrics=Metrics(enabled=bool(args.metrics)),
+            cost_model=args.cost_model, search_weight=args.weight, landmarks=args.landmarks
+        )
+        
+        if args.command is None:
+            run_pipeline(planner, args.smooth)
+        elif args.command == 'build-grid':
+            grid = planner.ensure_grid()
+            print(f"障碍物网格: {planner.grid_width}x{planner.grid_height}, {int(np.sum(grid))}个障碍物点")
+            if args.jps:
+                planner.get_jps()
+            if args.multires:
+                planner.get_multires()
+            if planner.landmark_count:
+                landmarks = planner.get_landmarks()
+                print(f"地标距离表: {landmarks.count} 个地标, {landmarks.nbytes / 1024:.0f} KB")
+        elif args.command == 'plan':
+            routes = planner.plan_routes(args.mode, args.workers, args.profile)
+            smoothing_stats = None
+            if args.smooth:
+                routes, smoothing_stats = planner.smooth_routes(routes)
+            save_results(routes, args.output, smoothing_stats)
+        elif args.command == 'query':
+            start = resolve_point(planner, args.start)
+            goal = resolve_point(planner, args.goal)
+            path = planner.plan_between(start, goal)
+            if path is None:
+                print("起点或终点附近没有可通行的网格点")
+                return 1
+            route = {
+                'from': args.start,
+                'to': args.goal,
+                'path': path,
+                'length_km': planner.calculate_route_length(path)
             }
-        }
-        
-        with open('route_planning_results.json', 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-        
-        print("\n结果已保存到 route_planning_results.json")
-        print("可视化图已保存到 drone_delivery_routes.png")
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(route, f, ensure_ascii=False, indent=2)
+                print(f"航线长度 {route['length_km']:.3f} km, {len(path)} 个航点，已保存到 {args.output}")
+            else:
+                print(json.dumps(route, ensure_ascii=False))
+        elif args.command == 'analyze':
+            routes = load_results(args.results)
+            report = planner.analyze_routes(routes)
+            if args.report:
+                with open(args.report, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+            if args.od_matrix:
+                planner.export_od_matrix(routes, args.od_matrix)
+                print(f"航线长度矩阵已保存到 {args.od_matrix}")
+        elif args.command == 'render':
+            planner.visualize_routes(load_results(args.results), args.mode, args.output, args.dpi)
+        
+        if args.metrics:
+            planner.export_metrics(args.metrics, args.metrics_format)
     except Exception as e:
         print(f"程序运行出错: {e}")
         import traceback
         traceback.print_exc()
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+本地航线查询服务
+
+预先规划好的航线按 (起点名称, 终点名称) 建哈希表，按起点、终点坐标建两级网格索引
+（桶边长等于匹配容差，查询只看起点、终点周围各 3x3 个桶），单次查询 O(1)。
+坐标匹配规则与前端 isCoordinateNear 一致：经纬度各自相差小于容差；
+多条航线同时匹配时返回航线表中靠前的一条（与前端线性查找的结果相同）。
+坐标查询带 plan 标记且没有匹配的预规划航线时，用 DroneRoutePlanner.plan_between
+按需规划（结果进入规划器的 LRU 缓存）。规划器不是线程安全的（惰性创建网格与搜索核心、
+共享的搜索统计等），服务的多个线程按需规划时经 plan_lock 串行执行；预规划航线的查询不加锁。
+
+HTTP 接口（JSON）：
+    GET  /health
+    GET  /route?from=<名称>&to=<名称>
+    GET  /route?start=<lon>,<lat>&end=<lon>,<lat>[&plan=1]
+    POST /routes/batch   {"queries": [{"from": ..., "to": ...} | {"start": [lon, lat], "end": [lon, lat], "plan": true}, ...]}
+"""
+import argparse
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 坐标匹配容差（度），约 100 米，与前端 isCoordinateNear 一致
+MATCH_TOLERANCE = 0.001
+
+
+class RouteStore:
+    def __init__(self, routes, tolerance=MATCH_TOLERANCE, planner=None):
+        """
+        routes: plan_routes 返回的航线字典 {'canteen_to_dorm': [...], 'gate_to_dorm': [...]}
+        planner: 可选的 DroneRoutePlanner，用于按需规划没有预规划航线的坐标
+        """
+        self.tolerance = tolerance
+        self.planner = planner
+        self.plan_lock = threading.Lock()
+        self.routes = []
+        for route_type in ('canteen_to_dorm', 'gate_to_dorm'):
+            self.routes.extend(route for route in routes.get(route_type, []) if route.get('path'))
+
+        self.by_name = {}
+        self.buckets = {}
+        for position, route in enumerate(self.routes):
+            self.by_name.setdefault((route['from'], route['to']), position)
+            ends = self.buckets.setdefault(self.bucket(route['path'][0]), {})
+            ends.setdefault(self.bucket(route['path'][-1]), []).append(position)
+
+    def bucket(self, coord):
+        return (math.floor(coord[0] / self.tolerance), math.floor(coord[1] / self.tolerance))
+
+    def neighbor_buckets(self, coord):
+        bx, by = self.bucket(coord)
+        return [(bx + dx, by + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+    def near(self, a, b):
+        return abs(a[0] - b[0]) < self.tolerance and abs(a[1] - b[1]) < self.tolerance
+
+    def by_names(self, source, target):
+        """按起终点名称查询，返回航线或 None"""
+        position = self.by_name.get((source, target))
+        return None if position is None else self.routes[position]
+
+    def by_coordinates(self, start, end):
+        """按起终点坐标查询，返回航线或 None"""
+        best = None
+        for start_bucket in self.neighbor_buckets(start):
+            ends = self.buckets.get(start_bucket)
+            if ends is None:
+                continue
+            for end_bucket in self.neighbor_buckets(end):
+                for position in ends.get(end_bucket, ()):
+                    if best is not None and position >= best:
+                        continue
+                    path = self.routes[position]['path']
+                    if self.near(start, path[0]) and self.near(end, path[-1]):
+                        best = position
+        return None if best is None else self.routes[best]
+
+    def query(self, query):
+        """单个查询：{'from', 'to'} 或 {'start', 'end'}"""
+        if 'from' in query and 'to' in query:
+            return self.by_names(query['from'], query['to'])
+        if 'start' in query and 'end' in query:
+            route = self.by_coordinates(query['start'], query['end'])
+            if route is None and query.get('plan') and self.planner is not None:
+                route = self.plan(query['start'], query['end'])
+            return route
+        raise ValueError("查询需要包含 from/to 或 start/end")
+
+    def plan(self, start, end):
+        """按需规划任意坐标之间的航线（同一时间只有一个线程使用规划器）"""
+        with self.plan_lock:
+            path = self.planner.plan_between(start, end)
+        if path is None:
+            return None
+        return {'from': None, 'to': None, 'path': path, 'height': self.planner.height_levels['medium']}
+
+    def query_batch(self, queries):
+        return [self.query(query) for query in queries]
+
+
+def parse_coordinate(text):
+    lon, lat = text.split(',')
+    return [float(lon), float(lat)]
+
+
+class RouteRequestHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/health':
+            status = {'status': 'ok', 'routes': len(self.store.routes)}
+            if self.store.planner is not None:
+                status['route_cache'] = self.store.planner.route_cache.stats()
+            self.send_json(200, status)
+            return
+        if url.path != '/route':
+            self.send_json(404, {'error': '未知的接口'})
+            return
+        try:
+            if 'start' in params and 'end' in params:
+                params = {
+                    'start': parse_coordinate(params['start']),
+                    'end': parse_coordinate(params['end']),
+                    'plan': params.get('plan') in ('1', 'true')
+                }
+            route = self.store.query(params)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(200 if route else 404, {'route': route})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/routes/batch':
+            self.send_json(404, {'error': '未知的接口'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            queries = json.loads(self.rfile.read(length) or b'{}').get('queries', [])
+            routes = self.store.query_batch(queries)
+        except (ValueError, AttributeError, TypeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(200, {'routes': routes})
+
+    def log_message(self, format, *args):
+        # 高并发查询时不逐条打印访问日志
+        pass
+
+
+def create_server(store, host='127.0.0.1', port=8765):
+    """创建查询服务（每个连接一个线程），调用 serve_forever() 启动"""
+    handler = type('Handler', (RouteRequestHandler,), {'store': store})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def load_routes(planner, results_file=None):
+    """读取 route_planning_results.json；未提供文件时用 planner 现场规划"""
+    if results_file:
+        with open(results_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['routes']
+    return planner.plan_routes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地航线查询服务")
+    parser.add_argument('--results', default='route_planning_results.json',
+                        help="预先规划的航线文件，传空字符串时现场规划")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    from route_planner import DroneRoutePlanner
+    planner = DroneRoutePlanner(data_dir=args.data_dir)
+    store = RouteStore(load_routes(planner, args.results), planner=planner)
+    server = create_server(store, args.host, args.port)
+    print(f"航线查询服务已启动: http://{args.host}:{args.port} ({len(store.routes)}条航线)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+离散事件机队仿真
+
+事件堆驱动：订单到达、无人机完成航次、（批量调度时）定时调度三类事件，仿真时间直接
+跳到下一个事件，不按固定步长逐帧推进。订单按到达时间排好序，与事件堆归并读取，
+10 万个订单不需要全部进堆。
+
+航次由若干段组成：空飞到起点（直线，长度按绕行系数或反向航线估计）、取货、沿规划航线
+飞到宿舍（按 calculate_route_length 同样的距离计算按时间推进）、投递。航次的完成时间
+由各段长度和速度算出；需要位置时（snapshot_interval）按时间在当前段上插值，
+航线段按累计长度而不是航点序号定位。
+
+调度策略：
+- 'nearest'：订单到达时交给空飞距离最近的空闲无人机，没有空闲无人机时排队，
+  无人机空闲后按先到先服务接单；
+- 'batch'：每 dispatch_interval 秒把待分配订单和空闲无人机交给 dispatch.Dispatcher
+  （多点投递航次 + 指派局部搜索）。
+起点到宿舍没有航线（长度为 inf，如记录的订单流中）的订单到达时直接拒绝，计为未送达，
+与 Dispatcher 一致；不会进入队列，也不会产生时长为 inf 的航次。
+
+耗时（全天 10 万个订单、300 架无人机）：'nearest' 约 2 秒；'batch' 每个调度周期调用一次
+Dispatcher（全天约 4000 次，每次数毫秒，主要是指派和局部搜索），capacity 为 1~3 时约 16~24 秒，
+达不到数秒内完成的目标。大规模扫参数时用 'nearest'，或增大 dispatch_interval 减少调度次数。
+"""
+import heapq
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from dispatch import DistanceMatrix, Dispatcher, planar_km
+from route_analytics import PackedRoutes, route_pairs, segment_km, summarize
+
+# 事件类型
+ORDER, DONE, DISPATCH, SNAPSHOT = 0, 1, 2, 3
+
+# 午餐、晚餐高峰：(中心时刻秒, 标准差秒, 订单占比)，其余订单在全天均匀到达
+MEAL_PEAKS = ((12 * 3600, 40 * 60, 0.35), (18 * 3600, 40 * 60, 0.30))
+
+
+def synthetic_orders(matrix, count, duration=86400.0, peaks=MEAL_PEAKS, seed=0):
+    """
+    合成订单流：到达时间为均匀分布与高峰正态分布的混合，起终点在有航线的起点-宿舍对中均匀抽取
+    返回按时间排序的 (到达时间, 起点序号, 宿舍序号) 三个数组
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.array([weight for _, _, weight in peaks] + [1.0 - sum(weight for _, _, weight in peaks)])
+    component = rng.choice(len(weights), size=count, p=weights / weights.sum())
+    times = rng.uniform(0.0, duration, size=count)
+    for k, (center, spread, _) in enumerate(peaks):
+        selected = component == k
+        times[selected] = rng.normal(center, spread, size=int(selected.sum()))
+    times = np.clip(times, 0.0, duration)
+
+    pairs = np.argwhere(np.isfinite(matrix.lengths))
+    chosen = pairs[rng.integers(len(pairs), size=count)]
+    order = np.argsort(times, kind='stable')
+    return times[order], chosen[order, 0], chosen[order, 1]
+
+
+def recorded_orders(matrix, records):
+    """
+    记录的订单流：[{'time': 秒, 'start': [lon, lat], 'end': [lon, lat]}, ...]，
+    起终点归到最近的起点和宿舍，返回与 synthetic_orders 相同格式的数组
+    """
+    times = np.array([record['time'] for record in records], dtype=float)
+    sources = matrix.nearest_sources([record['start'] for record in records])
+    targets = matrix.nearest_targets([record['end'] for record in records])
+    order = np.argsort(times, kind='stable')
+    return times[order], sources[order], targets[order]
+
+
+class FleetSimulator:
+    POLICIES = ('nearest', 'batch')
+
+    def __init__(self, matrix, drones=200, capacity=1, speed=10.0, service_time=30.0, policy='nearest',
+                 dispatch_interval=30.0, packed=None, route_of=None):
+        """
+        matrix: dispatch.DistanceMatrix
+        drones: 无人机数量，初始时平均分布在各起点
+        capacity: 单次最多携带的订单数（'batch' 策略下可多点投递）
+        speed: 速度（米/秒）；service_time: 取货、每次投递的停留时间（秒）
+        packed/route_of: PackedRoutes 与 (起点, 宿舍) -> 航线序号 的矩阵（-1 表示无），
+                         用于沿航线插值位置；省略时航线段按直线插值
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的调度策略: {policy}")
+        self.matrix = matrix
+        self.drones = drones
+        self.capacity = capacity
+        self.speed = speed
+        self.service_time = service_time
+        self.policy = policy
+        self.dispatch_interval = dispatch_interval
+        self.dispatcher = Dispatcher(matrix, speed, service_time, time_budget=0.05)
+
+        sources, targets = matrix.sources, matrix.targets
+        self.source_count = len(sources)
+        self.places = np.vstack([sources, targets])
+        # 各地点（起点在前、宿舍在后）空飞到各起点的距离：宿舍用反向航线，否则直线乘绕行系数
+        pickup = planar_km(self.places, sources) * matrix.detour
+        routed = matrix.lengths.T
+        pickup[self.source_count:] = np.where(np.isfinite(routed), routed, pickup[self.source_count:])
+        self.pickup = pickup
+
+        self.packed = packed
+        self.route_of = route_of
+        if packed is not None:
+            segments = segment_km(packed.coords[:-1], packed.coords[1:])
+            self.cumulative = np.concatenate(([0.0], np.cumsum(segments)))
+
+    @classmethod
+    def from_routes(cls, planner, routes, **kwargs):
+        """由 plan_routes 的结果构造（航线长度矩阵与航线打包数组共用一次打包）"""
+        packed = PackedRoutes.from_routes(routes)
+        rows, cols = route_pairs(planner, routes)
+        lengths = packed.lengths()
+        matrix_lengths = np.full((len(planner.canteens) + len(planner.gates), len(planner.dorms)), np.inf)
+        np.minimum.at(matrix_lengths, (rows, cols), lengths)
+        # 每对起终点取最短的一条航线
+        route_of = np.full(matrix_lengths.shape, -1, dtype=np.int64)
+        for r in np.argsort(-lengths, kind='stable'):
+            route_of[rows[r], cols[r]] = r
+        matrix = DistanceMatrix(
+            [place['coordinates'] for place in planner.canteens + planner.gates],
+            [place['coordinates'] for place in planner.dorms],
+            matrix_lengths
+        )
+        return cls(matrix, packed=packed, route_of=route_of, **kwargs)
+
+    def run(self, times, sources, targets, snapshot_interval=None):
+        """
+        运行仿真直到所有订单送达（或无法送达）
+        times/sources/targets: 按到达时间排序的订单（synthetic_orders / recorded_orders 的输出）
+        snapshot_interval: 每隔多少秒记录一次全部无人机的位置，None 表示不记录
+        返回统计报告；记录位置时报告中包含 'snapshots': [(时刻, (无人机数, 2) 坐标数组), ...]
+        """
+        started = time.perf_counter()
+        n = len(times)
+        self.times, self.sources, self.targets = times, sources, targets
+        self.assigned = np.full(n, np.nan)
+        self.delivered = np.full(n, np.nan)
+        self.rejected = 0
+        self.position = np.arange(self.drones) % self.source_count
+        self.idle = np.ones(self.drones, dtype=bool)
+        self.busy_time = np.zeros(self.drones)
+        self.legs = [[] for _ in range(self.drones)]
+        self.queue = deque()
+        self.events = []
+        self.sequence = 0
+        snapshots = []
+
+        start_time = float(times[0]) if n else 0.0
+        if self.policy == 'batch' and n:
+            self.push(start_time, DISPATCH)
+        if snapshot_interval and n:
+            self.push(start_time, SNAPSHOT)
+
+        processed = 0
+        next_order = 0
+        now = start_time
+        while next_order < n or self.events:
+            if next_order < n and (not self.events or times[next_order] <= self.events[0][0]):
+                now = float(times[next_order])
+                self.on_order(next_order, now)
+                next_order += 1
+                processed += 1
+                continue
+            now, _, kind, drone, payload = heapq.heappop(self.events)
+            processed += 1
+            if kind == DONE:
+                self.on_done(drone, payload, now)
+            elif kind == DISPATCH:
+                self.on_dispatch(now, next_order < n)
+            elif kind == SNAPSHOT:
+                snapshots.append((now, self.snapshot(now)))
+                if next_order < n or not self.idle.all() or self.queue:
+                    self.push(now + snapshot_interval, SNAPSHOT)
+
+        report = self.report(start_time, now, processed, time.perf_counter() - started)
+        if snapshot_interval:
+            report['snapshots'] = snapshots
+        return report
+
+    def push(self, at, kind, drone=-1, payload=None):
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, kind, drone, payload))
+
+    def on_order(self, k, now):
+        if not np.isfinite(self.matrix.lengths[self.sources[k], self.targets[k]]):
+            # 没有航线的订单无法送达
+            self.rejected += 1
+            return
+        if self.policy == 'batch':
+            self.queue.append(k)
+            return
+        if not self.idle.any():
+            self.queue.append(k)
+            return
+        costs = np.where(self.idle, self.pickup[self.position, self.sources[k]], np.inf)
+        self.start_trip(int(np.argmin(costs)), self.sources[k], [self.targets[k]], [[k]], now)
+
+    def on_done(self, drone, order_ids, now):
+        self.position[drone] = self.source_count + self.targets[order_ids[-1]]
+        self.idle[drone] = True
+        if self.policy == 'nearest' and self.queue:
+            k = self.queue.popleft()
+            self.start_trip(drone, self.sources[k], [self.targets[k]], [[k]], now)
+
+    def on_dispatch(self, now, more_orders):
+        if self.queue and self.idle.any():
+            self.dispatch_batch(now)
+        if self.queue or more_orders:
+            at = now + self.dispatch_interval
+            if not self.queue:
+                # 没有待分配订单时直接跳到下一个订单到达后的调度时刻
+                upcoming = float(self.times[np.searchsorted(self.times, now, side='right')])
+                at = max(at, now + math.ceil((upcoming - now) / self.dispatch_interval) * self.dispatch_interval)
+            self.push(at, DISPATCH)
+
+    def dispatch_batch(self, now):
+        matrix = self.matrix
+        idle = np.nonzero(self.idle)[0]
+        # 积压时只把最早的一批订单交给调度器（空闲运力的若干倍），其余继续排队
+        limit = len(idle) * self.capacity * 4
+        pending = [self.queue.popleft() for _ in range(min(limit, len(self.queue)))]
+        orders = [{'id': k, 'start': matrix.sources[self.sources[k]], 'end': matrix.targets[self.targets[k]]}
+                  for k in pending]
+        drones = [{'id': int(d), 'position': self.places[self.position[d]], 'capacity': self.capacity}
+                  for d in idle]
+        plan = self.dispatcher.dispatch(orders, drones)
+        for assignment in plan['assignments']:
+            order_ids = assignment['orders']
+            stops = []
+            groups = []
+            for k in order_ids:
+                target = self.targets[k]
+                if not stops or stops[-1] != target:
+                    stops.append(target)
+                    groups.append([])
+                groups[-1].append(k)
+            self.start_trip(assignment['drone'], self.sources[order_ids[0]], stops, groups, now)
+        self.queue.extendleft(reversed(plan['unassigned']))
+
+    def start_trip(self, drone, source, stops, groups, now):
+        """
+        drone 从当前位置出发：空飞到 source 取货，依次飞到 stops 投递 groups 中的订单
+        记录航次各段 (开始, 结束, 类型, 数据)，推入完成事件
+        """
+        matrix = self.matrix
+        speed = self.speed / 1000.0
+        here = self.position[drone]
+        legs = []
+        t = now
+        duration = self.pickup[here, source] / speed
+        legs.append((t, t + duration, 'line', (self.places[here], matrix.sources[source])))
+        t += duration
+        legs.append((t, t + self.service_time, 'hold', matrix.sources[source]))
+        t += self.service_time
+
+        previous = None
+        for target, group in zip(stops, groups):
+            if previous is None:
+                duration = matrix.lengths[source, target] / speed
+                route = -1 if self.route_of is None else int(self.route_of[source, target])
+                if route >= 0:
+                    legs.append((t, t + duration, 'route', route))
+                else:
+                    legs.append((t, t + duration, 'line', (matrix.sources[source], matrix.targets[target])))
+            else:
+                duration = matrix.target_lengths[previous, target] / speed
+                legs.append((t, t + duration, 'line', (matrix.targets[previous], matrix.targets[target])))
+            t += duration
+            legs.append((t, t + self.service_time, 'hold', matrix.targets[target]))
+            t += self.service_time
+            self.delivered[group] = t
+            previous = target
+
+        order_ids = [k for group in groups for k in group]
+        self.assigned[order_ids] = now
+        self.idle[drone] = False
+        self.busy_time[drone] += t - now
+        self.legs[drone] = legs
+        self.push(t, DONE, drone, order_ids)
+
+    def snapshot(self, now):
+        """当前时刻全部无人机的位置 (无人机数, 2)"""
+        positions = self.places[self.position].copy()
+        for drone in np.nonzero(~self.idle)[0]:
+            for t0, t1, kind, data in self.legs[drone]:
+                if now <= t1:
+                    positions[drone] = self.leg_position(t0, t1, kind, data, now)
+                    break
+        return positions
+
+    def leg_position(self, t0, t1, kind, data, now):
+        fraction = 0.0 if t1 <= t0 else min(1.0, max(0.0, (now - t0) / (t1 - t0)))
+        if kind == 'hold':
+            return data
+        if kind == 'line':
+            a, b = data
+            return a + (b - a) * fraction
+        # 沿航线按累计长度定位
+        i0, i1 = self.packed.offsets[data], self.packed.offsets[data + 1]
+        cumulative = self.cumulative[i0:i1] - self.cumulative[i0]
+        distance = fraction * cumulative[-1]
+        k = min(int(np.searchsorted(cumulative, distance, side='right')), len(cumulative) - 1)
+        if k == 0:
+            return self.packed.coords[i0]
+        span = cumulative[k] - cumulative[k - 1]
+        ratio = 0.0 if span <= 0 else (distance - cumulative[k - 1]) / span
+        a, b = self.packed.coords[i0 + k - 1], self.packed.coords[i0 + k]
+        return a + (b - a) * ratio
+
+    def report(self, start_time, end_time, events, elapsed, percentiles=(50, 90, 95, 99)):
+        done = ~np.isnan(self.delivered)
+        span = max(end_time - start_time, 1e-9)
+        latency = self.delivered[done] - self.times[done]
+        wait = self.assigned[done] - self.times[done]
+        hourly = np.bincount((self.delivered[done] // 3600).astype(np.int64)) if done.any() else np.zeros(0)
+        utilization = self.busy_time / span
+        return {
+            'policy': self.policy,
+            'drones': self.drones,
+            'orders': len(self.times),
+            'delivered': int(done.sum()),
+            'undelivered': int((~done).sum()),
+            'rejected': self.rejected,
+            'simulated_seconds': span,
+            'throughput_per_hour': float(done.sum() / span * 3600),
+            'hourly_deliveries': hourly.tolist(),
+            'peak_hourly_deliveries': int(hourly.max()) if len(hourly) else 0,
+            'latency_s': summarize(latency, percentiles),
+            'wait_s': summarize(wait, percentiles),
+            'utilization': {
+                'mean': float(utilization.mean()),
+                'min': float(utilization.min()),
+                'max': float(utilization.max())
+            },
+            'events': events,
+            'elapsed_s': elapsed
+        }
@@ -1,7 +1,11 @@
+import argparse
 import json
 import re
 import os
 
+from geometry_store import GeometryStore
+from grid_cache import DEFAULT_CACHE_DIR
+
 def extract_building_number(name):
     """
     从建筑名称中提取楼号
@@ -33,41 +37,43 @@ def is_zijing_dorm(name):
     """判断是否为紫荆学生公寓"""
     return name and '紫荆学生公寓' in name
 
-def sort_dorms(data):
+def sort_dorms(layer):
     """
-    对学生公寓数据进行排序
-    返回排序后的features列表
+    对学生公寓图层（geometry_store.GeometryLayer）进行排序
+    返回排序后的要素序号列表
     """
-    features = data.get('features', [])
-    
     # 分离紫荆学生公寓和其他公寓
     zijing_dorms = []
     other_dorms = []
     
-    for feature in features:
-        properties = feature.get('properties', {})
+    for k, properties in enumerate(layer.properties):
         name = properties.get('name', '')
         
         if is_zijing_dorm(name):
-            zijing_dorms.append(feature)
+            zijing_dorms.append(k)
         else:
-            other_dorms.append(feature)
+            other_dorms.append(k)
     
     # 对紫荆学生公寓按楼号排序
-    zijing_dorms.sort(key=lambda x: extract_building_number(x.get('properties', {}).get('name', '')))
+    zijing_dorms.sort(key=lambda k: extract_building_number(layer.properties[k].get('name', '')))
     
     # 对其他公寓按楼号排序
-    other_dorms.sort(key=lambda x: extract_building_number(x.get('properties', {}).get('name', '')))
+    other_dorms.sort(key=lambda k: extract_building_number(layer.properties[k].get('name', '')))
     
     # 合并：紫荆学生公寓在前，其他公寓在后
-    sorted_features = zijing_dorms + other_dorms
-    
-    return sorted_features
+    return zijing_dorms + other_dorms
 
-def main():
-    """主函数"""
-    input_file = 'data/dorms.geojson'
-    output_file = 'data/dorms_sorted.geojson'
+def main(argv=None):
+    """主函数；数据目录和缓存目录的参数与 route_planner 命令行一致"""
+    parser = argparse.ArgumentParser(description="按楼号排序学生公寓")
+    parser.add_argument('--data-dir', default='data', help="GeoJSON 数据目录")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="几何数据的磁盘缓存目录")
+    parser.add_argument('--no-cache', action='store_true', help="不读写磁盘缓存")
+    args = parser.parse_args(argv)
+    data_dir = args.data_dir
+    cache_dir = None if args.no_cache else args.cache_dir
+    input_file = f'{data_dir}/dorms.geojson'
+    output_file = f'{data_dir}/dorms_sorted.geojson'
     
     # 检查输入文件是否存在
     if not os.path.exists(input_file):
@@ -75,24 +81,21 @@ def main():
         return
     
     try:
-        # 读取原始数据
+        # 读取原始数据（与航线规划共用列式几何存储及其缓存）
         print(f"正在读取 {input_file}...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        layer = GeometryStore.load(data_dir, ('dorms',), cache_dir)['dorms']
         
-        print(f"成功读取数据，共 {len(data.get('features', []))} 个建筑")
+        print(f"成功读取数据，共 {len(layer)} 个建筑")
         
         # 排序
         print("正在排序数据...")
-        sorted_features = sort_dorms(data)
+        order = sort_dorms(layer)
         
         # 创建新的数据结构
-        sorted_data = {
-            "type": data.get("type", "FeatureCollection"),
-            "name": data.get("name", "dorms"),
-            "crs": data.get("crs", {}),
-            "features": sorted_features
-        }
+        sorted_data = layer.to_geojson(order)
+        sorted_data.setdefault("name", "dorms")
+        sorted_data.setdefault("crs", {})
+        sorted_features = sorted_data["features"]
         
         # 保存排序后的数据
         print(f"正在保存排序后的数据到 {output_file}...")
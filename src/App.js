@@ -4,6 +4,10 @@ import OrderPanel from './components/OrderPanel';
 import DroneStatus from './components/DroneStatus';
 import './App.css';
 
+// 本地航线查询服务（python route_service.py），没有预规划航线时由服务按需规划；
+// 服务不可用时回退到前端本地查找
+const ROUTE_SERVICE_URL = process.env.REACT_APP_ROUTE_SERVICE_URL || 'http://localhost:8765';
+
 function App() {
   const [orders, setOrders] = useState([]);
   const [drones, setDrones] = useState([]);
@@ -192,20 +196,21 @@ function App() {
   };
 
   // 分配无人机到订单
-  const assignDroneToOrder = (order) => {
+  // prefetchedRoute: 批量查询得到的航线（null 表示未找到），省略时单独查询
+  const assignDroneToOrder = async (order, prefetchedRoute) => {
     console.log('分配无人机到订单:', order.id, '起点:', order.startPoint, '终点:', order.endPoint);
     
     // 尝试找到匹配的实际航线
     let flightPath = null;
     let altitude = 75; // 默认高度
     
-    if (routes) {
-      const bestRoute = findBestRoute(order.startPoint, order.endPoint);
-      if (bestRoute) {
-        flightPath = bestRoute.path;
-        altitude = bestRoute.height || 75;
-        console.log('使用实际航线:', bestRoute.from, '->', bestRoute.to, '高度:', altitude);
-      }
+    const bestRoute = prefetchedRoute !== undefined
+      ? prefetchedRoute
+      : await findBestRoute(order.startPoint, order.endPoint);
+    if (bestRoute) {
+      flightPath = bestRoute.path;
+      altitude = bestRoute.height || 75;
+      console.log('使用实际航线:', bestRoute.from, '->', bestRoute.to, '高度:', altitude);
     }
     
     // 如果没有找到匹配的航线，生成直线路径
@@ -241,50 +246,60 @@ function App() {
     );
   };
 
-  // 查找最佳航线
-  const findBestRoute = (start, end) => {
+  // 查找最佳航线（优先使用航线查询服务）
+  const findBestRoute = async (start, end) => {
+    try {
+      const response = await fetch(
+        `${ROUTE_SERVICE_URL}/route?start=${start[0]},${start[1]}&end=${end[0]},${end[1]}&plan=1`
+      );
+      if (response.ok || response.status === 404) {
+        const data = await response.json();
+        return data.route || null;
+      }
+    } catch (error) {
+      console.warn('航线查询服务不可用，使用本地查找:', error.message);
+    }
+    return findBestRouteLocal(start, end);
+  };
+
+  // 批量查找航线，返回与 orders 对应的航线数组
+  const findBestRoutes = async (orderList) => {
+    try {
+      const response = await fetch(`${ROUTE_SERVICE_URL}/routes/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          queries: orderList.map(order => ({ start: order.startPoint, end: order.endPoint, plan: true }))
+        })
+      });
+      if (response.ok) {
+        const data = await response.json();
+        return data.routes;
+      }
+    } catch (error) {
+      console.warn('航线查询服务不可用，使用本地查找:', error.message);
+    }
+    return orderList.map(order => findBestRouteLocal(order.startPoint, order.endPoint));
+  };
+
+  // 本地查找：在已加载的航线数据中线性查找第一条起终点都匹配的航线
+  const findBestRouteLocal = (start, end) => {
     if (!routes) {
       console.log('航线数据未加载');
       return null;
     }
     
-    console.log('查找航线，起点坐标:', start, '终点坐标:', end);
-    
-    // 根据起点和终点查找匹配的航线
     const allRoutes = [...routes.routes.canteen_to_dorm, ...routes.routes.gate_to_dorm];
-    console.log('总航线数量:', allRoutes.length);
-    
-    // 找到匹配的航线（通过比较坐标）
-    const matchedRoute = allRoutes.find((route, index) => {
-      if (!route.path || route.path.length === 0) {
-        console.log(`航线${index}没有路径数据`);
-        return false;
-      }
-      
-      const routeStart = route.path[0];
-      const routeEnd = route.path[route.path.length - 1];
-      
-      console.log(`检查航线${index}:`, route.from, '->', route.to);
-      console.log('航线起点:', routeStart, '航线终点:', routeEnd);
-      
-      // 检查起点是否匹配
-      const startMatches = isCoordinateNear(start, routeStart);
-      // 检查终点是否匹配
-      const endMatches = isCoordinateNear(end, routeEnd);
-      
-      console.log('起点匹配:', startMatches, '终点匹配:', endMatches);
-      
-      return startMatches && endMatches;
-    });
+    const matchedRoute = allRoutes.find(route =>
+      route.path && route.path.length > 0 &&
+      isCoordinateNear(start, route.path[0]) &&
+      isCoordinateNear(end, route.path[route.path.length - 1])
+    );
     
-    if (matchedRoute) {
-      console.log('找到匹配航线:', matchedRoute.from, '->', matchedRoute.to);
-      return matchedRoute;
+    if (!matchedRoute) {
+      console.log('未找到匹配航线，起点:', start, '终点:', end);
     }
-    
-    // 如果没有找到匹配的航线，返回null
-    console.log('未找到匹配航线，起点:', start, '终点:', end);
-    return null;
+    return matchedRoute || null;
   };
 
   // 检查两个坐标是否接近（允许一定的误差）
@@ -319,12 +334,16 @@ function App() {
     console.log('开始模拟，当前订单数量:', orders.length);
     setIsSimulationRunning(true);
     
-    // 为所有待分配的订单分配无人机
-    orders.forEach(order => {
-      if (order.status === 'pending') {
+    // 为所有待分配的订单分配无人机（一次批量查询所有航线）
+    const pendingOrders = orders.filter(order => order.status === 'pending');
+    if (pendingOrders.length === 0) {
+      return;
+    }
+    findBestRoutes(pendingOrders).then(matchedRoutes => {
+      pendingOrders.forEach((order, index) => {
         console.log('为订单分配无人机:', order.id);
-        assignDroneToOrder(order);
-      }
+        assignDroneToOrder(order, matchedRoutes[index] || null);
+      });
     });
   };
 
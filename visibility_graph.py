@@ -0,0 +1,245 @@
+"""
+任意角度可视图航线规划
+
+把建筑和运动场所多边形投影到以校园为中心的局部平面坐标（米），按安全距离外扩后
+合并，取所有凸角顶点作为图节点。两个顶点之间的线段不穿过任何障碍物内部时连边，
+边长为平面距离。查询时把起终点临时接入图中，用 A*（欧氏距离启发）求最短路径，
+得到只有少量拐点的任意角度航线。
+"""
+import heapq
+import math
+
+import numpy as np
+import shapely
+from shapely.geometry import Point, Polygon
+from shapely.geometry.polygon import orient
+from shapely.ops import nearest_points, unary_union
+from shapely.strtree import STRtree
+
+from route_analytics import KM_PER_DEGREE
+
+# 与 calculate_route_length 一致的每度长度（米）
+METERS_PER_DEGREE = KM_PER_DEGREE * 1000
+
+# 判断线段是否穿过障碍物内部时把障碍物向内收缩的距离（米），允许线段贴边经过顶点
+EDGE_TOLERANCE = 1e-3
+
+# 障碍物内的端点移到边界外的距离（米）
+SNAP_OFFSET = 0.05
+
+# 合并后做一次闭运算的半径（米），消除外扩多边形之间残留的细缝
+CLOSING_RADIUS = 0.5
+
+
+class VisibilityGraph:
+    def __init__(self, obstacles, margins, origin):
+        """
+        obstacles: 经纬度多边形列表（[[lon, lat], ...]）
+        margins: 每个多边形的外扩距离（米），可为单个数值
+        origin: 局部投影原点 [lon, lat]
+        """
+        self.origin = origin
+        self.cos_lat = math.cos(math.radians(origin[1]))
+
+        if np.isscalar(margins):
+            margins = [margins] * len(obstacles)
+        inflated = []
+        for polygon, margin in zip(obstacles, margins):
+            if len(polygon) < 3:
+                continue
+            shape = Polygon(self.project(polygon)).buffer(0)
+            if shape.is_empty:
+                continue
+            inflated.append(shape.buffer(margin, join_style='mitre', mitre_limit=2.0))
+
+        # 被障碍物完全围住的空洞在平面内不可达，并入障碍物
+        merged = unary_union(inflated)
+        merged = merged.buffer(CLOSING_RADIUS, join_style='mitre').buffer(-CLOSING_RADIUS, join_style='mitre')
+        self.obstacles = [
+            orient(Polygon(p.exterior)) for p in getattr(merged, 'geoms', [merged]) if not p.is_empty
+        ]
+        blockers = [p.buffer(-EDGE_TOLERANCE, join_style='mitre') for p in self.obstacles]
+        self.blockers = np.array([p for p in blockers if not p.is_empty], dtype=object)
+        shapely.prepare(self.blockers)
+        self.tree = STRtree(self.blockers)
+        self.obstacle_tree = STRtree(self.obstacles)
+
+        # 端点接入结果缓存：校门、食堂、宿舍等端点会被反复查询
+        self.connect_cache = {}
+        self.connect_cache_size = 1024
+
+        self.nodes = self.convex_vertices()
+        self.adjacency = [[] for _ in range(len(self.nodes))]
+        self.build_edges()
+
+    def project(self, coords):
+        """经纬度 -> 局部平面坐标（米）"""
+        pts = np.asarray(coords, dtype=np.float64)
+        x = (pts[..., 0] - self.origin[0]) * METERS_PER_DEGREE * self.cos_lat
+        y = (pts[..., 1] - self.origin[1]) * METERS_PER_DEGREE
+        return np.stack([x, y], axis=-1)
+
+    def unproject(self, points):
+        """局部平面坐标（米） -> 经纬度"""
+        pts = np.asarray(points, dtype=np.float64)
+        lon = pts[..., 0] / (METERS_PER_DEGREE * self.cos_lat) + self.origin[0]
+        lat = pts[..., 1] / METERS_PER_DEGREE + self.origin[1]
+        return np.stack([lon, lat], axis=-1)
+
+    def convex_vertices(self):
+        """
+        收集所有伸向自由空间的顶点，并记录其前后相邻顶点（用于切线剪枝）
+        orient 后外环逆时针，障碍物在边的左侧，左转即凸角
+        """
+        points, prev_pts, next_pts = [], [], []
+        for polygon in self.obstacles:
+            coords = np.asarray(polygon.exterior.coords)[:-1]
+            if len(coords) < 3:
+                continue
+            prev = np.roll(coords, 1, axis=0)
+            nxt = np.roll(coords, -1, axis=0)
+            cross = (coords[:, 0] - prev[:, 0]) * (nxt[:, 1] - coords[:, 1]) - \
+                    (coords[:, 1] - prev[:, 1]) * (nxt[:, 0] - coords[:, 0])
+            convex = cross > 0
+            points.append(coords[convex])
+            prev_pts.append(prev[convex])
+            next_pts.append(nxt[convex])
+
+        if not points:
+            self.prev_pts = self.next_pts = np.zeros((0, 2))
+            return np.zeros((0, 2))
+        self.prev_pts = np.concatenate(prev_pts)
+        self.next_pts = np.concatenate(next_pts)
+        return np.concatenate(points)
+
+    def visible(self, origins, targets):
+        """批量判断线段 origins[i] -> targets[i] 是否不穿过障碍物内部"""
+        if len(origins) == 0:
+            return np.zeros(0, dtype=bool)
+        lines = shapely.linestrings(np.stack([origins, targets], axis=1))
+        # 先用包围盒筛出候选，再用预处理过的障碍物批量做精确相交判断
+        line_idx, blocker_idx = self.tree.query(lines)
+        hit = shapely.intersects(self.blockers[blocker_idx], lines[line_idx])
+        visible = np.ones(len(origins), dtype=bool)
+        visible[line_idx[hit]] = False
+        return visible
+
+    def tangent_mask(self, nodes, others):
+        """
+        线段 nodes -> others 在 nodes 端与障碍物相切（该顶点的两个相邻顶点位于线段同侧）
+        最短路径只会在相切的凸角顶点处转弯，其余边可以直接剪掉
+        """
+        d = others - self.nodes[nodes]
+        a = self.prev_pts[nodes] - self.nodes[nodes]
+        b = self.next_pts[nodes] - self.nodes[nodes]
+        side_a = d[..., 0] * a[..., 1] - d[..., 1] * a[..., 0]
+        side_b = d[..., 0] * b[..., 1] - d[..., 1] * b[..., 0]
+        return side_a * side_b >= 0
+
+    def build_edges(self):
+        """构建可视图的边：两端都相切且互相可见的顶点对"""
+        nodes = self.nodes
+        count = len(nodes)
+        self.edge_count = 0
+        for u in range(count - 1):
+            others = np.arange(u + 1, count)
+            candidates = others[self.tangent_mask(u, nodes[others])]
+            candidates = candidates[self.tangent_mask(candidates, nodes[u])]
+            if len(candidates) == 0:
+                continue
+
+            origins = np.repeat(nodes[u][np.newaxis, :], len(candidates), axis=0)
+            visible = candidates[self.visible(origins, nodes[candidates])]
+            lengths = np.hypot(*(nodes[visible] - nodes[u]).T)
+            for v, length in zip(visible.tolist(), lengths.tolist()):
+                self.adjacency[u].append((v, length))
+                self.adjacency[v].append((u, length))
+            self.edge_count += len(visible)
+
+    def free_point(self, point):
+        """落在障碍物内的点移到最近的障碍物边界外侧"""
+        p = Point(point)
+        for idx in self.obstacle_tree.query(p, predicate='within'):
+            edge = np.asarray(nearest_points(self.obstacles[idx].exterior, p)[0].coords[0])
+            direction = edge - point
+            norm = math.hypot(*direction)
+            if norm > 0:
+                return edge + direction / norm * SNAP_OFFSET
+            return edge
+        return np.asarray(point, dtype=np.float64)
+
+    def connect(self, point):
+        """返回点 point 可直接看到、且在节点处相切的图节点及距离"""
+        key = tuple(np.round(point, 3).tolist())
+        cached = self.connect_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(self.connect_cache) >= self.connect_cache_size:
+            self.connect_cache.pop(next(iter(self.connect_cache)))
+        self.connect_cache[key] = result = self._connect(point)
+        return result
+
+    def _connect(self, point):
+        candidates = np.nonzero(self.tangent_mask(np.arange(len(self.nodes)), point))[0]
+        if len(candidates) == 0:
+            return candidates, np.zeros(0)
+        origins = np.repeat(point[np.newaxis, :], len(candidates), axis=0)
+        visible = candidates[self.visible(origins, self.nodes[candidates])]
+        return visible, np.hypot(*(self.nodes[visible] - point).T)
+
+    def shortest_path(self, start, goal):
+        """
+        start/goal 为经纬度，返回经纬度路径（含起终点），不可达返回 None
+        落在障碍物内的端点先移到障碍物边界上
+        """
+        s = self.free_point(self.project(start))
+        t = self.free_point(self.project(goal))
+
+        if self.visible(s[np.newaxis, :], t[np.newaxis, :])[0]:
+            return self.unproject([s, t]).tolist()
+
+        count = len(self.nodes)
+        source, target = count, count + 1
+        source_nodes, source_dist = self.connect(s)
+        target_nodes, target_dist = self.connect(t)
+        target_edges = dict(zip(target_nodes.tolist(), target_dist.tolist()))
+
+        points = self.nodes
+        heuristic = np.hypot(*(points - t).T).tolist() + [math.inf, 0.0]
+
+        g_score = {source: 0.0}
+        came_from = {}
+        open_set = []
+        for v, d in zip(source_nodes.tolist(), source_dist.tolist()):
+            g_score[v] = d
+            came_from[v] = source
+            heapq.heappush(open_set, (d + heuristic[v], v))
+        closed = set()
+
+        while open_set:
+            f, u = heapq.heappop(open_set)
+            if u == target:
+                path = [t]
+                node = came_from[target]
+                while node != source:
+                    path.append(points[node])
+                    node = came_from[node]
+                path.append(s)
+                path.reverse()
+                return self.unproject(path).tolist()
+            if u in closed:
+                continue
+            closed.add(u)
+
+            edges = self.adjacency[u]
+            if u in target_edges:
+                edges = edges + [(target, target_edges[u])]
+            for v, length in edges:
+                if v in closed:
+                    continue
+                tentative = g_score[u] + length
+                if tentative < g_score.get(v, math.inf):
+                    g_score[v] = tentative
+                    came_from[v] = u
+                    heapq.heappush(open_set, (tentative + heuristic[v], v))
+        return None